@@ -0,0 +1,193 @@
+"""
+Post-game analysis: recorded games are replayed through Game, every position is searched deeper than the
+players did with the alpha-beta Searcher on a process pool, and each move gets the value of the best move,
+the value of the move played and the loss between them. Every move of a position is scored in the same job to
+the same depth, so the best value is never below the value of the move played. Positions are deduplicated by position hash across
+all games, and their results are appended to a side file so an interrupted run resumes where it stopped.
+The report is one JSON line per game, written as soon as the positions of its batch are searched
+"""
+
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from fast_engine import FastEngine
+from search import Searcher
+from selfplay import read_records
+
+DEFAULT_REPORT = 'analysis.jsonl'
+
+
+def read_lines(path):
+    """
+    Entries of a JSON lines file written by an earlier run. A line cut off by an interruption
+    is dropped and truncated away so that appending continues on a clean line
+    """
+    if not os.path.exists(path):
+        return []
+    entries, good = [], 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            good += len(line)
+    if good < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good)
+    return entries
+
+
+def game_positions(record):
+    """
+    Positions of a recorded game: (hash, FastEngine, move, color, turn) before each move,
+    then the final position with None for the move
+    """
+    game = None
+    for game, move in record.replay():
+        yield game.position_hash(), FastEngine.from_game(game), move, game.current_player().color, game.turn
+    if game is not None:
+        yield game.position_hash(), FastEngine.from_game(game), None, game.current_player().color, game.turn
+
+
+def move_key(symbol, dir1, dir2, focus):
+    """
+    Text key of a complete move in the position results, '-' for the missing parts of a focus-only move
+    """
+    return ' '.join(part or '-' for part in (symbol, dir1, dir2, focus))
+
+
+def _search_job(job):
+    """
+    Worker: value of every move of one position, the best value and the best move
+    """
+    key, engine, depth = job
+    searcher = Searcher(depth)
+    scores = {}
+    best, value = None, None
+    for (symbol, dir1, dir2, era), score in searcher.scores(engine):
+        move = [symbol, dir1, dir2, engine.era_names[era]]
+        scores[move_key(*move)] = score
+        if value is None or score > value:
+            best, value = move, score
+    return key, value, best, scores, searcher.nodes
+
+
+class Analysis:
+    """
+    Resumable analysis run over a records file: the report and the position results of earlier runs are
+    read back, games already in the report are skipped and known positions are not searched again
+    """
+    def __init__(self, report_path=DEFAULT_REPORT, depth=2, threshold=6):
+        """
+        Load the results of earlier runs. A move losing at least threshold against the best move is a blunder
+        """
+        self.report_path = report_path
+        self.positions_path = report_path + '.positions'
+        self.depth = depth
+        self.threshold = threshold
+        self.done = {entry['game'] for entry in read_lines(report_path)}
+        self.results = {entry['hash']: entry for entry in read_lines(self.positions_path)
+                        if entry['depth'] == depth and 'moves' in entry}
+        self.positions = 0
+        self.searched = 0
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def run(self, records_path, processes=1, batch=20):
+        """
+        Analyze the games not reported yet, batch games at a time. Yield the report entry of every game
+        """
+        pending = [(i, record) for i, record in enumerate(read_records(records_path)) if i not in self.done]
+        with Pool(processes) as pool, open(self.report_path, 'a') as report, \
+                open(self.positions_path, 'a') as positions:
+            for start in range(0, len(pending), batch):
+                games = [(i, record, list(game_positions(record))) for i, record in pending[start:start + batch]]
+                self._search(pool, games, positions)
+                for i, record, steps in games:
+                    entry = self.report(i, record, steps)
+                    report.write(json.dumps(entry) + '\n')
+                    report.flush()
+                    self.done.add(i)
+                    yield entry
+
+    def _search(self, pool, games, positions):
+        """
+        Search the positions of a batch that have no result yet, each distinct position once
+        """
+        jobs = {}
+        for _, _, steps in games:
+            for key, engine, move, _, _ in steps:
+                if move is None:
+                    continue
+                self.positions += 1
+                if key not in self.results and key not in jobs:
+                    jobs[key] = (key, engine, self.depth)
+        started = time.perf_counter()
+        for key, value, move, scores, nodes in pool.imap_unordered(_search_job, jobs.values(), chunksize=4):
+            self.results[key] = {'hash': key, 'depth': self.depth, 'value': value, 'best': move, 'moves': scores,
+                                 'nodes': nodes}
+            positions.write(json.dumps(self.results[key]) + '\n')
+            self.searched += 1
+            self.nodes += nodes
+        positions.flush()
+        self.seconds += time.perf_counter() - started
+
+    def report(self, index, record, steps):
+        """
+        Report entry of one game: per move the best value, the value of the move played for the mover
+        (searched in the same job as the best one), the loss and the blunder flag
+        """
+        moves, blunders = [], {'white': 0, 'black': 0}
+        for key, _, move, color, turn in steps:
+            if move is None:
+                continue
+            result = self.results[key]
+            best, played = result['value'], result['moves'][move_key(*move)]
+            blunder = best - played >= self.threshold
+            blunders[color] += blunder
+            moves.append({'turn': turn, 'color': color, 'move': list(move), 'best': best, 'played': played,
+                          'loss': best - played, 'blunder': blunder, 'best_move': self.results[key]['best']})
+        return {'game': index, 'white': record.white[0], 'black': record.black[0], 'winner': record.winner,
+                'moves': moves, 'blunders': blunders}
+
+    def summary(self):
+        """
+        Deduplication and speed of the run
+        """
+        rate = self.nodes / self.seconds if self.seconds else 0.0
+        return (f"{self.positions} positions, {self.searched} searched "
+                f"({self.positions - self.searched} duplicates or known), {self.nodes:,} nodes in "
+                f"{self.seconds:.1f}s ({rate:,.0f} nodes/s)")
+
+
+class Main:
+    """
+    Analysis runner: python analysis.py [records file] [report file] [processes] [depth] [blunder threshold]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['records.jsonl', DEFAULT_REPORT, str(os.cpu_count() or 1), '2', '6']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        analysis = Analysis(defaults[1], int(defaults[3]), int(defaults[4]))
+        skipped = len(analysis.done)
+        games = blunders = 0
+        for entry in analysis.run(defaults[0], int(defaults[2])):
+            games += 1
+            blunders += sum(entry['blunders'].values())
+            print(f"game {entry['game']}: {len(entry['moves'])} moves, winner {entry['winner']}, "
+                  f"blunders white {entry['blunders']['white']} black {entry['blunders']['black']}")
+        print(f"{games} games analyzed ({skipped} already in {defaults[1]}), {blunders} blunders")
+        print(analysis.summary())
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,101 @@
+"""
+Scaling benchmark for board variants: positions are sampled from random games of every variant and the
+costs that grow with the board are timed per position, move generation (the legal move index of Game,
+the move enumeration of the AI and FastEngine for comparison), evaluation and snapshots (the deep copy
+the AI makes per candidate move and the pickled size of an undo snapshot). The per-position times show
+where the nested-list representation stops scaling
+"""
+
+import pickle
+import random
+import sys
+import time
+from constants import SUPPLY, parse_variant
+from fast_engine import FastEngine
+from fuzz import reference_make
+from move_index import LegalMoveIndex
+from play_game import BaseGame
+from player import HeuristicAI
+from state import GameState
+
+DEFAULT_VARIANTS = '4x3,6x3,8x3,4x5,8x5'
+
+
+def sample_positions(size, eras, supply, count, rng, max_turns=60):
+    """
+    Positions of count random games of a variant, taken at random turns
+    """
+    positions = []
+    while len(positions) < count:
+        game = BaseGame(HeuristicAI('white'), HeuristicAI('black'), current=0, use_history=False, verbose=False,
+                        size=size, eras=eras, supply=supply)
+        engine = FastEngine.from_game(game)
+        stop = rng.randrange(1, max_turns)
+        while game.turn < stop and not engine.is_over():
+            legal = engine.legal_moves() if engine.has_pieces_in_focus() else [(None, None, None)]
+            if not legal:
+                break
+            symbol, dir1, dir2 = rng.choice(legal)
+            focus = rng.choice([e for i, e in enumerate(engine.era_names) if i != engine.focus[engine.current]])
+            reference_make(game, symbol, dir1, dir2, focus)
+            engine.make(symbol, dir1, dir2, focus)
+        if not engine.is_over():
+            positions.append(game)
+    return positions
+
+
+def _time(function, positions, repeat):
+    """
+    Mean microseconds of function(position) over the positions
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for game in positions:
+            function(game)
+    return (time.perf_counter() - started) / (repeat * len(positions)) * 1e6
+
+
+def measure(size, eras, supply=None, positions=20, repeat=3, seed=0):
+    """
+    Per-position costs of one variant in microseconds, the mean number of legal moves and the snapshot bytes
+    """
+    games = sample_positions(size, eras, supply, positions, random.Random(seed))
+    engines = [FastEngine.from_game(game) for game in games]
+    by_id = {id(game): engine for game, engine in zip(games, engines)}
+    result = {'variant': f"{size}x{eras}x{supply or SUPPLY}",
+              'moves': sum(sum(1 for _ in LegalMoveIndex(g).moves()) for g in games) / len(games)}
+    result['index'] = _time(LegalMoveIndex, games, repeat)
+    result['enumerate'] = _time(lambda g: g.enumerate_all_moves(g.current_player()), games, 1)
+    result['fast'] = _time(lambda g: by_id[id(g)].legal_moves(), games, repeat)
+    result['eval'] = _time(lambda g: g.current_player().score_system(g, 3, 2, 1, 1, 1), games, repeat * 10)
+    result['copy'] = _time(lambda g: g.copy_without_history(), games, repeat)
+    result['snapshot'] = _time(GameState, games, repeat)
+    result['bytes'] = sum(len(pickle.dumps(GameState(g))) for g in games) / len(games)
+    return result
+
+
+class Main:
+    """
+    Scaling benchmark runner: python bench_scaling.py [variants like 4x3,8x5x12] [positions] [repeat]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = [DEFAULT_VARIANTS, '20', '3']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        print(f"{'variant':>9} {'moves':>6} {'index us':>9} {'enum us':>9} {'fast us':>8} {'eval us':>8} "
+              f"{'copy us':>8} {'snap us':>8} {'snap B':>7}")
+        for variant in defaults[0].split(','):
+            size, eras, supply = parse_variant(variant)
+            r = measure(size, eras, supply, int(defaults[1]), int(defaults[2]))
+            print(f"{r['variant']:>9} {r['moves']:6.1f} {r['index']:9.0f} {r['enumerate']:9.0f} {r['fast']:8.0f} "
+                  f"{r['eval']:8.1f} {r['copy']:8.0f} {r['snapshot']:8.0f} {r['bytes']:7.0f}")
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -9,10 +9,11 @@ class HighestScoreMoveIterator:
     specifically design for Heuristic AI player
     """
 
-    def __init__(self, game, player):
-        """Initiate the process to create the best move iterator"""
+    def __init__(self, game, player, deadline=None):
+        """Initiate the process to create the best move iterator, the enumeration stops early past the deadline"""
         self.game = game
         self.player = player
+        self.deadline = deadline
         self.current_max_score = -float('inf')
         self.best_moves = []
         self._evaluated = False
@@ -21,7 +22,7 @@ class HighestScoreMoveIterator:
     def _evaluate_moves(self):
         """Get all the potential moves, iterate to get the best moves with highest scores, shuffle them to break the ties"""
         if not self._evaluated:
-            for move in self.game.enumerate_all_moves(self.player):
+            for move in self.game.enumerate_all_moves(self.player, self.deadline):
                 _, _, _, _, score = move
                 
                 if score > self.current_max_score:
@@ -1,10 +1,14 @@
+from constants import SIZE
+
+
 class Board:
     """This class is designed to create a board that is needed in the board game"""
 
-    def __init__(self, era):
-        """Attributes like ara is used to initiate the current board and the board contains grid which is represent by list"""
+    def __init__(self, era, size=SIZE):
+        """Attributes like ara is used to initiate the current board and the board contains grid which is represent by list, size x size cells"""
         self.era = era
-        self.grid = [[None for _ in range(4)] for _ in range(4)]
+        self.size = size
+        self.grid = [[None for _ in range(size)] for _ in range(size)]
 
     def place_piece(self, piece):
         """Place a piece on the board based on the piece's coordinates"""
@@ -22,19 +26,20 @@ class Board:
 
     def get_piece(self, x, y):
         """Get the piece based on the required coordinates. If not piece there, just return None"""
-        if 0 <= x < 4 and 0 <= y < 4:
+        if 0 <= x < self.size and 0 <= y < self.size:
             return self.grid[x][y]
         return None
 
     def is_within_bounds(self, x, y):
         """Check the input coordinates are in the board or not -> Used for detecting squeezing a piece or checking available moves"""
-        return 0 <= x < 4 and 0 <= y < 4
+        return 0 <= x < self.size and 0 <= y < self.size
     
     def display(self):
         """Display the board in CLI to show how the board is currently like"""
         result = ""
+        border = "+-" * self.size + "+"
         for row in self.grid:
-            result += "+-+-+-+-+\n"
+            result += border + "\n"
             result += "|" + "|".join(f"{p.symbol if p else ' '}" for p in row) + "|\n"
-        result += "+-+-+-+-+"
+        result += border
         return result
\ No newline at end of file
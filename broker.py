@@ -0,0 +1,269 @@
+"""
+Batched move selection for many games in one process. AI players await MoveBroker.request instead of calling
+select_move, the broker collects the requests until batch_size are pending or max_wait seconds passed since the
+first one, then generates the candidate moves of all of them on FastEngine, scores every candidate position in
+one matrix product per evaluator and answers each request with its best move. A batch is chosen on the broker's
+executor, one batch at a time by default, so the event loop keeps serving while it runs and the requests that
+come in meanwhile make up the next batch. A larger batch or a longer wait raises throughput at the cost of latency. HeuristicAI and LearnedAI are batched with the scores they would give
+themselves; the move cache and the opening book are not consulted
+"""
+
+import asyncio
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fast_engine import FastEngine
+from learned_eval import CELLS, LearnedAI
+from util import percentile
+from move import Move
+from play_game import BaseGame
+from player import HeuristicAI
+from search import moves
+
+WIN_SCORE = 9999
+
+
+def central_mask(size):
+    """
+    Cells of a board counted by the centrality term c4 of Player.eval
+    """
+    return np.array([1 <= x <= size - 2 and 1 <= y <= size - 2 for x in range(size) for y in range(size)])
+
+
+class MoveBroker:
+    """
+    Collects move requests of AI players and answers them in batches
+    """
+    def __init__(self, batch_size=32, max_wait=0.005, seed=None, executor=None):
+        """
+        Flush when batch_size requests are pending or max_wait seconds after the first pending one. Batches are
+        chosen on the executor, a single thread of the broker's own when none is given
+        """
+        self._own_executor = executor is None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='broker') if executor is None else executor
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.rng = random.Random(seed)
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.requests = 0
+        self.candidates = 0
+        self.seconds = 0.0
+
+    @staticmethod
+    def supports(player):
+        """
+        Check whether the broker can choose the moves of the player
+        """
+        return isinstance(player, HeuristicAI)
+
+    async def request(self, game):
+        """
+        Best Move of the player to move, answered with the next batch
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((game, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        """
+        Send the pending requests to the executor as one batch
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        done = asyncio.get_running_loop().run_in_executor(self.executor, self.choose, [game for game, _ in batch])
+        done.add_done_callback(lambda done: self._answer(batch, done))
+
+    @staticmethod
+    def _answer(batch, done):
+        """
+        Resolve the requests of a batch with the chosen moves, or with the error of the batch
+        """
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result()[i])
+
+    def close(self):
+        """
+        Stop the broker's own executor
+        """
+        if self._own_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    def _scorer(self, player):
+        """
+        Key and weights of the player's evaluator: c1..c5 weights, and for LearnedAI the own and opponent
+        piece-square weights and the bias. LearnedAI scores from the opponent's side and negates, like
+        LearnedEvaluator.score
+        """
+        if isinstance(player, LearnedAI):
+            evaluator = LearnedAI._evaluators[player.model_file]
+            return player.model_file, (np.array(evaluator.terms), evaluator.weights[:CELLS],
+                                       evaluator.weights[CELLS:2 * CELLS], evaluator.bias, True)
+        return player.weights, (np.array(player.weights, dtype=np.float64), None, None, 0.0, False)
+
+    def _score(self, group):
+        """
+        Scores of a group of candidates with the same board variant and evaluator. The positions are an
+        (n, eras, cells) array of 0 for the mover's pieces, 1 for the opponent's and 2 for empty cells,
+        every term of Player.eval is computed for all of them at once
+        """
+        size, eras, _ = group['key']
+        terms_weights, own_square, other_square, bias, flip = group['weights']
+        n = len(group['codes'])
+        codes = np.array(group['codes'], dtype=np.int8).reshape(n, eras, size * size)
+        mover, waiting = codes == 0, codes == 1
+        own, other, side = (waiting, mover, 1) if flip else (mover, waiting, 0)
+        terms = np.stack([own.any(axis=2).sum(axis=1),
+                          own.sum(axis=(1, 2)) - other.sum(axis=(1, 2)),
+                          np.array(group['supply'])[:, side],
+                          (own & central_mask(size)).sum(axis=(1, 2)),
+                          own[np.arange(n), np.array(group['focus'])[:, side]].sum(axis=1)], axis=1)
+        scores = terms @ terms_weights + bias
+        if own_square is not None:
+            scores = scores + own.reshape(n, -1) @ own_square + other.reshape(n, -1) @ other_square
+        if flip:
+            scores = -scores
+        wins = waiting.any(axis=2).sum(axis=1) <= 1
+        return np.where(wins, WIN_SCORE, scores)
+
+    def choose(self, games):
+        """
+        Best Move of the player to move in each game, ties broken at random like HighestScoreMoveIterator
+        """
+        started = time.perf_counter()
+        groups = {}
+        owners = []
+        for i, game in enumerate(games):
+            engine = FastEngine.from_game(game)
+            color = engine.current
+            scorer, weights = self._scorer(game.current_player())
+            key = (engine.size, engine.eras, scorer)
+            group = groups.setdefault(key, {'key': key, 'weights': weights, 'codes': [], 'supply': [], 'focus': []})
+            side = {symbol: 0 if owner == color else 1 for symbol, owner in engine.owner.items()}
+            side[None] = 2
+            for move in moves(engine):
+                undo = engine.make(*move)
+                owners.append((i, key, len(group['codes']), move, engine.era_names))
+                group['codes'].append([side[symbol] for symbol in engine.cells])
+                group['supply'].append((engine.supply[color], engine.supply[1 - color]))
+                group['focus'].append((engine.focus[color], engine.focus[1 - color]))
+                engine.unmake(undo)
+        scores = {key: self._score(group) for key, group in groups.items()}
+        best = [(-np.inf, []) for _ in games]
+        for i, key, row, move, names in owners:
+            score = scores[key][row]
+            if score > best[i][0]:
+                best[i] = (score, [(move, names)])
+            elif score == best[i][0]:
+                best[i][1].append((move, names))
+        chosen = []
+        for game, (_, tied) in zip(games, best):
+            (symbol, dir1, dir2, era), names = self.rng.choice(tied)
+            chosen.append(Move(game.find_piece(symbol) if symbol else None, dir1, dir2, names[era]))
+        self.batches += 1
+        self.requests += len(games)
+        self.candidates += len(owners)
+        self.seconds += time.perf_counter() - started
+        return chosen
+
+    def summary(self):
+        """
+        Batch statistics for the runner output
+        """
+        mean = self.requests / self.batches if self.batches else 0.0
+        rate = self.candidates / self.seconds if self.seconds else 0.0
+        return (f"{self.requests} requests in {self.batches} batches ({mean:.1f} per batch), "
+                f"{self.candidates} candidates scored ({rate:,.0f}/s)")
+
+
+async def play_brokered(broker, max_turns, latencies):
+    """
+    One HeuristicAI game with every move chosen by the broker, return the number of moves
+    """
+    game = BaseGame(HeuristicAI('white'), HeuristicAI('black'), current=0, use_history=False, verbose=False)
+    while game.turn <= max_turns and not game.is_winning_move(game.current_player()):
+        started = time.perf_counter()
+        move = await broker.request(game)
+        latencies.append(time.perf_counter() - started)
+        move.apply(game)
+        game.turn += 1
+        game.current = 1 - game.current
+    return game.turn - 1
+
+
+async def run_games(games, batch_size, max_wait, max_turns):
+    """
+    Play games concurrently through one broker, return the broker, the number of moves, the time and the latencies
+    """
+    broker, latencies = MoveBroker(batch_size, max_wait), []
+    started = time.perf_counter()
+    try:
+        counts = await asyncio.gather(*(play_brokered(broker, max_turns, latencies) for _ in range(games)))
+    finally:
+        broker.close()
+    return broker, sum(counts), time.perf_counter() - started, latencies
+
+
+def run_unbatched(games, max_turns):
+    """
+    Baseline: the same games with HeuristicAI.select_move, one game after another
+    """
+    total, started = 0, time.perf_counter()
+    for _ in range(games):
+        game = BaseGame(HeuristicAI('white'), HeuristicAI('black'), current=0, use_history=False, verbose=False)
+        while game.turn <= max_turns and not game.is_winning_move(game.current_player()):
+            player = game.current_player()
+            player.announce = False
+            player.select_move(game).apply(game)
+            game.turn += 1
+            game.current = 1 - game.current
+            total += 1
+    return total, time.perf_counter() - started
+
+
+class Main:
+    """
+    Batching benchmark: python broker.py [games] [batch size] [max wait in ms] [max turns]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['64', '32', '5', '60']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        games, batch_size, max_wait, max_turns = int(defaults[0]), int(defaults[1]), float(defaults[2]) / 1000, int(defaults[3])
+        for size in sorted({1, batch_size}):
+            broker, total, elapsed, latencies = asyncio.run(run_games(games, size, max_wait, max_turns))
+            print(f"batch {size}: {total} moves in {elapsed:.2f}s ({total / elapsed:,.0f} moves/s), latency "
+                  f"p50 {percentile(latencies, 0.5) * 1000:.1f}ms p99 {percentile(latencies, 0.99) * 1000:.1f}ms")
+            print(f"  {broker.summary()}")
+        baseline_games = max(1, games // 8)
+        total, elapsed = run_unbatched(baseline_games, max_turns)
+        print(f"select_move: {total} moves of {baseline_games} games in {elapsed:.2f}s ({total / elapsed:,.0f} moves/s)")
+
+
+if __name__ == '__main__':
+    Main.run()
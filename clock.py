@@ -0,0 +1,253 @@
+"""
+Clocks and time management: every player starts with base seconds and gets increment seconds back after
+each move. The drivers ask a TimeAllocator for a soft and a hard budget per move, the AI search stops
+enumerating at the soft deadline and the driver stops waiting at the hard one and plays a fallback move.
+Every timed move can be appended to a JSON lines latency log
+"""
+
+import json
+import sys
+import threading
+import time
+from move import Move
+import metrics
+
+DEFAULT_LATENCY_LOG = 'move_latency.jsonl'
+
+
+def parse_time_control(text):
+    """
+    Time control from the command line: '<base>+<increment>' in seconds, or None for 'off'
+    """
+    if text.lower() == 'off':
+        return None
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+
+class GameClock:
+    """
+    Chess clock of a game: remaining seconds per color, only the clock of the player to move runs
+    """
+    def __init__(self, base=300.0, increment=2.0):
+        """
+        Start both clocks with base seconds
+        """
+        self.base = base
+        self.increment = increment
+        self.remaining = {'white': base, 'black': base}
+        self._running = None
+
+    def start(self, color):
+        """
+        Start the clock of the color
+        """
+        self._running = (color, time.perf_counter())
+
+    def stop(self):
+        """
+        Stop the running clock, charge the time used and add the increment unless the flag fell.
+        Return the time used
+        """
+        if self._running is None:
+            return 0.0
+        color, started = self._running
+        elapsed = time.perf_counter() - started
+        self._running = None
+        self.remaining[color] -= elapsed
+        if self.remaining[color] >= 0:
+            self.remaining[color] += self.increment
+        return elapsed
+
+    def left(self, color):
+        """
+        Remaining seconds of the color, counting the time on the running clock
+        """
+        left = self.remaining[color]
+        if self._running and self._running[0] == color:
+            left -= time.perf_counter() - self._running[1]
+        return left
+
+    def flagged(self, color):
+        """
+        Check whether the color has run out of time
+        """
+        return self.remaining[color] < 0
+
+    def summary(self):
+        """
+        Remaining time of both players for the status output
+        """
+        return ", ".join(f"{color} {max(0.0, self.left(color)):.1f}s" for color in self.remaining)
+
+
+class TimeAllocator:
+    """
+    Time allocation policy: the soft budget spreads the remaining time over the moves expected to be left
+    plus most of the increment, the hard budget allows a few times more but never a large share of the clock
+    """
+    def __init__(self, moves_to_go=30, min_moves_to_go=10, hard_factor=4.0, hard_share=0.3, overhead=0.02):
+        """
+        Save the parameters of the policy, overhead is kept back for the driver itself
+        """
+        self.moves_to_go = moves_to_go
+        self.min_moves_to_go = min_moves_to_go
+        self.hard_factor = hard_factor
+        self.hard_share = hard_share
+        self.overhead = overhead
+
+    def budget(self, clock, color, turn):
+        """
+        Soft and hard budget in seconds for the move of the color
+        """
+        remaining = max(0.0, clock.remaining[color] - self.overhead)
+        left = max(self.min_moves_to_go, self.moves_to_go - turn // 2)
+        soft = remaining / left + 0.75 * clock.increment
+        hard = min(soft * self.hard_factor, remaining * self.hard_share + clock.increment, remaining)
+        return min(soft, hard), hard
+
+
+class LatencyLog:
+    """
+    Append-only JSON lines log of timed moves, with the position hash and size to find the slow positions
+    """
+    def __init__(self, path=DEFAULT_LATENCY_LOG):
+        """
+        Open the log for appending
+        """
+        self.path = path
+        self._file = open(path, 'a')
+
+    def record(self, game, player, elapsed, soft, hard, status):
+        """
+        Write one entry for a move that has been chosen but not applied yet
+        """
+        entry = {'turn': game.turn, 'color': player.color, 'player': type(player).__name__,
+                 'elapsed': round(elapsed, 6), 'soft': soft, 'hard': hard, 'status': status,
+                 'remaining': game.clock.remaining[player.color] if game.clock else None,
+                 'pieces': sum(len(p.pieces) for p in game.players),
+                 'moves': sum(1 for _ in game.legal_moves().moves()), 'hash': game.position_hash()}
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """
+        Close the log file
+        """
+        self._file.close()
+
+
+def fallback_move(game):
+    """
+    Cheapest legal move of the player to move, played when the search missed its hard deadline
+    """
+    player = game.current_player()
+    focus = game.focus[player.color]
+    next_focus = next(era for era in game.eras if era != focus)
+    for symbol, dir1, dir2 in game.legal_moves().moves():
+        return Move(game.find_piece(symbol), dir1, dir2, next_focus)
+    return Move(None, None, None, next_focus)
+
+
+class MoveTimer:
+    """
+    Driver side of the time management. Human moves only run the clock, AI moves get the soft deadline
+    and run on a snapshot of the game in a worker thread that is told to stop at the hard deadline
+    """
+    def __init__(self, allocator=None, log=None):
+        """
+        Use the allocation policy and an optional LatencyLog
+        """
+        self.allocator = allocator or TimeAllocator()
+        self.log = log
+        self.timeouts = 0
+
+    def select(self, game, player, choose, human=False):
+        """
+        Get the move of the player with choose(game, player) under the game clock.
+        Return (move, status) where status is 'ok', 'timeout' (fallback move played) or 'flag' (out of time)
+        """
+        clock = game.clock
+        soft, hard = self.allocator.budget(clock, player.color, game.turn) if clock else (None, None)
+        started = time.perf_counter()
+        if clock:
+            clock.start(player.color)
+        status = 'ok'
+        if human or not clock:
+            move = choose(game, player)
+        else:
+            move = self._search(game, player, choose, started + soft, hard)
+            if move is None:
+                status = 'timeout'
+                self.timeouts += 1
+                move = fallback_move(game)
+        elapsed = clock.stop() if clock else time.perf_counter() - started
+        if clock and clock.flagged(player.color):
+            status = 'flag'
+        if self.log:
+            self.log.record(game, player, elapsed, soft, hard, status)
+        recorder = metrics.current()
+        if recorder:
+            recorder.record_move(game, player, elapsed)
+        return move, status
+
+    def _search(self, game, player, choose, deadline, hard):
+        """
+        Run choose on a snapshot in a daemon thread, return the Move mapped back to the game or None
+        when the thread is still running after the hard budget. Then the stop event of the snapshot is set,
+        so the enumeration returns at its next move instead of running on in the background
+        """
+        snapshot = game.copy_without_history()
+        snapshot.stop_event = threading.Event()
+        searcher = snapshot.players[game.players.index(player)]
+        searcher.deadline = deadline
+        result = []
+        thread = threading.Thread(target=lambda: result.append(choose(snapshot, searcher)), daemon=True)
+        thread.start()
+        thread.join(hard)
+        if not result:
+            snapshot.stop_event.set()
+            return None
+        move = result[0]
+        piece = game.find_piece(move.piece.symbol) if move.piece else None
+        return Move(piece, move.dir1, move.dir2, move.focus_next)
+
+
+def slow_positions(path, limit=10):
+    """
+    Entries of a latency log that exceeded their soft budget, slowest relative to the budget first
+    """
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    over = [e for e in entries if e['soft'] and e['elapsed'] > e['soft']]
+    over.sort(key=lambda e: e['elapsed'] / e['soft'], reverse=True)
+    return entries, over[:limit]
+
+
+class Main:
+    """
+    Latency report runner: python clock.py [latency log] [number of positions]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = [DEFAULT_LATENCY_LOG, '10']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        entries, over = slow_positions(defaults[0], int(defaults[1]))
+        statuses = {}
+        for entry in entries:
+            statuses[entry['status']] = statuses.get(entry['status'], 0) + 1
+        print(f"{len(entries)} moves: " + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
+        for e in over:
+            print(f"turn {e['turn']} {e['color']} {e['player']}: {e['elapsed'] * 1000:.0f}ms of "
+                  f"{e['soft'] * 1000:.0f}ms soft / {e['hard'] * 1000:.0f}ms hard, {e['pieces']} pieces, "
+                  f"{e['moves']} moves, {e['status']}, position {e['hash']}")
+
+
+if __name__ == '__main__':
+    Main.run()
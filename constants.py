@@ -10,7 +10,9 @@ TIMESHIFT: key is the time travel direction, value defines how the current board
 "f" -> foward (from past to present, from present to future)
 "b" -> backward (from future to present, from present to past)
 
-ERAS: In total, there are three eras in the game
+ERAS: In total, there are three eras in the game by default, era_names gives the names for other era counts
+
+SIZE and SUPPLY: the default board size and number of pieces per player, a game can be set up with others
 
 weights: they are used for some player type to evaluate their potential moves with the most gains
 based on several criterion
@@ -21,4 +23,30 @@ The weights can be changed here
 DIRECTIONS = {'n': (-1, 0), 's': (1, 0), 'e': (0, 1), 'w': (0, -1)}
 TIMESHIFT = {'f': 1, 'b': -1}
 ERAS = ['past', 'present', 'future']
-w1, w2, w3, w4, w5 = 3, 2, 1, 1, 1
\ No newline at end of file
+SIZE = 4
+SUPPLY = 7
+w1, w2, w3, w4, w5 = 3, 2, 1, 1, 1
+
+
+def era_names(count):
+    """
+    Names of the eras of a game with count eras, the usual three for 3
+    """
+    if count == len(ERAS):
+        return list(ERAS)
+    if count < 2:
+        raise ValueError("A game needs at least two eras")
+    return ['past'] + [f"present{i}" for i in range(1, count - 1)] + ['future']
+
+
+def parse_variant(text):
+    """
+    Board variant from the command line: '<size>x<eras>' or '<size>x<eras>x<supply>', 'off' for the default game.
+    Return (size, eras, supply) where supply is None for the default
+    """
+    if text.lower() == 'off':
+        return SIZE, len(ERAS), None
+    parts = [int(part) for part in text.lower().split('x')]
+    if len(parts) not in (2, 3):
+        raise ValueError("Variant must look like 6x3 or 6x3x9")
+    return parts[0], parts[1], parts[2] if len(parts) == 3 else None
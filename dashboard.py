@@ -0,0 +1,219 @@
+import sys
+import time
+import tkinter as tk
+from play_game import BaseGame
+from selfplay import make_player, parse_spec
+
+
+class FrameScheduler:
+    """Shared frame clock of the dashboard: one Tk timer runs the game work between frames and renders at most fps frames per second"""
+    def __init__(self, root, work, render, fps=30, turbo=False, work_share=0.8):
+        """work() advances one game and returns False when nothing was due, render() draws a frame. Work runs for at most work_share of every frame"""
+        self.root = root
+        self.work = work
+        self.render = render
+        self.fps = fps
+        self.turbo = turbo
+        self.work_share = work_share
+        self.frames = 0
+        self.dropped = 0
+        self._next_frame = None
+        self._started = None
+
+    def start(self):
+        """Start the timer"""
+        self._started = self._next_frame = time.perf_counter()
+        self.root.after(0, self._tick)
+
+    def _tick(self):
+        """Run the work that is due, render when the frame is due and sleep until the next frame or work item"""
+        interval = 1.0 / self.fps
+        stop = time.perf_counter() + interval * self.work_share
+        while self.work() and time.perf_counter() < stop:
+            pass
+        now = time.perf_counter()
+        if now >= self._next_frame:
+            self.render()
+            self.frames += 1
+            missed = int((now - self._next_frame) / interval)
+            self.dropped += missed
+            self._next_frame += (missed + 1) * interval
+        delay = 1 if self.turbo else max(1, int((self._next_frame - time.perf_counter()) * 1000))
+        self.root.after(delay, self._tick)
+
+    def rate(self):
+        """Frames per second rendered since the start"""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return self.frames / elapsed if elapsed else 0.0
+
+
+class MiniGame:
+    """One AI-vs-AI game of the dashboard, moves are paced by move_delay outside turbo mode"""
+    def __init__(self, index, white, black, max_turns=200, move_delay=0.5):
+        """Start a game between two player specs"""
+        self.index = index
+        self.specs = (white, black)
+        self.max_turns = max_turns
+        self.move_delay = move_delay
+        self.results = {'white': 0, 'black': 0, None: 0}
+        self.moves = 0
+        self.new_game()
+
+    def new_game(self):
+        """Start the next game of the pairing"""
+        self.game = BaseGame(make_player('white', self.specs[0]), make_player('black', self.specs[1]),
+                             current=0, use_history=False, verbose=False)
+        for player in self.game.players:
+            player.announce = False
+        self.over = False
+        self.winner = None
+        self.finished_at = None
+        self.due = time.perf_counter()
+        self.version = 0
+        self.drawn = -1
+
+    def step(self, now, turbo, hold=2.0):
+        """Play one move when it is due, restart a finished game after showing it for hold seconds. Return True when something changed"""
+        if self.over:
+            if now - self.finished_at < (0 if turbo else hold):
+                return False
+            self.new_game()
+            return True
+        if not turbo and now < self.due:
+            return False
+        game = self.game
+        game.current_player().select_move(game).apply(game)
+        game.turn += 1
+        game.current = 1 - game.current
+        if game.is_winning_move(game.current_player()):
+            self.over, self.winner = True, game.get_opponent().color
+        elif game.turn > self.max_turns:
+            self.over = True
+        if self.over:
+            self.finished_at = now
+            self.results[self.winner] += 1
+        self.due = now + self.move_delay
+        self.moves += 1
+        self.version += 1
+        return True
+
+
+class Dashboard:
+    """Grid of mini boards for many AI-vs-AI games with a capped frame rate. Games that advance faster than the display only show their latest position"""
+    def __init__(self, root, games=16, white=('heuristic', None), black=('heuristic', None), fps=30, turbo=False,
+                 max_turns=200, columns=4, cell_size=12, move_delay=0.5):
+        """Create the games, the canvases and the scheduler"""
+        self.root = root
+        self.root.title("Board Game - Dashboard")
+        self.cell_size = cell_size
+        self.games = [MiniGame(i, white, black, max_turns, move_delay) for i in range(games)]
+        self.era_colors = {'past': '#E6D5B8', 'present': '#F0F0F0', 'future': '#B8D5E6'}
+        self.skipped = 0
+        self._next_game = 0
+        self.scheduler = FrameScheduler(root, self.work, self.render, fps, turbo)
+        self.setup_ui(columns)
+        self.scheduler.start()
+
+    def setup_ui(self, columns):
+        """One small canvas with a caption per game, a status line and a turbo switch"""
+        grid = tk.Frame(self.root)
+        grid.pack(padx=5, pady=5)
+        self.canvases, self.captions = [], []
+        game = self.games[0].game
+        size, eras = game.size, game.eras
+        width = len(eras) * (size * self.cell_size + 4)
+        for i in range(len(self.games)):
+            frame = tk.Frame(grid, bd=1, relief=tk.GROOVE)
+            frame.grid(row=i // columns, column=i % columns, padx=3, pady=3)
+            caption = tk.Label(frame, text="", font=('Arial', 8))
+            caption.pack()
+            canvas = tk.Canvas(frame, width=width, height=size * self.cell_size, highlightthickness=0)
+            canvas.pack()
+            for e, era in enumerate(eras):
+                x0 = e * (size * self.cell_size + 4)
+                canvas.create_rectangle(x0, 0, x0 + size * self.cell_size, size * self.cell_size,
+                                        fill=self.era_colors.get(era, '#F0F0F0'), outline='gray', tags=f"era{e}")
+            self.canvases.append(canvas)
+            self.captions.append(caption)
+        control = tk.Frame(self.root)
+        control.pack(fill=tk.X)
+        self.turbo_var = tk.BooleanVar(value=self.scheduler.turbo)
+        tk.Checkbutton(control, text="Turbo", variable=self.turbo_var, command=self.toggle_turbo).pack(side=tk.LEFT, padx=5)
+        tk.Button(control, text="Quit", command=self.root.quit).pack(side=tk.RIGHT, padx=5)
+        self.status_label = tk.Label(control, text="", fg="blue", anchor="w")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, padx=10)
+
+    def toggle_turbo(self):
+        """Switch between paced and full speed play"""
+        self.scheduler.turbo = self.turbo_var.get()
+
+    def work(self):
+        """Advance the next game that is due, round robin. Return False when no game was due"""
+        now = time.perf_counter()
+        for _ in range(len(self.games)):
+            mini = self.games[self._next_game]
+            self._next_game = (self._next_game + 1) % len(self.games)
+            if mini.step(now, self.scheduler.turbo):
+                return True
+        return False
+
+    def render(self):
+        """Redraw the games that changed since the last frame and the status line"""
+        for mini, canvas, caption in zip(self.games, self.canvases, self.captions):
+            if mini.drawn == mini.version:
+                continue
+            self.skipped += max(0, mini.version - mini.drawn - 1) if mini.drawn >= 0 else 0
+            mini.drawn = mini.version
+            self.draw_game(mini, canvas, caption)
+        results = [0, 0, 0]
+        for mini in self.games:
+            results[0] += mini.results['white']
+            results[1] += mini.results['black']
+            results[2] += mini.results[None]
+        self.status_label.config(
+            text=f"{self.scheduler.rate():.0f} fps, {sum(mini.moves for mini in self.games)} moves, {self.skipped} positions not drawn, "
+                 f"{self.scheduler.dropped} frames dropped | white {results[0]} black {results[1]} draws {results[2]}")
+
+    def draw_game(self, mini, canvas, caption):
+        """Draw the pieces and focus of one game"""
+        game = mini.game
+        canvas.delete("piece")
+        step, cell = game.size * self.cell_size + 4, self.cell_size
+        for e, era in enumerate(game.eras):
+            outline = 'red' if era in (game.focus['white'], game.focus['black']) else 'gray'
+            canvas.itemconfigure(f"era{e}", outline=outline)
+            for x, row in enumerate(game.boards[era].grid):
+                for y, piece in enumerate(row):
+                    if piece:
+                        x0, y0 = e * step + y * cell + 2, x * cell + 2
+                        if piece.color == 'white':
+                            canvas.create_oval(x0, y0, x0 + cell - 4, y0 + cell - 4, fill='white', outline='black', tags="piece")
+                        else:
+                            canvas.create_rectangle(x0, y0, x0 + cell - 4, y0 + cell - 4, fill='black', tags="piece")
+        state = f"{mini.winner} won" if mini.winner else "draw" if mini.over else game.current_player().color
+        caption.config(text=f"#{mini.index + 1} turn {game.turn} {state}")
+
+
+class Main:
+    """
+    Dashboard runner: python dashboard.py [games] [white] [black] [fps] [turbo on/off] [max turns] [columns]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['16', 'heuristic', 'heuristic', '30', 'off', '200', '4']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        root = tk.Tk()
+        Dashboard(root, games=int(defaults[0]), white=parse_spec(defaults[1]), black=parse_spec(defaults[2]),
+                  fps=int(defaults[3]), turbo=defaults[4].lower() == 'on', max_turns=int(defaults[5]),
+                  columns=int(defaults[6]))
+        root.mainloop()
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,227 @@
+"""
+Self-play dataset: every position of batch AI games as one fixed-size record, seen from the side to move.
+Records are streamed into memory-mapped .npy shards of shard_size rows, one series of shards per worker
+process, and index.json lists the shards with their number of filled rows
+"""
+
+import json
+import os
+import random
+import sys
+from multiprocessing import Pool
+import numpy as np
+from constants import DIRECTIONS, TIMESHIFT, ERAS
+from selfplay import play_game
+
+
+STEPS = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
+SIZE = 4
+RECORD_DTYPE = np.dtype([
+    ('eval', np.int8, (2, 5)),                       # Player.eval of the side to move and of the opponent
+    ('planes', np.uint8, (2, len(ERAS), SIZE, SIZE)),  # occupancy of own and opponent pieces per era
+    ('supply', np.int8, (2,)),
+    ('focus', np.int8, (2,)),                        # era index of the own and opponent focus
+    ('move', np.int8, (6,)),                         # era, x, y of the moved piece (-1 if none), dir1, dir2, focus
+    ('outcome', np.int8),                            # 1 the side to move won, -1 lost, 0 draw
+    ('turn', np.int16),
+    ('white', np.int8),                              # 1 when white is to move
+])
+
+
+def encode_position(game, row):
+    """
+    Fill the position fields of a record from the game, relative to the side to move
+    """
+    player, opponent = game.current_player(), game.get_opponent()
+    row['eval'] = (player.eval(game), opponent.eval(game))
+    planes = np.zeros((2, len(ERAS), SIZE, SIZE), dtype=np.uint8)
+    for side, owner in enumerate((player, opponent)):
+        for piece in owner.pieces:
+            planes[side, ERAS.index(piece.era), piece.x, piece.y] = 1
+    row['planes'] = planes
+    row['supply'] = (player.supply, opponent.supply)
+    row['focus'] = (ERAS.index(game.focus[player.color]), ERAS.index(game.focus[opponent.color]))
+    row['turn'] = game.turn
+    row['white'] = player.color == 'white'
+
+
+def encode_move(move):
+    """
+    Fixed-size encoding of a Move: square of the piece, step indexes into STEPS and the focus era index
+    """
+    if move.piece:
+        square = (ERAS.index(move.piece.era), move.piece.x, move.piece.y)
+        steps = (STEPS.index(move.dir1), STEPS.index(move.dir2))
+    else:
+        square, steps = (-1, -1, -1), (-1, -1)
+    return square + steps + (ERAS.index(move.focus_next),)
+
+
+class ShardWriter:
+    """
+    Write records into memory-mapped .npy shards of a fixed number of rows.
+    A full shard is shuffled in place before the next one is opened, so contiguous slices of a shard
+    are random samples rather than consecutive positions of one game
+    """
+    def __init__(self, directory, prefix, shard_size=65536, seed=None):
+        """
+        Start writing shards named <prefix>_<n>.npy in the directory
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.rng = np.random.default_rng(seed)
+        self.shards = []
+        self._shard = None
+        self._rows = 0
+
+    def _open(self):
+        """
+        Create the next shard file
+        """
+        name = f"{self.prefix}_{len(self.shards):05d}.npy"
+        self._shard = np.lib.format.open_memmap(os.path.join(self.directory, name), mode='w+',
+                                                dtype=RECORD_DTYPE, shape=(self.shard_size,))
+        self.shards.append({'file': name, 'rows': 0})
+        self._rows = 0
+
+    def _close_shard(self):
+        """
+        Shuffle the filled rows of the current shard and flush it to disk
+        """
+        if self._shard is None:
+            return
+        filled = self._shard[:self._rows]
+        filled[:] = filled[self.rng.permutation(self._rows)]
+        self._shard.flush()
+        self.shards[-1]['rows'] = self._rows
+        self._shard = None
+
+    def write(self, rows):
+        """
+        Append a structured array of records
+        """
+        start = 0
+        while start < len(rows):
+            if self._shard is None:
+                self._open()
+            count = min(len(rows) - start, self.shard_size - self._rows)
+            self._shard[self._rows:self._rows + count] = rows[start:start + count]
+            self._rows += count
+            start += count
+            if self._rows == self.shard_size:
+                self._close_shard()
+
+    def close(self):
+        """
+        Finish the last shard and return the shard list for the index
+        """
+        self._close_shard()
+        return self.shards
+
+
+def _generate_worker(job):
+    """
+    Worker process: play games and write their positions to the worker's own shards
+    """
+    worker, games, seed, directory, shard_size, white, black, max_turns = job
+    rng = random.Random(seed)
+    writer = ShardWriter(directory, f"w{worker:03d}", shard_size, seed)
+    positions = 0
+    for _ in range(games):
+        rows = []
+
+        def record(game, move):
+            row = np.zeros((), dtype=RECORD_DTYPE)
+            encode_position(game, row)
+            row['move'] = encode_move(move)
+            rows.append(row)
+
+        result = play_game(white, black, max_turns, rng.randrange(2 ** 32), record)
+        if not rows:
+            continue
+        batch = np.stack(rows)
+        winner_white = result.winner == 'white'
+        if result.winner is not None:
+            batch['outcome'] = np.where(batch['white'] == winner_white, 1, -1)
+        writer.write(batch)
+        positions += len(batch)
+    return writer.close(), positions
+
+
+def generate(directory, games, processes=1, shard_size=65536, white=('heuristic', None),
+             black=('heuristic', None), max_turns=200, seed=0):
+    """
+    Play the games on a process pool and write the shards and index.json into the directory
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    per_worker = [games // processes + (1 if i < games % processes else 0) for i in range(processes)]
+    jobs = [(i, n, rng.randrange(2 ** 32), directory, shard_size, white, black, max_turns)
+            for i, n in enumerate(per_worker) if n]
+    with Pool(processes) as pool:
+        results = pool.map(_generate_worker, jobs)
+    shards = [shard for worker_shards, _ in results for shard in worker_shards]
+    index = {'dtype': RECORD_DTYPE.descr, 'shard_size': shard_size, 'games': games,
+             'positions': sum(positions for _, positions in results), 'shards': shards}
+    with open(os.path.join(directory, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+class ShardDataset:
+    """
+    Read-only view of a dataset directory: shards are memory-mapped and minibatches are slices of them
+    """
+    def __init__(self, directory):
+        """
+        Load the index and map every shard
+        """
+        with open(os.path.join(directory, 'index.json')) as f:
+            self.index = json.load(f)
+        self.shards = [np.load(os.path.join(directory, shard['file']), mmap_mode='r')[:shard['rows']]
+                       for shard in self.index['shards']]
+
+    def __len__(self):
+        """
+        Number of positions in the dataset
+        """
+        return sum(len(shard) for shard in self.shards)
+
+    def minibatches(self, batch_size, seed=None):
+        """
+        Yield minibatches in random order over all shards, each one a zero-copy slice of a shard. The blocks of
+        all shards are shuffled together, and the rows left at the end of a shard come as one shorter batch
+        """
+        blocks = [(i, start) for i, shard in enumerate(self.shards) for start in range(0, len(shard), batch_size)]
+        random.Random(seed).shuffle(blocks)
+        for i, start in blocks:
+            yield self.shards[i][start:start + batch_size]
+
+    def all(self):
+        """
+        Iterate the shards as whole arrays
+        """
+        return iter(self.shards)
+
+
+class Main:
+    """
+    Dataset runner: python dataset.py [games] [processes] [directory] [shard size]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['1000', str(os.cpu_count() or 1), 'selfplay_data', '65536']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        index = generate(defaults[2], int(defaults[0]), int(defaults[1]), int(defaults[3]))
+        print(f"{index['positions']} positions from {index['games']} games in {len(index['shards'])} shards")
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,252 @@
+"""
+Make/unmake engine: the position is one flat list of piece symbols over all eras, indexed
+era * size * size + x * size + y, plus the cell of every symbol. A move writes its changes to a journal
+so it can be taken back without copying anything. The rules follow Game exactly, including the
+push chains of _move_current_board and the piece spawned by _move_temporal
+"""
+
+from constants import DIRECTIONS, TIMESHIFT, ERAS, SIZE, era_names
+
+STEPS = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
+_NEIGHBORS = {}
+
+
+def neighbors(size, eras):
+    """
+    Shared table of a board variant: cell -> direction -> next cell in the same era, None past the edge
+    """
+    if (size, eras) not in _NEIGHBORS:
+        table = {}
+        for cell in range(eras * size * size):
+            x, y = divmod(cell % (size * size), size)
+            table[cell] = {d: cell + dx * size + dy if 0 <= x + dx < size and 0 <= y + dy < size else None
+                           for d, (dx, dy) in DIRECTIONS.items()}
+        _NEIGHBORS[size, eras] = table
+    return _NEIGHBORS[size, eras]
+
+
+class FastEngine:
+    """
+    Flat-array game state with make/unmake. Colors are 0 for white and 1 for black
+    """
+    def __init__(self, size=SIZE, eras=len(ERAS)):
+        """
+        Empty position, use from_game to copy a Game
+        """
+        self.size = size
+        self.eras = eras
+        self.era_names = era_names(eras)
+        self.area = size * size
+        self.cells = [None] * (eras * self.area)
+        self.where = {}
+        self.owner = {}
+        self.supply = [0, 0]
+        self.symbols = [[], []]
+        self.spawned = [0, 0]
+        self.focus = [0, 0]
+        self.current = 0
+        self.turn = 1
+        self.colors = ['white', 'black']
+        self._journal = []
+        self._steps = neighbors(size, eras)
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Engine with the position of a Game
+        """
+        engine = cls(game.size, len(game.eras))
+        for i, player in enumerate(game.players):
+            engine.colors[i] = player.color
+            engine.supply[i] = player.supply
+            engine.symbols[i] = list(player.symbols)
+            engine.focus[i] = game.eras.index(game.focus[player.color])
+            for piece in player.pieces:
+                cell = engine.cell(game.eras.index(piece.era), piece.x, piece.y)
+                engine.cells[cell] = piece.symbol
+                engine.where[piece.symbol] = cell
+                engine.owner[piece.symbol] = i
+            for symbol in player.symbols:
+                engine.owner[symbol] = i
+        engine.current = game.current
+        engine.turn = game.turn
+        return engine
+
+    def cell(self, era, x, y):
+        """
+        Flat index of a square
+        """
+        return era * self.area + x * self.size + y
+
+    def alive(self, symbol):
+        """
+        Check whether the piece with the symbol is on the board
+        """
+        cell = self.where.get(symbol)
+        return cell is not None and self.cells[cell] == symbol
+
+    def _set(self, cell, symbol):
+        """
+        Write a cell and journal its old content
+        """
+        self._journal.append((cell, self.cells[cell]))
+        self.cells[cell] = symbol
+        if symbol is not None:
+            self.where[symbol] = cell
+
+    def _can_step(self, cell, direction, color):
+        """
+        Same checks as Game.can_move for the piece on the cell
+        """
+        if direction in DIRECTIONS:
+            target = self._steps[cell][direction]
+            if target is None:
+                return False
+            other = self.cells[target]
+            return other is None or self.owner[other] != color
+        era = cell // self.area + TIMESHIFT[direction]
+        if era < 0 or era >= self.eras:
+            return False
+        if TIMESHIFT[direction] == -1 and self.supply[color] <= 0:
+            return False
+        return self.cells[cell + TIMESHIFT[direction] * self.area] is None
+
+    def _push(self, cell, direction):
+        """
+        Move the piece on the cell one step, pushing the chain in front of it like Game._move_current_board.
+        Return the cell the piece lands on
+        """
+        steps = self._steps
+        chain = [cell, steps[cell][direction]]
+        while True:
+            nxt = chain[-1]
+            if self.cells[nxt] is None:
+                break
+            beyond = steps[nxt][direction]
+            if beyond is None:
+                self._set(nxt, None)
+                break
+            other = self.cells[beyond]
+            if other is not None and self.owner[other] == self.owner[self.cells[nxt]]:
+                self._set(nxt, None)
+                self._set(beyond, None)
+                break
+            chain.append(beyond)
+        for i in range(len(chain) - 2, -1, -1):
+            self._set(chain[i + 1], self.cells[chain[i]])
+            self._set(chain[i], None)
+        return chain[1]
+
+    def _step(self, cell, direction, color):
+        """
+        Apply one step of the piece on the cell, return its new cell
+        """
+        if direction in DIRECTIONS:
+            return self._push(cell, direction)
+        symbol = self.cells[cell]
+        target = cell + TIMESHIFT[direction] * self.area
+        self._set(target, symbol)
+        if TIMESHIFT[direction] == -1:
+            self.supply[color] -= 1
+            spawn = self.symbols[color][self.spawned[color]]
+            self.spawned[color] += 1
+            self._set(cell, spawn)
+        else:
+            self._set(cell, None)
+        return target
+
+    def make(self, symbol, dir1, dir2, focus_next):
+        """
+        Play a move of the side to move like Move.apply followed by the driver's turn change.
+        Return the undo record for unmake
+        """
+        color = self.current
+        undo = (len(self._journal), self.supply[color], self.spawned[color], self.focus[color], self.turn)
+        if symbol is not None:
+            cell = self._step(self.where[symbol], dir1, color)
+            self._step(cell, dir2, color)
+        self.focus[color] = self.era_names.index(focus_next) if isinstance(focus_next, str) else focus_next
+        self.turn += 1
+        self.current = 1 - color
+        return undo
+
+    def unmake(self, undo):
+        """
+        Take back the last move made
+        """
+        mark, supply, spawned, focus, turn = undo
+        self.current = 1 - self.current
+        color = self.current
+        self._rollback(mark)
+        self.supply[color], self.spawned[color], self.focus[color], self.turn = supply, spawned, focus, turn
+
+    def _rollback(self, mark):
+        """
+        Restore the cells written since the journal had mark entries
+        """
+        while len(self._journal) > mark:
+            cell, symbol = self._journal.pop()
+            self.cells[cell] = symbol
+            if symbol is not None:
+                self.where[symbol] = cell
+
+    def legal_moves(self):
+        """
+        Legal (symbol, dir1, dir2) of the side to move, the same moves as LegalMoveIndex.moves
+        """
+        color = self.current
+        era = self.focus[color]
+        moves = []
+        base = era * self.area
+        for cell in range(base, base + self.area):
+            symbol = self.cells[cell]
+            if symbol is None or self.owner[symbol] != color:
+                continue
+            for dir1 in STEPS:
+                if not self._can_step(cell, dir1, color):
+                    continue
+                mark, supply, spawned = len(self._journal), self.supply[color], self.spawned[color]
+                landed = self._step(cell, dir1, color)
+                for dir2 in STEPS:
+                    if self._can_step(landed, dir2, color):
+                        moves.append((symbol, dir1, dir2))
+                self._rollback(mark)
+                self.supply[color], self.spawned[color] = supply, spawned
+        return moves
+
+    def has_pieces_in_focus(self):
+        """
+        Check whether the side to move has a piece in its focus era
+        """
+        color = self.current
+        base = self.focus[color] * self.area
+        return any(s is not None and self.owner[s] == color for s in self.cells[base:base + self.area])
+
+    def presence(self, color):
+        """
+        Number of eras with at least one piece of the color
+        """
+        return sum(1 for era in range(self.eras)
+                   if any(s is not None and self.owner[s] == color
+                          for s in self.cells[era * self.area:(era + 1) * self.area]))
+
+    def is_over(self):
+        """
+        Check whether the side to move has lost: pieces in at most one era, like Game.is_winning_move
+        """
+        return self.presence(self.current) <= 1
+
+    def state(self):
+        """
+        Full comparable state: the position key of Game.position_key, the pieces of both colors as
+        (symbol, era, x, y) sets and the turn
+        """
+        boards = tuple(tuple(self.cells[era * self.area:(era + 1) * self.area]) for era in range(self.eras))
+        players = tuple((self.colors[i], self.supply[i], tuple(self.symbols[i][self.spawned[i]:])) for i in range(2))
+        focus = tuple(self.era_names[self.focus[self.colors.index(c)]] for c in ('white', 'black'))
+        pieces = [set(), set()]
+        for cell, symbol in enumerate(self.cells):
+            if symbol is not None:
+                era, rest = divmod(cell, self.area)
+                pieces[self.owner[symbol]].add((symbol, self.era_names[era], *divmod(rest, self.size)))
+        return (boards, players, focus, self.current), tuple(frozenset(p) for p in pieces), self.turn
@@ -0,0 +1,247 @@
+"""
+Differential fuzzer: random move sequences are played through the reference Game and FastEngine,
+the full states are compared after every move, unmake is checked by taking moves back and replaying them,
+and the legal moves of both engines are compared every few positions. A failing sequence is shrunk to a
+short one that still fails before it is reported. Both engines are timed on the same work
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+from fast_engine import FastEngine
+from move import Move
+from util import new_game, reference_moves
+
+
+def reference_state(game):
+    """
+    State of the reference game in the form of FastEngine.state
+    """
+    pieces = tuple(frozenset((p.symbol, p.era, p.x, p.y) for p in player.pieces) for player in game.players)
+    return game.position_key(), pieces, game.turn
+
+
+def reference_make(game, symbol, dir1, dir2, focus_next):
+    """
+    Play a move on the reference game the way the drivers do
+    """
+    piece = game.find_piece(symbol) if symbol else None
+    Move(piece, dir1, dir2, focus_next).apply(game)
+    game.turn += 1
+    game.current = 1 - game.current
+
+
+class Timings:
+    """
+    Time spent by each engine on applying moves and on generating legal moves
+    """
+    def __init__(self):
+        """
+        All counters start at zero
+        """
+        self.moves = 0
+        self.generations = 0
+        self.seconds = {'reference_make': 0.0, 'fast_make': 0.0, 'reference_gen': 0.0, 'fast_gen': 0.0}
+
+    def add(self, other):
+        """
+        Add the counters of another Timings
+        """
+        self.moves += other.moves
+        self.generations += other.generations
+        for name, seconds in other.seconds.items():
+            self.seconds[name] += seconds
+
+    def rate(self, name, count):
+        """
+        Operations per second for one of the timers
+        """
+        return count / self.seconds[name] if self.seconds[name] else 0.0
+
+    def report(self):
+        """
+        Throughput of both engines side by side
+        """
+        return (f"make: reference {self.rate('reference_make', self.moves):,.0f}/s, "
+                f"fast {self.rate('fast_make', self.moves):,.0f}/s\n"
+                f"movegen: reference {self.rate('reference_gen', self.generations):,.0f}/s, "
+                f"fast {self.rate('fast_gen', self.generations):,.0f}/s")
+
+
+def check_sequence(moves, legal_every=1, timings=None):
+    """
+    Replay a move sequence through both engines. Return None when they agree, 'illegal' when the
+    sequence is not legal for the reference game, or a description of the first difference.
+    An exception raised by either engine counts as a difference
+    """
+    timings = timings or Timings()
+    game = new_game()
+    engine = FastEngine.from_game(game)
+    for step, move in enumerate(moves):
+        try:
+            result = _check_step(game, engine, step, move, legal_every, timings)
+        except Exception as error:
+            return f"step {step}: {(tuple(move))} raised {type(error).__name__}: {error}"
+        if result is not None:
+            return result
+    return None
+
+
+def _check_step(game, engine, step, move, legal_every, timings):
+    """
+    Compare both engines on one move of a sequence, None when they agree
+    """
+    symbol, dir1, dir2, focus_next = move
+    over = game.is_winning_move(game.current_player())
+    if over != engine.is_over():
+        return f"step {step}: reference game over is {over}, fast engine says {not over}"
+    if over:
+        return 'illegal'
+    piece = game.find_piece(symbol) if symbol else None
+    if symbol and (piece is None or piece.color != game.current_player().color):
+        return 'illegal'
+    if step % legal_every == 0:
+        started = time.perf_counter()
+        expected = reference_moves(game)
+        middle = time.perf_counter()
+        found = engine.legal_moves()
+        timings.seconds['reference_gen'] += middle - started
+        timings.seconds['fast_gen'] += time.perf_counter() - middle
+        timings.generations += 1
+        if expected != set(found) or len(found) != len(expected):
+            return f"step {step}: legal moves differ, reference only {sorted(expected - set(found))}, " \
+                   f"fast only {sorted(set(found) - expected)}"
+    if not game.is_legal_move(Move(piece, dir1, dir2, focus_next)):
+        return 'illegal'
+    before = engine.state()
+    started = time.perf_counter()
+    reference_make(game, symbol, dir1, dir2, focus_next)
+    middle = time.perf_counter()
+    undo = engine.make(symbol, dir1, dir2, focus_next)
+    timings.seconds['reference_make'] += middle - started
+    timings.seconds['fast_make'] += time.perf_counter() - middle
+    timings.moves += 1
+    expected, found = reference_state(game), engine.state()
+    if expected != found:
+        return f"step {step}: states differ after {tuple(move)}\nreference {expected}\nfast      {found}"
+    engine.unmake(undo)
+    if engine.state() != before:
+        return f"step {step}: unmake of {tuple(move)} does not restore the state"
+    engine.make(symbol, dir1, dir2, focus_next)
+    return None
+
+
+def random_sequence(rng, max_turns):
+    """
+    Random legal move sequence of one game, generated with the fast engine.
+    The sequence ends early if the fast engine raises
+    """
+    game = new_game()
+    engine = FastEngine.from_game(game)
+    moves = []
+    try:
+        while len(moves) < max_turns and not engine.is_over():
+            if engine.has_pieces_in_focus():
+                legal = engine.legal_moves()
+                if not legal:
+                    break
+                symbol, dir1, dir2 = rng.choice(legal)
+            else:
+                symbol, dir1, dir2 = None, None, None
+            focus_next = rng.choice([era for i, era in enumerate(engine.era_names) if i != engine.focus[engine.current]])
+            moves.append((symbol, dir1, dir2, focus_next))
+            engine.make(symbol, dir1, dir2, focus_next)
+    except Exception:
+        pass  # the replay in check_sequence reports where the fast engine breaks
+    return moves
+
+
+def shrink(moves, legal_every=1):
+    """
+    Shorten a failing sequence: drop chunks of moves, halving the chunk size, as long as
+    the rest is still a legal sequence that fails
+    """
+    chunk = max(1, len(moves) // 2)
+    while chunk >= 1:
+        i, changed = 0, False
+        while i < len(moves):
+            candidate = moves[:i] + moves[i + chunk:]
+            result = check_sequence(candidate, legal_every)
+            if candidate and result not in (None, 'illegal'):
+                moves, changed = candidate, True
+            else:
+                i += chunk
+        if not changed:
+            chunk //= 2
+    return moves, check_sequence(moves, legal_every)
+
+
+def _fuzz_job(job):
+    """
+    Worker: check a batch of random games, return the timings and the first failure
+    """
+    seed, games, max_turns, legal_every = job
+    rng = random.Random(seed)
+    timings = Timings()
+    for _ in range(games):
+        moves = random_sequence(rng, max_turns)
+        result = check_sequence(moves, legal_every, timings)
+        if result is not None:
+            return timings, (moves, result)
+    return timings, None
+
+
+def fuzz(games, processes=1, max_turns=200, legal_every=4, seed=0):
+    """
+    Fuzz both engines over random games on a process pool. Return the timings and
+    the shrunk failing sequence with its difference, or None when no difference was found
+    """
+    rng = random.Random(seed)
+    batch = max(1, games // (processes * 4))
+    jobs = [(rng.randrange(2 ** 32), min(batch, games - start), max_turns, legal_every)
+            for start in range(0, games, batch)]
+    timings, failure = Timings(), None
+    with Pool(processes) as pool:
+        for job_timings, job_failure in pool.imap_unordered(_fuzz_job, jobs):
+            timings.add(job_timings)
+            if job_failure and failure is None:
+                failure = job_failure
+                pool.terminate()
+                break
+    if failure:
+        failure = shrink(failure[0], legal_every)
+    return timings, failure
+
+
+class Main:
+    """
+    Fuzzer runner: python fuzz.py [games] [processes] [max turns] [legal moves checked every n positions]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['1000', str(os.cpu_count() or 1), '200', '4']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        started = time.perf_counter()
+        timings, failure = fuzz(int(defaults[0]), int(defaults[1]), int(defaults[2]), int(defaults[3]))
+        print(f"{timings.moves} moves and {timings.generations} move generations compared "
+              f"in {time.perf_counter() - started:.1f}s")
+        print(timings.report())
+        if failure:
+            moves, result = failure
+            print(f"FAILED with {len(moves)} moves: {json.dumps(moves)}")
+            print(result)
+            sys.exit(1)
+        print("no differences found")
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -1,8 +1,15 @@
 from board import Board
 from state import Caretaker
-from constants import DIRECTIONS, TIMESHIFT, ERAS, w1, w2, w3, w4, w5
+from constants import DIRECTIONS, TIMESHIFT, ERAS, SIZE, era_names
 from piece import Piece
+from move_index import LegalMoveIndex
+from symmetry import canonical_key
+from clock import GameClock
+from position import Position
+import notation
 import copy
+import hashlib
+import time
 
 class Game:
     """
@@ -11,32 +18,59 @@ class Game:
     Some movement rules and restrictions are included as well, for example, squeeze, paradox.
     Potential movements based on the current game, enumerating them for potential use.
     """
+    index_builds = 0
+    index_reuses = 0
 
-    def __init__(self, player1, player2, current = 0, use_history = True, verbose = True):
+    def __init__(self, player1, player2, current = 0, use_history = True, verbose = True, time_control = None,
+                 size = SIZE, eras = len(ERAS), supply = None, history_limit = None, spill_dir = None):
         """
         Initiate a game with required components: two players, three boards for three eras, whether redo/undo is applicable
-        whether there is evaluation display, current first starter
-        """
-        self.boards = {era: Board(era) for era in ERAS}
+        whether there is evaluation display, current first starter, and a (base, increment) time control in seconds for the clocks.
+        The board size, the number of eras and the supply of both players (pieces including the starting ones) can be changed.
+        With history, history_limit undo/redo snapshots are kept in memory and older ones are spilled to spill_dir
+        """
+        self.size = size
+        self.eras = era_names(eras)
+        self.supply = supply
+        if supply is not None:
+            if supply < len(self.eras):
+                raise ValueError("The supply must cover one starting piece per era")
+            player1.set_supply(supply)
+            player2.set_supply(supply)
+        self.boards = {era: Board(era, size) for era in self.eras}
         self.players = [player1, player2]
         self.turn = 1
         self.current = current
         self.focus = {'white': 'past', 'black': 'future'}
-        self.caretaker = Caretaker(self) if use_history else None
+        self.history_limit = history_limit
+        self.spill_dir = spill_dir
+        self.caretaker = Caretaker(self, history_limit, spill_dir) if use_history else None
         self.display_eval = verbose
+        self.time_control = time_control
+        self.clock = GameClock(*time_control) if time_control else None
+        self._legal_moves = None
+        self.stop_event = None
         self.setup()
 
     def setup(self):
         """
         Set up the game initiation state as required
         """
-        self.players[0].start()
-        self.players[1].start()
+        self._legal_moves = None
+        self.players[0].start(self.eras, self.size)
+        self.players[1].start(self.eras, self.size)
         for player in self.players:
             for piece in player.pieces:
                 self.boards[piece.era].place_piece(piece)
     
 
+    def close(self):
+        """
+        Release what the game holds outside of memory: the spill files of the undo/redo history
+        """
+        if self.caretaker:
+            self.caretaker.close()
+
     def save_state(self):
         """
         Save the current state of the game, if redo/undo functionality is on
@@ -72,6 +106,104 @@ class Game:
         """
         return self.players[1 - self.current]
 
+    def position_key(self):
+        """
+        Hashable key of the position: piece symbols on every board, supplies, remaining symbols,
+        focus of both colors and the side to move. The turn counter is not part of the key
+        """
+        boards = tuple(
+            tuple(p.symbol if p else None for row in self.boards[era].grid for p in row)
+            for era in self.eras
+        )
+        players = tuple((p.color, p.supply, tuple(p.symbols)) for p in self.players)
+        focus = (self.focus['white'], self.focus['black'])
+        return boards, players, focus, self.current
+
+    def to_position(self):
+        """
+        Immutable Position of the game, for snapshots, cache keys and handing the position to other threads
+        """
+        return Position.from_game(self)
+
+    def restore_position(self, position):
+        """
+        Set the game to a Position, the turn counter is left as it is
+        """
+        position.restore(self)
+        self._legal_moves = None
+
+    def to_notation(self):
+        """
+        One-line notation of the position and the turn, see notation.py
+        """
+        return notation.write(self.to_position(), self.turn)
+
+    def load_notation(self, text):
+        """
+        Set the game to a position written in notation, ValueError when it is malformed or
+        does not fit the board size and eras of the game
+        """
+        position, turn = notation.read(text)
+        self.restore_position(position)
+        if turn is not None:
+            self.turn = turn
+
+    def position_hash(self, color=None):
+        """
+        Stable signed 64-bit hash of the position key, optionally from the point of view of one color.
+        Unlike hash() it is the same in every process and session, so it can be stored on disk
+        """
+        data = repr((self.position_key(), color)).encode()
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True)
+
+    def canonical_hash(self, color=None):
+        """
+        Stable 64-bit hash of the canonical key, shared by all positions in the same symmetry class.
+        The optional color is stored relative to the side to move, like the canonical key itself
+        """
+        perspective = None if color is None else color == self.current_player().color
+        data = repr((canonical_key(self), perspective)).encode()
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True)
+
+    def copy_without_history(self):
+        """
+        Deep copy of the game for trying out moves, without the undo/redo history, the move index and the stop event
+        """
+        return copy.deepcopy(self, {id(self.caretaker): None, id(self._legal_moves): None, id(self.stop_event): None})
+
+    def stopped(self):
+        """
+        Check whether the stop event of a search on this game is set
+        """
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def legal_moves(self):
+        """
+        Legal move index of the player to move. It is built once per position: moving a piece, setting up
+        and restoring a position drop it, and it is rebuilt when the side to move or its focus changed
+        """
+        index = self._legal_moves
+        color = self.current_player().color
+        if index is None or index.color != color or index.focus != self.focus[color]:
+            self._legal_moves = LegalMoveIndex(self)
+            Game.index_builds += 1
+        else:
+            Game.index_reuses += 1
+        return self._legal_moves
+
+    def is_legal_move(self, move):
+        """
+        Validate a Move of the player to move against the legal move index
+        """
+        player = self.current_player()
+        current_focus = self.focus[player.color]
+        if move.focus_next not in self.eras or move.focus_next == current_focus:
+            return False
+        index = self.legal_moves()
+        if move.piece is None:
+            return not any(p.era == current_focus for p in player.pieces)
+        return move.piece.color == player.color and index.is_legal(move.piece.symbol, move.dir1, move.dir2)
+
     def find_piece(self, symbol):
         """
         Find the piece that matches the input indicating the symbol of piece 
@@ -89,8 +221,8 @@ class Game:
         """
         current_player = self.current_player()
         dz = TIMESHIFT[direction]
-        new_era_idx = ERAS.index(piece.era) + dz
-        new_era = ERAS[new_era_idx]
+        new_era_idx = self.eras.index(piece.era) + dz
+        new_era = self.eras[new_era_idx]
         cur_board = self.boards[piece.era]
         new_board = self.boards[new_era]
         cur_board.remove_piece(piece.x, piece.y)
@@ -158,6 +290,7 @@ class Game:
         """
         Complete the movement chosen
         """
+        self._legal_moves = None
         if direction in DIRECTIONS:
             self._move_current_board(piece, direction)
         elif direction in TIMESHIFT:
@@ -185,12 +318,12 @@ class Game:
         """
         current_player = self.current_player()
         dz = TIMESHIFT[direction]
-        new_era_idx = ERAS.index(piece.era) + dz
-        if new_era_idx < 0 or new_era_idx > 2:
+        new_era_idx = self.eras.index(piece.era) + dz
+        if new_era_idx < 0 or new_era_idx >= len(self.eras):
             return False
         if dz == -1 and current_player.supply <= 0:
             return False
-        target_era = ERAS[new_era_idx]
+        target_era = self.eras[new_era_idx]
         target_board = self.boards[target_era]
         if target_board.get_piece(piece.x, piece.y) is not None:
             return False
@@ -218,55 +351,48 @@ class Game:
         if direction in TIMESHIFT:
             return self._can_time_travel(piece, direction)
 
-    def _enumerate_moves(self, piece):
+    def _enumerate_moves(self, piece, deadline=None):
         """
-        Enumerate all possible moves of the piece indicated
+        Enumerate all possible moves of the piece indicated, the legal steps come from the legal move index.
+        Past the deadline (a time.perf_counter value) or once the stop event is set, the enumeration stops as soon
+        as one move has been found
         """
         moves = set()
-        dirs = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
         if not piece:
             dir1, dir2 = None, None
-            for era in ERAS:
-                game_copy = copy.deepcopy(self)
+            for era in self.eras:
+                game_copy = self.copy_without_history()
                 if era != self.focus[game_copy.current_player().color]:
                     game_copy.focus[game_copy.current_player().color] = era
                     if game_copy.is_winning_move(game_copy.get_opponent()):
                         score = 9999
                     else:
-                        score = game_copy.current_player().score_system(game_copy, 3, 2, 1, 1, 1)
+                        score = game_copy.current_player().score_system(game_copy, *game_copy.current_player().weights)
                     moves.add((piece, dir1, dir2, era, score))
             return moves
 
-        for dir1 in dirs:
-            for dir2 in dirs:
-                game_copy = copy.deepcopy(self)
-                piece_copy = next((p for p in game_copy.current_player().pieces if p.symbol == piece.symbol), None)
-                if not piece_copy:
-                    continue
-                if not game_copy.can_move(piece_copy, dir1):
-                    dir1, dir2 =  None, None
-                    continue
-                if dir1:
-                    game_copy.move_piece(piece_copy, dir1)
-                if dir1 and not game_copy.can_move(piece_copy, dir2):
-                    dir1, dir2 =  None, None
-                    continue
-                if dir2:
-                    game_copy.move_piece(piece_copy, dir2)
-                for era in ERAS:
+        index = self.legal_moves()
+        for dir1 in index.first_steps(piece.symbol):
+            for dir2 in index.second_steps(piece.symbol, dir1):
+                if moves and (self.stopped() or deadline and time.perf_counter() > deadline):
+                    return moves
+                game_copy = self.copy_without_history()
+                piece_copy = game_copy.find_piece(piece.symbol)
+                game_copy.move_piece(piece_copy, dir1)
+                game_copy.move_piece(piece_copy, dir2)
+                for era in self.eras:
                     if era != piece.era:
                         game_copy.focus[piece_copy.color] = era
                         if game_copy.is_winning_move(game_copy.get_opponent()):
                             score = 9999
                         else:
-                            score = game_copy.current_player().score_system(game_copy, w1, w2, w3, w4, w5)
-                        if dir1 and dir2:
-                            moves.add((piece, dir1, dir2, era, score))
+                            score = game_copy.current_player().score_system(game_copy, *game_copy.current_player().weights)
+                        moves.add((piece, dir1, dir2, era, score))
         return moves
 
-    def enumerate_all_moves(self, player):
+    def enumerate_all_moves(self, player, deadline=None):
         """
-        Enumerate all moves for all potential pieces that can be moved
+        Enumerate all moves for all potential pieces that can be moved, stop early past the deadline or when stopped
         """
         focus_board = self.focus[player.color]
         piece_options = []
@@ -276,7 +402,9 @@ class Game:
                 piece_options.append(piece)
         if piece_options:
             for piece in piece_options:
-                all_moves.extend(self._enumerate_moves(piece))
+                if all_moves and (self.stopped() or deadline and time.perf_counter() > deadline):
+                    break
+                all_moves.extend(self._enumerate_moves(piece, deadline))
         else:
             all_moves.extend(self._enumerate_moves(None))
         return all_moves
@@ -292,10 +420,11 @@ class Game:
         """
         Print out the current boards based on the current state
         """
-        print("-" * 33)
+        width = 2 * self.size + 4
+        print("-" * (width * len(self.eras) - 3))
         def get_focus_line(color):
-            idx = ERAS.index(self.focus[color])
-            return " " * (12 * idx) + f"  {color}  "
+            idx = self.eras.index(self.focus[color])
+            return " " * (width * idx) + f"  {color}  "
 
         print(get_focus_line('black'))
         print(self._display_boards())
@@ -307,11 +436,12 @@ class Game:
         """
         Helper function for print boards
         """
-        lines = ["" for _ in range(9)]
-        for era in ERAS:
+        height = 2 * self.size + 1
+        lines = ["" for _ in range(height)]
+        for era in self.eras:
             board_str = self.boards[era].display().splitlines()
-            for i in range(9):
-                lines[i] += board_str[i].ljust(9) + "   " 
+            for i in range(height):
+                lines[i] += board_str[i].ljust(height) + "   " 
         return "\n".join(line.rstrip() for line in lines)
     
 
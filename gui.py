@@ -1,30 +1,51 @@
 import sys
+import tempfile
 import tkinter as tk
+import metrics
 from tkinter import messagebox, ttk, simpledialog
 from play_game import BaseGame, PlayDecorator
-from player import HumanPlayer, HeuristicAI, RandomAI
-from constants import DIRECTIONS, TIMESHIFT, ERAS
+from clock import LatencyLog, MoveTimer, parse_time_control
+from constants import ERAS, SIZE, parse_variant
+from move_cache import MoveCache, DEFAULT_CACHE_FILE
+from opening_book import OpeningBook
+from gui_profile import EventLoopProfiler, DEFAULT_TRACE_FILE
+from player import HumanPlayer, HeuristicAI
+from selfplay import make_player, parse_spec
 
 class BoardGameGUI:
     """This is the GUI class for the board game TTYKM"""
-    def __init__(self, root, p1_type='human', p2_type='human', use_history=False, verbose=False):
-        """Initiate the frame with the default settings"""
+    def __init__(self, root, p1_type='human', p2_type='human', use_history=False, verbose=False, ponder=False,
+                 time_control=None, latency_log=None, size=SIZE, eras=len(ERAS), supply=None, profiler=None, history_limit=None,
+                 spill_dir=None):
+        """Initiate the frame with the default settings, a (base, increment) time control starts the clocks,
+        size, eras and supply choose the board variant, an EventLoopProfiler times the handlers,
+        history_limit and spill_dir bound the undo/redo snapshots kept in memory"""
         self.root = root
+        if profiler:
+            profiler.install(self)
         self.root.title("Board Game - That Time You Killed Me")
         
         self.p1 = self.create_player("white", p1_type)
         self.p2 = self.create_player("black", p2_type)
-        self.game = BaseGame(self.p1, self.p2, current=0, use_history=use_history, verbose=verbose)
-        self.game = PlayDecorator(self.game)
+        self.game = BaseGame(self.p1, self.p2, current=0, use_history=use_history, verbose=verbose,
+                             time_control=time_control, size=size, eras=eras, supply=supply,
+                             history_limit=history_limit, spill_dir=spill_dir)
+        self.game = PlayDecorator(self.game, ponder=ponder, timer=MoveTimer(log=latency_log))
         
         self.selected_piece = None
         self.highlighted_moves = []
         self.cell_size = 60
+        self.size = self.game._game.size
+        self.eras = self.game._game.eras
         self.era_colors = {'past': '#E6D5B8', 'present': '#F0F0F0', 'future': '#B8D5E6'}
+        for era in self.eras:
+            self.era_colors.setdefault(era, '#F0F0F0')
 
         self.actions_taken = 0
         self.max_actions = 2
         self.awaiting_command = False
+        self.turn_moves = None
+        self.first_direction = None
 
         self.setup_ui()
         self.update_display()
@@ -32,20 +53,20 @@ class BoardGameGUI:
         if not isinstance(self.game._game.current_player(), HumanPlayer):
             # messagebox.showinfo("Next Turn", f"Next turn: {self.game._game.current_player().color.capitalize()}")
             self.root.after(1000, self.ai_move)
+        else:
+            self.start_human_turn()
     
 
     def create_player(self, color, ptype):
-        """Helper function to create player based on the player type indicated"""
-        if ptype == 'human': 
-            return HumanPlayer(color)
-        if ptype == 'random': 
-            return RandomAI(color)
-        if ptype == 'heuristic': 
-            return HeuristicAI(color)
-        raise ValueError("Unknown player type")
+        """Helper function to create player based on the player type indicated, 'heuristic=<weight file>' loads tuned weights like in main.py"""
+        ptype, sep, weights_file = ptype.partition('=')
+        ptype = ptype.lower()
+        if ptype not in ('human', 'random', 'heuristic'):
+            raise ValueError("Unknown player type")
+        return make_player(color, parse_spec(ptype + sep + weights_file))
 
     def setup_ui(self):
-        """Set up the initial UI: three boards with the pieces on the starting locations with required buttons set up"""
+        """Set up the initial UI: one board per era with the pieces on the starting locations with required buttons set up"""
         self.top_frame = tk.Frame(self.root)
         self.top_frame.pack(side=tk.TOP, fill=tk.X)
 
@@ -77,6 +98,9 @@ class BoardGameGUI:
         
             self.next_btn = tk.Button(self.control_frame, text="Next", command=self.next_move)
             self.next_btn.pack(side=tk.LEFT, padx=5)
+
+            self.memory_label = tk.Label(self.control_frame, text="", fg="gray", anchor="w")
+            self.memory_label.pack(side=tk.LEFT, padx=10)
         
         self.quit_btn = tk.Button(self.control_frame, text="Quit", command=self.root.quit)
         self.quit_btn.pack(side=tk.RIGHT, padx=5)
@@ -84,6 +108,11 @@ class BoardGameGUI:
         self.status_label = tk.Label(self.root, text="", fg="blue", anchor="w")
         self.status_label.pack(fill=tk.X, side=tk.BOTTOM)
 
+        if self.game._game.clock:
+            self.clock_label = tk.Label(self.top_frame, text="", fg='black')
+            self.clock_label.pack(side=tk.TOP)
+            self.update_clock()
+
     def setup_era_selector(self):
         """Create era selection controls for human players"""
         self.era_vars = {
@@ -95,7 +124,7 @@ class BoardGameGUI:
         self.white_era_menu = ttk.Combobox(
             self.era_selector_frame,
             textvariable=self.era_vars['white'],
-            values=['past', 'present', 'future'],
+            values=self.eras,
             state='readonly'
         )
         self.white_era_menu.grid(row=0, column=1, padx=5)
@@ -105,7 +134,7 @@ class BoardGameGUI:
         self.black_era_menu = ttk.Combobox(
             self.era_selector_frame,
             textvariable=self.era_vars['black'],
-            values=['past', 'present', 'future'],
+            values=self.eras,
             state='readonly'
         )
         self.black_era_menu.grid(row=0, column=3, padx=5)
@@ -119,22 +148,22 @@ class BoardGameGUI:
 
 
     def create_boards(self):
-        """Create the three era boards for inserting pieces"""
+        """Create one board per era for inserting pieces"""
         self.era_frames = {}
         self.canvases = {}
         
-        for i, era in enumerate(['past', 'present', 'future']):
+        for i, era in enumerate(self.eras):
             frame = tk.LabelFrame(self.board_frame, text=era.capitalize(), bg=self.era_colors[era])
             frame.grid(row=0, column=i, padx=10, pady=5)
             self.era_frames[era] = frame
             
-            canvas = tk.Canvas(frame, width=4*self.cell_size, height=4*self.cell_size, 
+            canvas = tk.Canvas(frame, width=self.size*self.cell_size, height=self.size*self.cell_size, 
                               bg=self.era_colors[era], highlightthickness=0)
             canvas.grid()
             self.canvases[era] = canvas
             
-            for row in range(4):
-                for col in range(4):
+            for row in range(self.size):
+                for col in range(self.size):
                     x1, y1 = col*self.cell_size, row*self.cell_size
                     x2, y2 = (col+1)*self.cell_size, (row+1)*self.cell_size
                     canvas.create_rectangle(x1, y1, x2, y2, outline='black', width=1)
@@ -147,7 +176,7 @@ class BoardGameGUI:
         col = event.x // self.cell_size
         row = event.y // self.cell_size
         
-        if 0 <= row < 4 and 0 <= col < 4:
+        if 0 <= row < self.size and 0 <= col < self.size:
             self.on_cell_click(row, col, era)
 
     def draw_piece(self, canvas, row, col, color):
@@ -173,7 +202,7 @@ class BoardGameGUI:
         self.p1_label.config(font=('Arial', 10, 'bold' if current_player == self.p1 else 'normal'))
         self.p2_label.config(font=('Arial', 10, 'bold' if current_player == self.p2 else 'normal'))
         
-        for era in ['past', 'present', 'future']:
+        for era in self.eras:
             board = self.game._game.boards[era]
             canvas = self.canvases[era]
             
@@ -183,8 +212,8 @@ class BoardGameGUI:
             canvas.configure(bg='light yellow')
             self.root.after(100, lambda c=canvas, era=era: c.configure(bg=self.era_colors[era]))
             
-            for row in range(4):
-                for col in range(4):
+            for row in range(self.size):
+                for col in range(self.size):
                     piece = board.grid[row][col]
                     if piece:
                         self.draw_piece(canvas, row, col, piece.color)
@@ -204,9 +233,24 @@ class BoardGameGUI:
                 frame.config(highlightbackground='red', highlightthickness=2)
             else:
                 frame.config(highlightbackground=self.era_colors[era], highlightthickness=1)
+
+        if self.game._game.caretaker:
+            self.memory_label.config(text=self.game._game.caretaker.summary())
         
 
     
+    def update_clock(self):
+        """Refresh the remaining times a few times per second"""
+        if self.game._game.clock:
+            self.clock_label.config(text=self.game._game.clock.summary())
+            self.root.after(200, self.update_clock)
+
+    def start_human_turn(self):
+        """Start the clock of the human player to move and let the AI opponent ponder"""
+        if self.game._game.clock:
+            self.game._game.clock.start(self.game._game.current_player().color)
+        self.game.start_pondering()
+
     def highlight_cell(self, canvas, row, col, color):
         """Highlight a cell on the canvas"""
         x1 = col * self.cell_size
@@ -259,30 +303,15 @@ class BoardGameGUI:
 
 
     def get_available_moves(self, row, col, era):
-        """Get available moves for the selected piece"""
+        """Get available moves for the selected piece from the legal move index of the turn"""
         piece = self.game._game.boards[era].get_piece(row, col)
         if not piece:
             return []
-        
-        moves = set()
-        
-        for direction in DIRECTIONS.keys():  
-            if self.game._game.can_move(piece, direction):
-                dx, dy = DIRECTIONS[direction]
-                new_row, new_col = row + dx, col + dy
-                if self.game._game.boards[era].is_within_bounds(new_row, new_col):
-                    moves.add((new_row, new_col, era))
-        
-        for direction, dz in TIMESHIFT.items():  
-            if self.game._game.can_move(piece, direction):
-                new_era_idx = ERAS.index(era) + dz
-                if 0 <= new_era_idx < len(ERAS):
-                    new_era = ERAS[new_era_idx]
-                    target_board = self.game._game.boards[new_era]
-                    if target_board.grid[row][col] is None:
-                        moves.add((row, col, new_era))
-        
-        return list(moves)
+        if self.actions_taken == 0:
+            self.turn_moves = self.game._game.legal_moves()
+            self.first_direction = None
+            return list(self.turn_moves.first_steps(piece.symbol).values())
+        return list(self.turn_moves.second_steps(piece.symbol, self.first_direction).values())
 
     def execute_move(self, from_pos, to_pos):
         """Move execution: UI is different here. As human player take two steps with board updating seperately """
@@ -294,15 +323,11 @@ class BoardGameGUI:
         if not piece:
             return
 
-        if from_era == to_era:
-            dx, dy = to_row - from_row, to_col - from_col
-            direction = next((d for d, (ddx, ddy) in DIRECTIONS.items() if (dx, dy) == (ddx, ddy)), None)
-        else:
-            dz = ERAS.index(to_era) - ERAS.index(from_era)
-            direction = next((d for d, ddz in TIMESHIFT.items() if dz == ddz), None)
-
+        direction = self.turn_moves.direction_to(piece.symbol, (to_era, to_row, to_col), self.first_direction)
         if direction:
             self.game._game.move_piece(piece, direction)
+            if self.first_direction is None:
+                self.first_direction = direction
 
         self.selected_piece = None
         self.highlighted_moves = []
@@ -330,15 +355,20 @@ class BoardGameGUI:
         if isinstance(current_player, HumanPlayer):
         
             self.ask_focus_change(current_player)
-
+            clock = self.game._game.clock
+            if clock:
+                clock.stop()
+                if clock.flagged(current_player.color):
+                    self.show_winner(self.game.winner())
+                    return
 
         self.game._game.turn += 1
         self.game._game.current = 1 - self.game._game.current
         self.actions_taken = 0
         self.awaiting_command = False
 
-        if self.game._game.is_winning_move(self.game._game.current_player()):
-            winner = self.game._game.get_opponent().color
+        winner = self.game.winner()
+        if winner:
             self.show_winner(winner)
             return 
 
@@ -347,19 +377,21 @@ class BoardGameGUI:
 
         if not isinstance(self.game._game.current_player(), HumanPlayer):
             self.root.after(1000, self.ai_move)
+        else:
+            self.start_human_turn()
     
     def ask_focus_change(self, player):
         """Take the focus choice option from the Human Player user"""
         old_focus = self.game._game.focus[player.color]
-        eras = ['past', 'present', 'future']
+        eras = self.eras
 
         while True:
-            selected_focus = simpledialog.askstring("Focus Selection", f"Current focus: {old_focus}. Choose a new focus (past, present, future):")
+            selected_focus = simpledialog.askstring("Focus Selection", f"Current focus: {old_focus}. Choose a new focus ({', '.join(eras)}):")
             if selected_focus is None:
                 continue  
             selected_focus = selected_focus.lower()
             if selected_focus not in eras:
-                messagebox.showerror("Invalid Era", "Please select 'past', 'present', or 'future'.")
+                messagebox.showerror("Invalid Era", f"Please select one of {', '.join(eras)}.")
                 continue
             if selected_focus == old_focus:
                 messagebox.showerror("Same Era", "You must select a DIFFERENT era than current focus.")
@@ -373,10 +405,16 @@ class BoardGameGUI:
         """Handle the moves for AI players: use the move strategy directly"""
         if not isinstance(self.game._game.current_player(), HumanPlayer):
             player = self.game._game.current_player()
-            move = player.select_move(self.game._game)
+            move = self.game.select_move(player)
+            if self.game._game.clock and self.game._game.clock.flagged(player.color):
+                self.show_winner(self.game.winner())
+                return
             if move:
                 move.apply(self.game._game)
                 self.update_display()
+                ponderer = self.game.ponderer(player)
+                if ponderer:
+                    self.set_status(ponderer.summary())
                 self.end_turn()
 
 
@@ -416,6 +454,7 @@ class BoardGameGUI:
         """Continue to the next turn and make selections"""
         self.set_status("Next clicked")
         self.game._game.save_state()
+        self.memory_label.config(text=self.game._game.caretaker.summary())
         if not isinstance(self.game._game.current_player(), HumanPlayer):
             self.ai_move()
             self.set_status(f"Next clicked: AI moved")
@@ -427,6 +466,9 @@ class BoardGameGUI:
 
     def show_winner(self, winner):
         """Display winning and take input to restart or not"""
+        recorder = metrics.current()
+        if recorder:
+            recorder.record_game(winner)
         messagebox.showinfo("Game Over", f"{winner.capitalize()} has won the game!")
         if messagebox.askyesno("Play Again", "Would you like to play again?"):
             self.reset_game()
@@ -435,11 +477,15 @@ class BoardGameGUI:
 
     def reset_game(self):
         """Helper function to reset the game if the users decide to start another round"""
-        self.p1 = type(self.p1)(self.p1.color)
-        self.p2 = type(self.p2)(self.p2.color)
+        self.p1 = type(self.p1)(self.p1.color, weights=self.p1.weights)
+        self.p2 = type(self.p2)(self.p2.color, weights=self.p2.weights)
+        self.game._game.close()
         self.game._game.__init__(self.p1, self.p2, self.game._game.current, 
                                self.game._game.caretaker is not None, 
-                               self.game._game.display_eval)
+                               self.game._game.display_eval,
+                               self.game._game.time_control,
+                               self.size, len(self.eras), self.game._game.supply,
+                               self.game._game.history_limit, self.game._game.spill_dir)
         self.selected_piece = None
         self.highlighted_moves = []
         self.actions_taken = 0
@@ -447,6 +493,8 @@ class BoardGameGUI:
         
         if not isinstance(self.game._game.current_player(), HumanPlayer):
             self.root.after(1000, self.ai_move)
+        else:
+            self.start_human_turn()
 
 
 class Main:
@@ -459,24 +507,58 @@ class Main:
         Main runner
         """
         args = sys.argv[1:]
-        defaults = ['human', 'human', 'off', 'off']
+        defaults = ['human', 'human', 'off', 'off', 'off', 'off', 'off', 'off', 'off', 'off']
         for i, arg in enumerate(args):
             if i < len(defaults):
-                defaults[i] = arg.lower()
+                # player specs may name a weight file, the book and the trace file are paths: keep their case
+                defaults[i] = arg if i in (0, 1, 6, 9) else arg.lower()
 
         p1_type, p2_type = defaults[0], defaults[1]
-        use_history = defaults[2] == 'on'
+        use_history = defaults[2] == 'on' or defaults[2].isdigit()
+        history_limit = spill_dir = None
+        if defaults[2].isdigit():
+            history_limit, spill_dir = int(defaults[2]), tempfile.gettempdir()
         verbose = defaults[3] == 'on'
-
+        ponder = defaults[4] == 'on'
+        use_cache = defaults[5] == 'on'
+        book_file = None if defaults[6].lower() == 'off' else defaults[6]
+        time_control = parse_time_control(defaults[7])
+        size, eras, supply = parse_variant(defaults[8])
+        latency_log = LatencyLog() if time_control else None
+
+        if use_cache:
+            HeuristicAI.move_cache = MoveCache(DEFAULT_CACHE_FILE)
+        if book_file:
+            HeuristicAI.opening_book = OpeningBook(book_file, randomness=0.2)
         root = tk.Tk()
+        profiler = None
+        if defaults[9].lower() != 'off':
+            profiler = EventLoopProfiler(root, DEFAULT_TRACE_FILE if defaults[9].lower() == 'on' else defaults[9])
         gui = BoardGameGUI(
             root,
             p1_type=p1_type,
             p2_type=p2_type,
             use_history=use_history,
-            verbose=verbose
+            verbose=verbose,
+            ponder=ponder,
+            time_control=time_control,
+            latency_log=latency_log,
+            size=size,
+            eras=eras,
+            supply=supply,
+            profiler=profiler,
+            history_limit=history_limit,
+            spill_dir=spill_dir
         )
         root.mainloop()
+        gui.game._game.close()
+        if profiler:
+            print(profiler.summary())
+            print(f"Trace written to {profiler.dump()}")
+        if HeuristicAI.move_cache:
+            HeuristicAI.move_cache.close()
+        if latency_log:
+            latency_log.close()
 
 if __name__ == '__main__':
     Main.run()
\ No newline at end of file
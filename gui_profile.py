@@ -0,0 +1,147 @@
+import functools
+import json
+import time
+import tkinter as tk
+from collections import defaultdict, deque
+from util import percentile
+
+DEFAULT_TRACE_FILE = 'gui_trace.json'
+
+
+class EventLoopProfiler:
+    """Opt-in timing of the Tk main loop of a BoardGameGUI: every after callback and event handler, the lag of callbacks behind their scheduled time and the canvas items created and deleted per frame"""
+    HANDLERS = ('ai_move', 'update_display', 'on_canvas_click', 'change_focus', 'undo_move', 'redo_move',
+                'next_move', 'end_turn', 'update_clock', 'reset_game')
+
+    def __init__(self, root, trace_path=DEFAULT_TRACE_FILE, heartbeat=50, window=2000, max_events=200000):
+        """Take over root.after. A heartbeat timer every heartbeat ms measures the lag of an idle loop and refreshes the overlay, percentiles are over the last window samples"""
+        self.root = root
+        self.trace_path = trace_path
+        self.heartbeat = heartbeat
+        self.max_events = max_events
+        self.frames = deque(maxlen=window)
+        self.handlers = defaultdict(lambda: deque(maxlen=window))
+        self.lags = deque(maxlen=window)
+        self.items = deque(maxlen=window)
+        self.events = []
+        self.dropped_events = 0
+        self._seen = {}
+        self._depth = 0
+        self._origin = time.perf_counter()
+        self._after = root.after
+        root.after = self.after
+        self.overlay = None
+        self.gui = None
+
+    def install(self, gui):
+        """Time the handlers of the GUI. Call it before the GUI builds its widgets so button commands get the timed handlers"""
+        self.gui = gui
+        for name in self.HANDLERS:
+            handler = getattr(gui, name, None)
+            if handler is not None:
+                setattr(gui, name, self._timed(name, handler))
+        self.overlay = tk.Label(self.root, text="", font=('Courier', 8), bg='#FFFFE0', justify=tk.LEFT)
+        self.overlay.place(relx=1.0, rely=0.0, anchor='ne')
+        self._scheduled = time.perf_counter() + self.heartbeat / 1000
+        self._after(self.heartbeat, self._beat)
+
+    def _timed(self, name, handler):
+        """Handler wrapped with the timing"""
+        @functools.wraps(handler)
+        def timed(*args, **kwargs):
+            return self._run(name, handler, args, kwargs)
+        return timed
+
+    def after(self, ms, func=None, *args):
+        """Replacement of root.after that times the callback and its lag behind the scheduled time"""
+        if func is None:
+            return self._after(ms)
+        scheduled = time.perf_counter() + ms / 1000
+        name = f"after {getattr(func, '__name__', 'callback')}"
+
+        def callback(*call_args):
+            return self._run(name, func, call_args, {}, scheduled)
+        return self._after(ms, callback, *args)
+
+    def _run(self, name, func, args, kwargs, scheduled=None):
+        """Call a handler or callback and record its duration, a frame ends with the outermost call"""
+        started = time.perf_counter()
+        lag = None
+        if scheduled is not None:
+            lag = max(0.0, started - scheduled)
+            self.lags.append(lag)
+        self._depth += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._depth -= 1
+            elapsed = time.perf_counter() - started
+            if not name.startswith('after'):
+                self.handlers[name].append(elapsed)
+            args_out = {'lag_ms': round(lag * 1000, 3)} if lag is not None else {}
+            if self._depth == 0:
+                self.frames.append(elapsed)
+                created, deleted = self._count_items()
+                self.items.append((created, deleted))
+                args_out.update(created=created, deleted=deleted)
+            self._trace(name, started, elapsed, args_out)
+
+    def _count_items(self):
+        """Canvas items created and deleted since the last frame. Tk item ids only grow, so the new items are the ids above the highest one seen"""
+        canvases = getattr(self.gui, 'canvases', None) or {}
+        created = deleted = 0
+        for canvas in (canvases.values() if isinstance(canvases, dict) else canvases):
+            ids = canvas.find_all()
+            highest, count = self._seen.get(canvas, (0, 0))
+            new = sum(1 for item in ids if item > highest)
+            created += new
+            deleted += count + new - len(ids)
+            self._seen[canvas] = (max(ids) if ids else highest, len(ids))
+        return created, deleted
+
+    def _trace(self, name, started, elapsed, args):
+        """Keep a complete event for the trace file"""
+        if len(self.events) >= self.max_events:
+            self.dropped_events += 1
+            return
+        self.events.append({'name': name, 'cat': 'after' if name.startswith('after') else 'handler', 'ph': 'X',
+                            'ts': round((started - self._origin) * 1e6, 1), 'dur': round(elapsed * 1e6, 1),
+                            'pid': 1, 'tid': 1, 'args': args})
+
+    def _beat(self):
+        """Heartbeat: lag of the loop against the scheduled time, then refresh the overlay"""
+        now = time.perf_counter()
+        self.lags.append(max(0.0, now - self._scheduled))
+        if self.overlay is not None:
+            self.overlay.config(text=self.summary_line())
+        self._scheduled = time.perf_counter() + self.heartbeat / 1000
+        self._after(self.heartbeat, self._beat)
+
+    def summary_line(self):
+        """Overlay text: p50/p99 of frames, handlers and loop lag in ms and the mean canvas churn per frame"""
+        def p(values):
+            return f"{percentile(values, 0.5) * 1000:.1f}/{percentile(values, 0.99) * 1000:.1f}"
+        handlers = [d for values in self.handlers.values() for d in values]
+        frames = len(self.items) or 1
+        created = sum(c for c, _ in self.items) / frames
+        deleted = sum(d for _, d in self.items) / frames
+        return (f"frame {p(self.frames)} handler {p(handlers)} lag {p(self.lags)} ms p50/p99\n"
+                f"canvas +{created:.1f} -{deleted:.1f} items/frame")
+
+    def summary(self):
+        """Per handler table for the console"""
+        lines = [f"{'handler':<18}{'calls':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+        for name, values in sorted(self.handlers.items()):
+            lines.append(f"{name:<18}{len(values):>7}{percentile(values, 0.5) * 1000:>9.2f}"
+                         f"{percentile(values, 0.99) * 1000:>9.2f}{max(values) * 1000:>9.2f}")
+        lines.append(self.summary_line().replace('\n', ', '))
+        if self.dropped_events:
+            lines.append(f"{self.dropped_events} events not traced")
+        return '\n'.join(lines)
+
+    def dump(self, path=None):
+        """Write the events in the Chrome trace format, for chrome://tracing or Perfetto"""
+        path = path or self.trace_path
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+        return path
@@ -0,0 +1,285 @@
+"""
+Rating ladder for player configurations. Every game result is appended to a JSON lines results file and the
+Bradley-Terry ratings (draws count half a win) are refitted from all results after each batch, on the Elo scale
+with the first entrant fixed at 0 and 95% confidence intervals from the inverse Fisher information. Instead of
+a fixed number of games per pairing, the ladder plays the unresolved pair of neighbours in the ranking whose
+order is least certain, and a pairing is resolved once its SPRT decides which side is stronger, max_pair_games
+is reached or the ratings already separate the two at 95%. The ratings are written after every batch and an
+interrupted ladder carries on from its results file
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+from analysis import read_lines
+from selfplay import parse_spec, play_game
+from tuning import SPRT
+
+ELO = 400 / math.log(10)
+Z95 = 1.96
+
+
+def _ladder_game(job):
+    """
+    Worker: play one game between two specs, return the winning color or None for a draw
+    """
+    white, black, max_turns, seed = job
+    return play_game(white, black, max_turns, seed).winner
+
+
+def _solve(matrix, vector):
+    """
+    Solution of a small linear system by Gauss-Jordan elimination with partial pivoting
+    """
+    n = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            raise ZeroDivisionError("singular matrix")
+        for r in range(n):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[col])]
+    return [rows[i][n] / rows[i][i] for i in range(n)]
+
+
+class Ratings:
+    """
+    Bradley-Terry fit of a score table. scores[i][j] is the points of i against j (1 a win, 0.5 a draw).
+    A prior of one draw of every entrant against an opponent rated 0 keeps unbeaten entrants finite
+    """
+    def __init__(self, scores, games, prior=1.0, iterations=500):
+        """
+        Fit the strengths by minorization-maximization and compute the covariance of the log strengths
+        """
+        n = len(scores)
+        self.n = n
+        strength = [1.0] * n
+        for _ in range(iterations):
+            new = []
+            for i in range(n):
+                won = sum(scores[i]) + prior / 2
+                rate = sum(games[i][j] / (strength[i] + strength[j]) for j in range(n) if j != i)
+                new.append(won / (rate + prior / (strength[i] + 1.0)))
+            change = max(abs(math.log(a / b)) for a, b in zip(new, strength))
+            strength = new
+            if change < 1e-9:
+                break
+        logs = [math.log(s) for s in strength]
+        self.elo = [ELO * (x - logs[0]) for x in logs]
+        info = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            p = strength[i] / (strength[i] + 1.0)
+            info[i][i] += prior * p * (1 - p)
+            for j in range(n):
+                if j != i and games[i][j]:
+                    p = strength[i] / (strength[i] + strength[j])
+                    info[i][i] += games[i][j] * p * (1 - p)
+                    info[i][j] -= games[i][j] * p * (1 - p)
+        self.covariance = self._inverse(info)
+
+    @staticmethod
+    def _inverse(matrix):
+        """
+        Inverse of the information matrix, column by column
+        """
+        n = len(matrix)
+        columns = [_solve(matrix, [1.0 if r == c else 0.0 for r in range(n)]) for c in range(n)]
+        return [[columns[c][r] for c in range(n)] for r in range(n)]
+
+    def error(self, i, j=None):
+        """
+        Standard error in Elo of an entrant's rating against the first entrant, or of the difference of two
+        """
+        c = self.covariance
+        if j is None:
+            j = 0
+        variance = c[i][i] + c[j][j] - 2 * c[i][j]
+        return ELO * math.sqrt(max(variance, 0.0))
+
+
+class Ladder:
+    """
+    Adaptive rating ladder of player specs, played on a worker pool
+    """
+    def __init__(self, pool, entrants, results_path, ratings_path, elo_margin=50.0, max_pair_games=400,
+                 batch_size=8, max_turns=150, seed=0):
+        """
+        Entrants are spec texts as on the command line. Earlier results of these entrants are read back
+        """
+        self.pool = pool
+        self.names = list(entrants)
+        self.specs = [parse_spec(name) for name in self.names]
+        self.results_path = results_path
+        self.ratings_path = ratings_path
+        self.elo_margin = elo_margin
+        self.max_pair_games = max_pair_games
+        self.batch_size = batch_size
+        self.max_turns = max_turns
+        self.rng = random.Random(seed)
+        n = len(self.names)
+        self.scores = [[0.0] * n for _ in range(n)]
+        self.games = [[0] * n for _ in range(n)]
+        self.sprts = {(i, j): SPRT(-elo_margin, elo_margin) for i in range(n) for j in range(i + 1, n)}
+        index = {name: i for i, name in enumerate(self.names)}
+        for entry in read_lines(results_path):
+            if entry['white'] in index and entry['black'] in index:
+                self._add(index[entry['white']], index[entry['black']], entry['winner'])
+        self.ratings = Ratings(self.scores, self.games)
+
+    def _add(self, white, black, winner):
+        """
+        Count one game in the score table and in the SPRT of the pair
+        """
+        score = 0.5 if winner is None else 1.0 if winner == 'white' else 0.0
+        self.scores[white][black] += score
+        self.scores[black][white] += 1 - score
+        self.games[white][black] += 1
+        self.games[black][white] += 1
+        i, j = min(white, black), max(white, black)
+        self.sprts[i, j].update(score if white == i else 1 - score)
+
+    def ranking(self):
+        """
+        Entrant indexes from the highest rating down
+        """
+        return sorted(range(len(self.names)), key=lambda i: -self.ratings.elo[i])
+
+    def resolved(self, i, j):
+        """
+        How the order of two entrants was settled: 'sprt', 'ratings', 'games', or None while it is open
+        """
+        i, j = min(i, j), max(i, j)
+        if self.sprts[i, j].status() is not None:
+            return 'sprt'
+        if self.games[i][j] >= self.max_pair_games:
+            return 'games'
+        if self.games[i][j] and abs(self.ratings.elo[i] - self.ratings.elo[j]) >= Z95 * self.ratings.error(i, j):
+            return 'ratings'
+        return None
+
+    def next_pairing(self):
+        """
+        Unresolved neighbours in the ranking with the least certain order, fewest games first on ties. None when
+        every neighbouring pair is resolved
+        """
+        order = self.ranking()
+        best = None
+        for a, b in zip(order, order[1:]):
+            if self.resolved(a, b):
+                continue
+            error = self.ratings.error(a, b)
+            z = abs(self.ratings.elo[a] - self.ratings.elo[b]) / error if error else 0.0
+            key = (0.0 if not self.games[a][b] else z, self.games[a][b])
+            if best is None or key < best[0]:
+                best = (key, (a, b))
+        return best[1] if best else None
+
+    def play(self, a, b):
+        """
+        Play a batch of the pairing with alternating colors and record every result as it comes in
+        """
+        remaining = self.max_pair_games - self.games[a][b]
+        jobs = []
+        for k in range(min(self.batch_size, remaining)):
+            white, black = (a, b) if (self.games[a][b] + k) % 2 == 0 else (b, a)
+            jobs.append((white, black))
+        seeds = [self.rng.randrange(2 ** 32) for _ in jobs]
+        work = [(self.specs[white], self.specs[black], self.max_turns, seed)
+                for (white, black), seed in zip(jobs, seeds)]
+        with open(self.results_path, 'a') as f:
+            for (white, black), winner in zip(jobs, self.pool.imap(_ladder_game, work)):
+                self._add(white, black, winner)
+                f.write(json.dumps({'white': self.names[white], 'black': self.names[black], 'winner': winner}) + '\n')
+                f.flush()
+        self.ratings = Ratings(self.scores, self.games)
+        self.save()
+
+    def save(self):
+        """
+        Write the ratings table atomically
+        """
+        table = [{'name': self.names[i], 'elo': round(self.ratings.elo[i], 1),
+                  'ci': round(Z95 * self.ratings.error(i), 1), 'games': sum(self.games[i])}
+                 for i in self.ranking()]
+        with open(self.ratings_path + '.tmp', 'w') as f:
+            json.dump({'games': self.total_games(), 'ratings': table}, f, indent=2)
+        os.replace(self.ratings_path + '.tmp', self.ratings_path)
+
+    def total_games(self):
+        """
+        Number of games played by all entrants
+        """
+        return sum(map(sum, self.games)) // 2
+
+    def run(self, max_games=2000, on_batch=None):
+        """
+        Play batches until every neighbouring pair is resolved or max_games have been played
+        """
+        while self.total_games() < max_games:
+            pairing = self.next_pairing()
+            if pairing is None:
+                break
+            self.play(*pairing)
+            if on_batch:
+                on_batch(self, pairing)
+        self.save()
+        return self.ranking()
+
+    def table(self):
+        """
+        Ranking lines for the runner output
+        """
+        lines = []
+        order = self.ranking()
+        for rank, i in enumerate(order):
+            line = (f"{rank + 1}. {self.names[i]:<30} {self.ratings.elo[i]:7.1f} +/- {Z95 * self.ratings.error(i):5.1f}"
+                    f"  ({sum(self.games[i])} games)")
+            if rank + 1 < len(order):
+                j = order[rank + 1]
+                line += f", vs next: {self.games[i][j]} games, {self.resolved(i, j) or 'open'}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+class Main:
+    """
+    Ladder runner: python ladder.py [entrants, comma separated specs] [max games] [processes] [results file]
+    [ratings file] [SPRT Elo margin]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['heuristic,random', '2000', str(os.cpu_count() or 1), 'ladder_results.jsonl',
+                    'ladder_ratings.json', '50']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        processes = int(defaults[2])
+        started = time.perf_counter()
+        with Pool(processes) as pool:
+            ladder = Ladder(pool, defaults[0].split(','), defaults[3], defaults[4], float(defaults[5]),
+                            batch_size=processes * 2)
+            before = ladder.total_games()
+
+            def progress(ladder, pairing):
+                a, b = pairing
+                print(f"{ladder.names[a]} vs {ladder.names[b]}: {ladder.games[a][b]} games, "
+                      f"{ladder.total_games()} in total")
+            ladder.run(int(defaults[1]), progress)
+        print(ladder.table())
+        print(f"{ladder.total_games() - before} games in {time.perf_counter() - started:.1f}s, "
+              f"ratings written to {defaults[4]}")
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,214 @@
+"""
+Learned evaluator: piece-square weights per era and cell for own and opponent pieces, plus the
+c1..c5 terms of Player.eval and a bias, fit on self-play shards written by dataset.py.
+The model is a single float32 vector saved in a small .npz file
+"""
+
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+from constants import ERAS
+from dataset import ShardDataset, SIZE
+from player import HeuristicAI
+from selfplay import play_game
+
+CELLS = len(ERAS) * SIZE * SIZE
+ERA_OFFSET = {era: i * SIZE * SIZE for i, era in enumerate(ERAS)}
+FEATURES = 2 * CELLS + 5 + 1
+MODEL_VERSION = 1
+DEFAULT_MODEL_FILE = 'evaluator.npz'
+
+
+def record_features(records):
+    """
+    Feature matrix of dataset records: own and opponent occupancy planes, own c1..c5 and a bias column
+    """
+    n = len(records)
+    planes = records['planes'].reshape(n, -1).astype(np.float64)
+    terms = records['eval'][:, 0, :].astype(np.float64)
+    return np.hstack([planes, terms, np.ones((n, 1))])
+
+
+def record_targets(records):
+    """
+    Outcome of the records as a probability of winning: 1 win, 0.5 draw, 0 loss
+    """
+    return (records['outcome'].astype(np.float64) + 1) / 2
+
+
+class LearnedEvaluator:
+    """
+    Linear evaluator over piece-square and c1..c5 features, fit on positions seen from the side to move.
+    Scoring is not incremental: every score is a full sum of one table lookup per piece plus the five terms,
+    O(pieces) per position, recomputed for every candidate move
+    """
+    def __init__(self, weights):
+        """
+        Split the weight vector into Python lists, which are faster to index than NumPy scalars
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        self.weights = weights
+        self.piece_square = [weights[:CELLS].tolist(), weights[CELLS:2 * CELLS].tolist()]
+        self.terms = weights[2 * CELLS:2 * CELLS + 5].tolist()
+        self.bias = float(weights[-1])
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an evaluator saved with save
+        """
+        with np.load(path) as data:
+            if int(data['version']) != MODEL_VERSION:
+                raise ValueError("Unknown evaluator file version")
+            return cls(data['weights'])
+
+    def save(self, path):
+        """
+        Save the weights as float32 in a compressed .npz file
+        """
+        np.savez_compressed(path, version=MODEL_VERSION, weights=self.weights.astype(np.float32))
+
+    def piece_value(self, side, piece):
+        """
+        Piece-square weight of a piece, side 0 for the evaluating player's pieces and 1 for the opponent's
+        """
+        return self.piece_square[side][ERA_OFFSET[piece.era] + piece.x * SIZE + piece.y]
+
+    def score(self, game, player):
+        """
+        Score of the position for the player. The players score the position after their own move, where the
+        opponent is to move, so the model is applied from the opponent's side, the side it was fit for, and
+        the opponent's value is negated
+        """
+        opponent = game.players[1 - game.players.index(player)]
+        c1, c2, c3, c4, c5 = opponent.eval(game)
+        t1, t2, t3, t4, t5 = self.terms
+        score = self.bias + t1 * c1 + t2 * c2 + t3 * c3 + t4 * c4 + t5 * c5
+        own, other = self.piece_square
+        for p in opponent.pieces:
+            score += own[ERA_OFFSET[p.era] + p.x * SIZE + p.y]
+        for p in player.pieces:
+            score += other[ERA_OFFSET[p.era] + p.x * SIZE + p.y]
+        return -score
+
+    @classmethod
+    def fit(cls, dataset, method='logistic', iterations=8, l2=1e-2):
+        """
+        Fit on a ShardDataset with vectorized passes over the mapped shards: regularized least squares
+        on the outcome, or logistic regression by Newton steps (IRLS)
+        """
+        if method == 'lstsq':
+            gram, rhs = l2 * np.eye(FEATURES), np.zeros(FEATURES)
+            for shard in dataset.all():
+                x, y = record_features(shard), record_targets(shard) * 2 - 1
+                gram += x.T @ x
+                rhs += x.T @ y
+            return cls(np.linalg.solve(gram, rhs))
+        weights = np.zeros(FEATURES)
+        for _ in range(iterations):
+            gradient, hessian = l2 * weights, l2 * np.eye(FEATURES)
+            for shard in dataset.all():
+                x, y = record_features(shard), record_targets(shard)
+                p = 1 / (1 + np.exp(-(x @ weights)))
+                gradient += x.T @ (p - y)
+                hessian += (x * (p * (1 - p))[:, None]).T @ x
+            weights -= np.linalg.solve(hessian, gradient)
+        return cls(weights)
+
+
+class LearnedAI(HeuristicAI):
+    """
+    Heuristic AI that scores moves with a learned evaluator instead of the w1..w5 blend.
+    The evaluator file is given in place of the weights, evaluators are loaded once per file
+    """
+    _evaluators = {}
+
+    def __init__(self, color, supply = 7, weights = None):
+        """The weights argument is the path of the evaluator file, DEFAULT_MODEL_FILE when it is None"""
+        super().__init__(color, supply)
+        self.model_file = weights or DEFAULT_MODEL_FILE
+        if self.model_file not in LearnedAI._evaluators:
+            if not os.path.exists(self.model_file):
+                raise FileNotFoundError(f"No evaluator file {self.model_file}, fit one with python learned_eval.py fit")
+            LearnedAI._evaluators[self.model_file] = LearnedEvaluator.load(self.model_file)
+
+    def score_system(self, game, w1, w2, w3, w4, w5):
+        """Learned AI Player evaluates the movement with the learned evaluator"""
+        return LearnedAI._evaluators[self.model_file].score(game, self)
+
+
+def _bench_game(job):
+    """
+    Worker: one game of the learned evaluator against HeuristicAI, return the learned player's score
+    """
+    model_file, learned_color, seed = job
+    learned, heuristic = ('learned', model_file), ('heuristic', None)
+    if learned_color == 'white':
+        record = play_game(learned, heuristic, 150, seed)
+    else:
+        record = play_game(heuristic, learned, 150, seed)
+    if record.winner is None:
+        return 0.5
+    return 1 if record.winner == learned_color else 0
+
+
+def benchmark(model_file, games=100, processes=1, evaluations=20000):
+    """
+    Compare the evaluation speed of both evaluators on self-play positions and the win rate of
+    the learned evaluator against HeuristicAI, with alternating colors
+    """
+    positions = []
+    play_game(('heuristic', None), ('heuristic', None), 150, 0,
+              lambda game, move: positions.append(game.copy_without_history()))
+    evaluator = LearnedEvaluator.load(model_file)
+    timings = {}
+    for name, evaluate in (('heuristic', lambda g: g.current_player().score_system(g, *g.current_player().weights)),
+                           ('learned', lambda g: evaluator.score(g, g.current_player()))):
+        started = time.perf_counter()
+        for i in range(evaluations):
+            evaluate(positions[i % len(positions)])
+        timings[name] = (time.perf_counter() - started) / evaluations * 1e6
+    jobs = [(model_file, 'white' if i % 2 == 0 else 'black', i) for i in range(games)]
+    with Pool(processes) as pool:
+        scores = pool.map(_bench_game, jobs)
+    return timings, sum(scores) / len(scores)
+
+
+class Main:
+    """
+    Learned evaluator runner:
+    python learned_eval.py fit [data directory] [model file] [logistic|lstsq]
+    python learned_eval.py bench [model file] [games] [processes]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        command = args[0] if args else 'fit'
+        if command == 'fit':
+            defaults = ['selfplay_data', DEFAULT_MODEL_FILE, 'logistic']
+        else:
+            defaults = [DEFAULT_MODEL_FILE, '100', str(os.cpu_count() or 1)]
+        for i, arg in enumerate(args[1:]):
+            if i < len(defaults):
+                defaults[i] = arg
+        if command == 'fit':
+            dataset = ShardDataset(defaults[0])
+            started = time.perf_counter()
+            evaluator = LearnedEvaluator.fit(dataset, defaults[2])
+            evaluator.save(defaults[1])
+            print(f"fit {len(dataset)} positions in {time.perf_counter() - started:.1f}s, saved {defaults[1]}")
+        elif command == 'bench':
+            timings, score = benchmark(defaults[0], int(defaults[1]), int(defaults[2]))
+            print(f"evaluation: heuristic {timings['heuristic']:.1f}us, learned {timings['learned']:.1f}us")
+            print(f"learned vs heuristic: {score:.1%} score over {defaults[1]} games")
+        else:
+            raise ValueError("Unknown command")
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,85 @@
+"""
+Load generator for the game server: simulated clients each play a series of games as white
+against a server-side AI, choosing random legal moves as soon as it is their turn.
+The latency of a move is the time from sending the client's move to the next turn event,
+so it covers the AI reply computed on the server's process pool
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+from server import DEFAULT_ADDRESS, open_connection
+from util import percentile
+
+
+async def simulated_client(address, games, opponent, rng, latencies, counters):
+    """
+    Play the games on one connection, append the move latencies and count the moves seen
+    """
+    reader, writer = await open_connection(address)
+    try:
+        for _ in range(games):
+            writer.write((json.dumps({'op': 'new', 'white': 'human', 'black': opponent}) + '\n').encode())
+            await writer.drain()
+            sent = None
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("server closed the connection")
+                message = json.loads(line)
+                event = message.get('event')
+                if event == 'move':
+                    counters['moves'] += 1
+                elif event == 'turn':
+                    if sent is not None:
+                        latencies.append(time.perf_counter() - sent)
+                    symbol, dir1, dir2 = rng.choice(message['legal'])
+                    move = [symbol, dir1, dir2, rng.choice(message['focus'])]
+                    sent = time.perf_counter()
+                    writer.write((json.dumps({'op': 'move', 'game': message['game'], 'move': move}) + '\n').encode())
+                    await writer.drain()
+                elif event == 'end':
+                    counters['games'] += 1
+                    break
+                elif not message.get('ok', True):
+                    raise RuntimeError(message['error'])
+    finally:
+        writer.close()
+
+
+async def run_load(address, clients, games, opponent='heuristic', seed=0):
+    """
+    Run the clients concurrently and return moves/sec, p50 and p99 move latency and the counters
+    """
+    rng = random.Random(seed)
+    latencies, counters = [], {'moves': 0, 'games': 0}
+    started = time.perf_counter()
+    await asyncio.gather(*(simulated_client(address, games, opponent, random.Random(rng.randrange(2 ** 32)),
+                                            latencies, counters) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return counters['moves'] / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), counters
+
+
+class Main:
+    """
+    Load generator runner: python loadgen.py [host:port or unix:<path>] [clients] [games per client] [opponent]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = [DEFAULT_ADDRESS, '100', '2', 'heuristic']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        rate, p50, p99, counters = asyncio.run(run_load(defaults[0], int(defaults[1]), int(defaults[2]), defaults[3]))
+        print(f"{counters['games']} games, {counters['moves']} moves, {rate:.0f} moves/s, "
+              f"latency p50 {p50 * 1000:.1f}ms p99 {p99 * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    Main.run()
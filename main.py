@@ -1,4 +1,9 @@
 import sys
+import tempfile
+from clock import LatencyLog, MoveTimer, parse_time_control
+from constants import parse_variant
+from move_cache import MoveCache, DEFAULT_CACHE_FILE
+from opening_book import OpeningBook
 from play_game import BaseGame, PlayDecorator
 from player import HumanPlayer, HeuristicAI, RandomAI
 
@@ -9,12 +14,16 @@ class Main:
     @staticmethod
     def create_player(color, ptype):
         """
-        Create players based on the input type
+        Create players based on the input type, 'heuristic=<weight file>' loads tuned weights
         """
+        ptype, _, weights_file = ptype.partition('=')
+        ptype = ptype.lower()
         if ptype == 'human': 
             return HumanPlayer(color)
         if ptype == 'random': 
             return RandomAI(color)
+        if ptype == 'heuristic' and weights_file:
+            return HeuristicAI.from_weights_file(color, weights_file)
         if ptype == 'heuristic': 
             return HeuristicAI(color)
         raise ValueError("Unknown player type")
@@ -25,20 +34,42 @@ class Main:
         Main runner
         """
         args = sys.argv[1:]
-        defaults = ['human', 'human', 'off', 'off']
+        defaults = ['human', 'human', 'off', 'off', 'off', 'off', 'off', 'off', 'off']
         for i, arg in enumerate(args):
             if i < len(defaults):
-                defaults[i] = arg.lower()
+                defaults[i] = arg
 
         p1_type, p2_type = defaults[0], defaults[1]
-        use_history = defaults[2].lower() == 'on'
+        use_history = defaults[2].lower() == 'on' or defaults[2].isdigit()
+        history_limit = spill_dir = None
+        if defaults[2].isdigit():
+            # a number keeps that many snapshots in memory and spills older ones to disk
+            history_limit, spill_dir = int(defaults[2]), tempfile.gettempdir()
         verbose = defaults[3].lower() == 'on'
+        ponder = defaults[4].lower() == 'on'
+        use_cache = defaults[5].lower() == 'on'
+        book_file = None if defaults[6].lower() == 'off' else defaults[6]
+        time_control = parse_time_control(defaults[7])
+        size, eras, supply = parse_variant(defaults[8])
 
         p1 = Main.create_player("white", p1_type)
         p2 = Main.create_player("black", p2_type)
-        game = BaseGame(p1, p2, current=0, use_history=use_history, verbose=verbose)
-        game = PlayDecorator(game)
-        game.play()
+        base = BaseGame(p1, p2, current=0, use_history=use_history, verbose=verbose, time_control=time_control,
+                        size=size, eras=eras, supply=supply, history_limit=history_limit, spill_dir=spill_dir)
+        log = LatencyLog() if time_control else None
+        game = PlayDecorator(base, ponder=ponder, timer=MoveTimer(log=log))
+        if use_cache:
+            HeuristicAI.move_cache = MoveCache(DEFAULT_CACHE_FILE)
+        if book_file:
+            HeuristicAI.opening_book = OpeningBook(book_file, randomness=0.2)
+        try:
+            game.play()
+        finally:
+            base.close()
+            if HeuristicAI.move_cache:
+                HeuristicAI.move_cache.close()
+            if log:
+                log.close()
 
 if __name__ == '__main__':
     Main.run()
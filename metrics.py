@@ -0,0 +1,359 @@
+"""
+Live metrics of games, players and drivers. Every process keeps its own Metrics (counters, gauges and move
+latency histograms by player type, nothing shared between processes) and writes it as a JSON snapshot to
+<directory>/<pid>.json at the end of every game and at most every SNAPSHOT_INTERVAL seconds in between,
+replacing the file atomically so a reader never sees a partial one. The exporter adds up the snapshots of all
+processes and serves them in the Prometheus text format on localhost, with games/s and moves/s since the
+previous scrape. Counters and histograms are cumulative over the life of a process, so the snapshots of
+processes that have exited still count towards them, while gauges are only taken from processes that are still
+running. Metrics are off unless enable() is called or BOARDGAME_METRICS names the snapshot directory;
+worker processes inherit the variable and keep their own snapshot, a forked worker does not carry over the
+counts of its parent
+"""
+
+import atexit
+import bisect
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENV_VAR = 'BOARDGAME_METRICS'
+DEFAULT_ADDRESS = 'localhost:9108'
+PREFIX = 'boardgame_'
+SNAPSHOT_INTERVAL = 1.0
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HELP = {
+    'games_total': ('counter', 'Finished games by winner'),
+    'moves_total': ('counter', 'Moves by player type'),
+    'move_latency_seconds': ('histogram', 'Time to choose a move by player type'),
+    'cache_hits_total': ('counter', 'Cache hits by cache'),
+    'cache_misses_total': ('counter', 'Cache misses by cache'),
+    'caretaker_memory_bytes': ('gauge', 'Undo/redo snapshots held in memory by the last game with history'),
+    'caretaker_disk_bytes': ('gauge', 'Undo/redo snapshots spilled to disk by the last game with history'),
+    'processes': ('gauge', 'Running processes with a metrics snapshot'),
+    'games_per_second': ('gauge', 'Finished games per second since the previous scrape'),
+    'moves_per_second': ('gauge', 'Moves per second since the previous scrape'),
+}
+
+_state = (None, None)
+
+
+def current():
+    """
+    Metrics of this process, or None when metrics are off
+    """
+    global _state
+    pid, metrics = _state
+    if pid == os.getpid():
+        return metrics
+    directory = os.environ.get(ENV_VAR)
+    metrics = Metrics(directory) if directory else None
+    _state = (os.getpid(), metrics)
+    return metrics
+
+
+def enable(directory):
+    """
+    Turn metrics on for this process and the workers it starts, return the Metrics of this process
+    """
+    global _state
+    os.environ[ENV_VAR] = directory
+    _state = (None, None)
+    return current()
+
+
+def _key(name, labels):
+    """
+    Dictionary key of a metric: the name and the sorted labels
+    """
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms of one process
+    """
+    def __init__(self, directory=None):
+        """
+        Start empty, snapshots go to the directory when one is given
+        """
+        self.pid = os.getpid()
+        self.directory = directory
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._written = 0.0
+        self._cache_base = self._caches()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.write)
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add to a counter
+        """
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Set a gauge
+        """
+        self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Count a value in its latency bucket, the last bucket is +Inf
+        """
+        key = _key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram[1] += value
+
+    def record_move(self, game, player, elapsed):
+        """
+        One move chosen in elapsed seconds, with the history memory of the game when it keeps one
+        """
+        kind = type(player).__name__
+        self.inc('moves_total', player=kind)
+        self.observe('move_latency_seconds', elapsed, player=kind)
+        caretaker = getattr(game, 'caretaker', None)
+        if caretaker:
+            usage = caretaker.memory_usage()
+            self.set('caretaker_memory_bytes', usage['memory_bytes'])
+            self.set('caretaker_disk_bytes', usage['disk_bytes'])
+        if time.time() - self._written >= SNAPSHOT_INTERVAL:
+            self.write()
+
+    def record_game(self, winner):
+        """
+        One finished game, None for a draw. Writes the snapshot
+        """
+        self.inc('games_total', winner=winner or 'draw')
+        self.write()
+
+    def _caches(self):
+        """
+        Hits and misses of the caches in use: the move cache, the opening book and the legal move index
+        """
+        from game import Game
+        from player import HeuristicAI
+        caches = {'legal_move_index': (Game.index_reuses, Game.index_builds)}
+        for name, cache in (('move', HeuristicAI.move_cache), ('opening_book', HeuristicAI.opening_book)):
+            if cache is not None:
+                caches[name] = (cache.hits, cache.misses)
+        return caches
+
+    def snapshot(self):
+        """
+        JSON-ready copy of every metric, with the cache counters read now. Counts a forked process inherited
+        from its parent are left out
+        """
+        counters = dict(self.counters)
+        for cache, (hits, misses) in self._caches().items():
+            base_hits, base_misses = self._cache_base.get(cache, (0, 0))
+            counters[_key('cache_hits_total', {'cache': cache})] = hits - base_hits
+            counters[_key('cache_misses_total', {'cache': cache})] = misses - base_misses
+        return {'pid': self.pid, 'started': self.started, 'time': time.time(),
+                'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, dict(labels), counts, total]
+                               for (name, labels), (counts, total) in self.histograms.items()]}
+
+    def write(self):
+        """
+        Replace the snapshot file of this process
+        """
+        if not self.directory or os.getpid() != self.pid:
+            return
+        path = os.path.join(self.directory, f"{self.pid}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+        self._written = time.time()
+
+
+def read_snapshots(directory):
+    """
+    Snapshots of all processes in a directory
+    """
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return snapshots
+
+
+def _alive(pid):
+    """
+    Check whether a process with the pid is running. Signal 0 only probes on POSIX, elsewhere every process
+    counts as running
+    """
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def aggregate(snapshots):
+    """
+    Sum of the snapshots: counters, gauges and histogram buckets are added up by name and labels. Counters and
+    histograms are cumulative and include processes that have exited, gauges only come from running processes
+    """
+    counters, gauges, histograms = {}, {}, {}
+    running = 0
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        if _alive(snapshot['pid']):
+            running += 1
+            for name, labels, value in snapshot['gauges']:
+                key = _key(name, labels)
+                gauges[key] = gauges.get(key, 0) + value
+        for name, labels, counts, total in snapshot['histograms']:
+            key = _key(name, labels)
+            if key not in histograms:
+                histograms[key] = [[0] * len(counts), 0.0]
+            histograms[key][0] = [a + b for a, b in zip(histograms[key][0], counts)]
+            histograms[key][1] += total
+    gauges[_key('processes', {})] = running
+    return counters, gauges, histograms
+
+
+def _labels(labels, **extra):
+    """
+    Label set in the text format
+    """
+    items = list(labels) + list(extra.items())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}' if items else ''
+
+
+def render(counters, gauges, histograms):
+    """
+    Metrics in the Prometheus text exposition format
+    """
+    lines, seen = [], set()
+
+    def header(name):
+        if name not in seen:
+            seen.add(name)
+            kind, text = HELP.get(name, ('untyped', name))
+            lines.append(f"# HELP {PREFIX}{name} {text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+    for values in (counters, gauges):
+        for (name, labels), value in sorted(values.items()):
+            header(name)
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+    for (name, labels), (counts, total) in sorted(histograms.items()):
+        header(name)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """
+    Aggregated metrics of a snapshot directory, or of this process alone, with rates between scrapes
+    """
+    def __init__(self, directory=None):
+        """
+        Read the snapshots of the directory, or the Metrics of this process when no directory is given
+        """
+        self.directory = directory
+        self._previous = None
+
+    def text(self):
+        """
+        Current metrics in the text format
+        """
+        if self.directory:
+            snapshots = read_snapshots(self.directory)
+        else:
+            metrics = current()
+            snapshots = [metrics.snapshot()] if metrics else []
+        counters, gauges, histograms = aggregate(snapshots)
+        now = time.time()
+        totals = tuple(sum(value for (name, _), value in counters.items() if name == total)
+                       for total in ('games_total', 'moves_total'))
+        if self._previous is None:
+            since = min((snapshot['started'] for snapshot in snapshots), default=now)
+            self._previous = (since, (0, 0))
+        since, before = self._previous
+        elapsed = now - since
+        for name, count, old in zip(('games_per_second', 'moves_per_second'), totals, before):
+            gauges[_key(name, {})] = round((count - old) / elapsed, 3) if elapsed > 0 else 0.0
+        self._previous = (now, totals)
+        return render(counters, gauges, histograms)
+
+    def serve(self, address=DEFAULT_ADDRESS):
+        """
+        Serve GET /metrics on 'host:port' until interrupted
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        host, _, port = address.rpartition(':')
+        with ThreadingHTTPServer((host, int(port)), Handler) as server:
+            server.serve_forever()
+
+
+class Main:
+    """
+    Metrics exporter: python metrics.py [snapshot directory] [host:port, or 'print' for one scrape]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['metrics', DEFAULT_ADDRESS]
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        exporter = MetricsExporter(defaults[0])
+        if defaults[1] == 'print':
+            print(exporter.text(), end='')
+            return
+        print(f"serving the metrics of {defaults[0]} on http://{defaults[1]}/metrics")
+        try:
+            exporter.serve(defaults[1])
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from constants import w1, w2, w3, w4, w5
+from symmetry import canonicalize, from_canonical_move, to_canonical_move
+
+CACHE_SCHEMA = 4
+DEFAULT_CACHE_FILE = 'move_cache.sqlite'
+
+
+def weights_version(weights):
+    """
+    Version string of a weight vector: cached moves are only valid for the weights they were chosen with
+    """
+    return hashlib.blake2b(repr((CACHE_SCHEMA, tuple(weights))).encode(), digest_size=8).hexdigest()
+
+
+class MoveCache:
+    """
+    Persistent cache of the moves the heuristic player chose, backed by a local sqlite file.
+    An entry holds every move tied for the best score at a position, so a hit replaces the whole
+    enumeration and scoring of the candidate moves and the tie is still broken at random.
+    Positions are keyed on their canonical key, so the 8 symmetric positions of a board with either color to
+    move share one entry, and the moves are stored in the canonical frame and mapped back to the game on a hit.
+    All entries are loaded into memory when the cache is opened, so lookups never touch the disk.
+    New entries and last-used times are written in batches by a background writer thread.
+    The file keeps at most max_entries positions: the least recently used ones and the ones older
+    than max_age seconds are evicted. A file written with other weights is cleared on open
+    """
+    def __init__(self, path, weights=(w1, w2, w3, w4, w5), max_entries=200000, max_age=None,
+                 batch_size=512, flush_interval=2.0):
+        """
+        Open (or create) the cache file for the weights and start the writer thread
+        """
+        self.path = path
+        self.weights = tuple(weights)
+        self.version = weights_version(self.weights)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self._moves = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._flush_requests = 0
+        self._flush_done = 0
+        self._closed = False
+        self._load()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        """
+        Open a connection to the cache file, creating the tables when needed
+        """
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS moves (hash INTEGER PRIMARY KEY, moves TEXT, used REAL)")
+        return conn
+
+    def _load(self):
+        """
+        Check the version of the file, drop stale entries and load the rest in LRU order
+        """
+        conn = self._connect()
+        with conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                conn.execute("DELETE FROM moves")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+            if self.max_age is not None:
+                conn.execute("DELETE FROM moves WHERE used < ?", (time.time() - self.max_age,))
+            self._evict(conn)
+        for key, moves in conn.execute("SELECT hash, moves FROM moves ORDER BY used"):
+            self._moves[key] = tuple((tuple(square) if square else None, dir1, dir2, focus)
+                                     for square, dir1, dir2, focus in json.loads(moves))
+        conn.close()
+
+    def _evict(self, conn):
+        """
+        Remove the least recently used entries from the file beyond max_entries
+        """
+        count = conn.execute("SELECT COUNT(*) FROM moves").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("DELETE FROM moves WHERE hash IN (SELECT hash FROM moves ORDER BY used LIMIT ?)",
+                         (count - self.max_entries,))
+
+    def key(self, game):
+        """
+        Cache key of the position and the Transform onto its canonical frame. The key is a stable 64-bit hash
+        of the canonical key, like Game.canonical_hash, computed from one canonicalization
+        """
+        canonical, transform = canonicalize(game)
+        data = repr((canonical, None)).encode()
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True), transform
+
+    def probe(self, game):
+        """
+        Cached best moves of the position as Moves on the pieces of the game, or None
+        """
+        key, transform = self.key(game)
+        moves = self.get(key)
+        if moves is None:
+            return None
+        return [from_canonical_move(game, move, transform) for move in moves]
+
+    def store(self, game, moves):
+        """
+        Store the best Moves of the position in the canonical frame
+        """
+        key, transform = self.key(game)
+        self.put(key, [to_canonical_move(move, transform) for move in moves])
+
+    def get(self, key):
+        """
+        Cached best moves of the key as canonical (square, dir1, dir2, focus) tuples or None, a hit refreshes
+        the entry's last-used time
+        """
+        with self._lock:
+            moves = self._moves.get(key)
+            if moves is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._moves.move_to_end(key)
+            self._pending[key] = (moves, time.time())
+        return moves
+
+    def put(self, key, moves):
+        """
+        Store the best moves of a position as canonical (square, dir1, dir2, focus) tuples, the write to disk
+        happens later in a batch
+        """
+        moves = tuple(tuple(move) for move in moves)
+        with self._lock:
+            self._moves[key] = moves
+            self._moves.move_to_end(key)
+            while len(self._moves) > self.max_entries:
+                self._moves.popitem(last=False)
+            self._pending[key] = (moves, time.time())
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+
+    def hit_rate(self):
+        """
+        Share of lookups answered by the cache
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _write_loop(self):
+        """
+        Writer thread: write the pending entries every flush_interval or when a batch is full
+        """
+        conn = self._connect()
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                ticket = self._flush_requests
+                closed = self._closed
+            if batch:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO moves VALUES (?, ?, ?)",
+                                     [(key, json.dumps(moves), used) for key, (moves, used) in batch.items()])
+                    self._evict(conn)
+            with self._written:
+                self._flush_done = ticket
+                self._written.notify_all()
+            if closed:
+                conn.close()
+                return
+
+    def flush(self):
+        """
+        Block until everything stored so far is written to disk
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_requests += 1
+            ticket = self._flush_requests
+        self._wake.set()
+        with self._written:
+            self._written.wait_for(lambda: self._flush_done >= ticket)
+
+    def close(self):
+        """
+        Write the remaining entries and stop the writer thread
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._writer.join()
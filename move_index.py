@@ -0,0 +1,94 @@
+from constants import DIRECTIONS, TIMESHIFT
+
+
+class LegalMoveIndex:
+    """
+    Legal moves of the player to move, computed once per position:
+    piece symbol -> first direction -> (square after the first step, second direction -> final square)
+    A square is an (era, x, y) tuple. Only first steps that can be followed by a second step are kept,
+    the same way enumerate_all_moves only counts complete moves
+    """
+    def __init__(self, game):
+        """
+        Build the index for the current position of the game with the rules of Game itself. First steps are
+        tried on one copy without history that is restored to the position after each of them
+        """
+        player = game.current_player()
+        self.color = player.color
+        self.focus = game.focus[player.color]
+        self.eras = game.eras
+        self._moves = {}
+        trial = game.copy_without_history()
+        position = trial.to_position()
+        for piece in player.pieces:
+            if piece.era == self.focus:
+                self._moves[piece.symbol] = self._piece_moves(game, trial, position, piece)
+
+    def _landing(self, piece, direction):
+        """
+        Square the piece lands on with a legal step in the direction
+        """
+        if direction in DIRECTIONS:
+            dx, dy = DIRECTIONS[direction]
+            return piece.era, piece.x + dx, piece.y + dy
+        return self.eras[self.eras.index(piece.era) + TIMESHIFT[direction]], piece.x, piece.y
+
+    def _piece_moves(self, game, trial, position, piece):
+        """
+        First and second step options of one piece, each first step is made on the trial copy and taken
+        back by restoring the position
+        """
+        dirs = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
+        options = {}
+        for dir1 in dirs:
+            if not game.can_move(piece, dir1):
+                continue
+            square = self._landing(piece, dir1)
+            piece_copy = trial.find_piece(piece.symbol)
+            trial.move_piece(piece_copy, dir1)
+            second = {dir2: self._landing(piece_copy, dir2) for dir2 in dirs if trial.can_move(piece_copy, dir2)}
+            trial.restore_position(position)
+            if second:
+                options[dir1] = (square, second)
+        return options
+
+    def pieces(self):
+        """
+        Symbols of the pieces that have at least one complete move
+        """
+        return [symbol for symbol, options in self._moves.items() if options]
+
+    def first_steps(self, symbol):
+        """
+        First direction -> square after the first step, for the piece with the symbol
+        """
+        return {dir1: square for dir1, (square, _) in self._moves.get(symbol, {}).items()}
+
+    def second_steps(self, symbol, dir1):
+        """
+        Second direction -> final square, after the piece took the first direction
+        """
+        option = self._moves.get(symbol, {}).get(dir1)
+        return dict(option[1]) if option else {}
+
+    def direction_to(self, symbol, square, dir1=None):
+        """
+        Direction that takes the piece to the square: a first step, or a second step after dir1
+        """
+        steps = self.second_steps(symbol, dir1) if dir1 else self.first_steps(symbol)
+        return {target: direction for direction, target in steps.items()}.get(square)
+
+    def is_legal(self, symbol, dir1, dir2):
+        """
+        Check whether the two steps form a legal move for the piece
+        """
+        return dir2 in self.second_steps(symbol, dir1)
+
+    def moves(self):
+        """
+        Iterate all (symbol, dir1, dir2) combinations of the position
+        """
+        for symbol, options in self._moves.items():
+            for dir1, (_, second) in options.items():
+                for dir2 in second:
+                    yield symbol, dir1, dir2
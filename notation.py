@@ -0,0 +1,78 @@
+"""
+One-line text notation of a position, in the spirit of chess FEN. The fields are separated by spaces:
+
+    <boards> <white symbols> <black symbols> <white focus> <black focus> <side to move> [<turn>]
+
+Boards are written from past to future separated by '|', each board row by row separated by '/', one
+character per cell with '.' for an empty one. Symbols longer than one character are put in parentheses,
+e.g. (10). The symbol fields are the remaining symbols of each player in the order they come into play
+('-' for none), the supply is their number. Focus fields are era names and the side to move is w or b.
+The start of the usual game is
+
+    1.../..../..../...A|2.../..../..../...B|3.../..../..../...C DEFG 4567 past future w 1
+"""
+
+import re
+from constants import era_names
+from position import Position
+
+_TOKEN = re.compile(r'\(([^)]+)\)|(.)')
+
+
+def _symbols(text):
+    """
+    Symbols of a board row or a symbol field, '.' stands for an empty cell
+    """
+    if '(' not in text:
+        return [None if char == '.' else char for char in text]
+    return [long or (None if short == '.' else short) for long, short in _TOKEN.findall(text)]
+
+
+def _write_symbols(symbols):
+    """
+    Symbols as text, empty cells as '.'
+    """
+    return ''.join('.' if s is None else s if len(s) == 1 else f"({s})" for s in symbols)
+
+
+def write(position, turn=None):
+    """
+    Notation of a Position, with the turn counter when given
+    """
+    size = position.size
+    boards = '|'.join('/'.join(_write_symbols(board[row * size:(row + 1) * size]) for row in range(size))
+                      for board in position.boards)
+    queues = {color: _write_symbols(symbols) or '-' for color, _, symbols in position.players}
+    side = 'w' if position.players[position.current][0] == 'white' else 'b'
+    fields = [boards, queues['white'], queues['black'], position.focus[0], position.focus[1], side]
+    if turn is not None:
+        fields.append(str(turn))
+    return ' '.join(fields)
+
+
+def read(text):
+    """
+    Position and turn (None when missing) of a notation line. White is the first player of the position.
+    Raise ValueError for malformed notation
+    """
+    fields = text.split()
+    if len(fields) not in (6, 7):
+        raise ValueError(f"Expected 6 or 7 fields in the notation, got {len(fields)}")
+    boards_text, white, black, white_focus, black_focus, side = fields[:6]
+    boards = []
+    size = None
+    for board_text in boards_text.split('|'):
+        rows = [_symbols(row) for row in board_text.split('/')]
+        size = size or len(rows)
+        if len(rows) != size or any(len(row) != size for row in rows):
+            raise ValueError(f"Board {board_text} is not {size}x{size}")
+        boards.append(tuple(s for row in rows for s in row))
+    eras = era_names(len(boards))
+    if white_focus not in eras or black_focus not in eras:
+        raise ValueError(f"Unknown focus era in {white_focus} {black_focus}")
+    if side not in ('w', 'b'):
+        raise ValueError(f"Side to move must be w or b, not {side}")
+    queues = [tuple(_symbols(queue)) if queue != '-' else () for queue in (white, black)]
+    players = (('white', len(queues[0]), queues[0]), ('black', len(queues[1]), queues[1]))
+    position = Position(size, eras, tuple(boards), players, (white_focus, black_focus), 0 if side == 'w' else 1)
+    return position, int(fields[6]) if len(fields) == 7 else None
@@ -0,0 +1,136 @@
+import pickle
+import random
+import sys
+from move import Move
+from selfplay import read_records
+from symmetry import canonicalize, to_canonical_move, from_canonical_move
+
+BOOK_VERSION = 1
+
+
+class OpeningBookBuilder:
+    """
+    Aggregate recorded games into move statistics per canonical position for the first turns.
+    Symmetric positions share one entry and their moves are stored in the canonical frame
+    """
+    def __init__(self, depth=8):
+        """
+        Only positions up to this turn are collected
+        """
+        self.depth = depth
+        self.stats = {}
+        self.games = 0
+
+    def add_record(self, record):
+        """
+        Add the opening moves of one GameRecord with the result seen from the player who made them
+        """
+        self.games += 1
+        for game, (symbol, dir1, dir2, next_focus) in record.replay():
+            if game.turn > self.depth:
+                break
+            key, transform = canonicalize(game)
+            piece = game.find_piece(symbol) if symbol else None
+            canonical_move = to_canonical_move(Move(piece, dir1, dir2, next_focus), transform)
+            color = game.current_player().color
+            score = 0.5 if record.winner is None else 1.0 if record.winner == color else 0.0
+            entry = self.stats.setdefault(key, {}).setdefault(canonical_move, [0, 0.0])
+            entry[0] += 1
+            entry[1] += score
+
+    def build(self, min_games=2):
+        """
+        Book table: canonical key -> list of (canonical move, games, average score), best first.
+        Moves played fewer than min_games times are left out
+        """
+        table = {}
+        for key, moves in self.stats.items():
+            entries = [(move, games, total / games) for move, (games, total) in moves.items() if games >= min_games]
+            if entries:
+                entries.sort(key=lambda e: (e[2], e[1]), reverse=True)
+                table[key] = entries
+        return table
+
+    def save(self, path, min_games=2):
+        """
+        Write the book file
+        """
+        with open(path, 'wb') as f:
+            pickle.dump({'version': BOOK_VERSION, 'depth': self.depth, 'games': self.games,
+                         'table': self.build(min_games)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class OpeningBook:
+    """
+    Read-only opening book: a dictionary lookup on the canonical key of the position.
+    Up to depth turns the best scoring move is served, or with probability randomness
+    a move drawn in proportion to how often it was played and how well it scored
+    """
+    def __init__(self, path, depth=None, randomness=0.0, seed=None):
+        """
+        Load the book, depth can only shorten the depth it was built with
+        """
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data['version'] != BOOK_VERSION:
+            raise ValueError("Unknown opening book version")
+        self.table = data['table']
+        self.depth = min(depth, data['depth']) if depth else data['depth']
+        self.randomness = randomness
+        self.rng = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """
+        Number of positions in the book
+        """
+        return len(self.table)
+
+    def probe(self, game):
+        """
+        Book Move for the position of the game, or None when the position is out of book
+        """
+        if game.turn > self.depth:
+            return None
+        key, transform = canonicalize(game)
+        entries = self.table.get(key)
+        if not entries:
+            self.misses += 1
+            return None
+        if self.randomness and self.rng.random() < self.randomness:
+            canonical_move = self.rng.choices([e[0] for e in entries], [e[1] * e[2] + 1e-9 for e in entries])[0]
+        else:
+            canonical_move = entries[0][0]
+        move = from_canonical_move(game, canonical_move, transform)
+        if canonical_move[0] is not None and move.piece is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return move
+
+
+class Main:
+    """
+    Opening book runner: python opening_book.py [records file] [book file] [depth] [min games]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['records.jsonl', 'opening_book.pkl', '8', '2']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        builder = OpeningBookBuilder(int(defaults[2]))
+        for record in read_records(defaults[0]):
+            builder.add_record(record)
+        builder.save(defaults[1], int(defaults[3]))
+        book = OpeningBook(defaults[1])
+        print(f"{len(book)} positions from {builder.games} games written to {defaults[1]}")
+
+
+if __name__ == '__main__':
+    Main.run()
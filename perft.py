@@ -0,0 +1,187 @@
+"""
+Perft: the exact number of legal move sequences of a given length from a position, with the moves of
+Game.enumerate_all_moves (every legal (piece, dir1, dir2) of the focus era with every other focus, or only
+a new focus without pieces in focus) and no moves once the player to move has lost. Counts are made on
+FastEngine with an optional transposition table, the root moves can be split over a process pool, and the
+divide output lists the count below every root move so a wrong count can be traced down to one move.
+The game engine recounts with Game itself to check FastEngine: its moves come from Game.can_move on copies of
+the game, not from the legal move index or FastEngine
+"""
+
+import os
+import sys
+import time
+from multiprocessing import Pool
+from fast_engine import FastEngine
+from move import Move
+from position_suite import load_suite, suite_game
+from util import new_game, reference_moves
+import notation
+
+
+def perft_moves(engine):
+    """
+    Complete moves (symbol, dir1, dir2, focus index) of the side to move, as Game.enumerate_all_moves has them
+    """
+    if engine.is_over():
+        return []
+    focus = engine.focus[engine.current]
+    steps = engine.legal_moves() if engine.has_pieces_in_focus() else [(None, None, None)]
+    return [(symbol, dir1, dir2, era) for symbol, dir1, dir2 in steps for era in range(engine.eras) if era != focus]
+
+
+class Perft:
+    """
+    Perft counter on FastEngine, the transposition table maps (position, depth) to the count
+    """
+    def __init__(self, use_hash=True):
+        """
+        Start with an empty table, or none at all
+        """
+        self.table = {} if use_hash else None
+        self.hits = 0
+
+    def _key(self, engine, depth):
+        """
+        Table key of the position: cells, spawned pieces, focus and side to move
+        """
+        return tuple(engine.cells), tuple(engine.spawned), tuple(engine.focus), engine.current, depth
+
+    def count(self, engine, depth):
+        """
+        Number of move sequences of length depth from the position of the engine
+        """
+        if depth == 0:
+            return 1
+        key = None
+        if self.table is not None and depth > 1:
+            key = self._key(engine, depth)
+            if key in self.table:
+                self.hits += 1
+                return self.table[key]
+        moves = perft_moves(engine)
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            undo = engine.make(*move)
+            nodes += self.count(engine, depth - 1)
+            engine.unmake(undo)
+        if key is not None:
+            self.table[key] = nodes
+        return nodes
+
+
+def game_moves(game):
+    """
+    Complete moves (symbol, dir1, dir2, focus era) of the side to move from Game.can_move, like perft_moves
+    """
+    player = game.current_player()
+    if game.is_winning_move(player):
+        return set()
+    focus = game.focus[player.color]
+    steps = reference_moves(game) if any(p.era == focus for p in player.pieces) else [(None, None, None)]
+    return {(symbol, dir1, dir2, era) for symbol, dir1, dir2 in steps for era in game.eras if era != focus}
+
+
+def game_perft(game, depth):
+    """
+    Reference count with Game: game_moves and Move.apply on copies of the game
+    """
+    if depth == 0:
+        return 1
+    moves = game_moves(game)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for symbol, dir1, dir2, era in moves:
+        child = game.copy_without_history()
+        Move(child.find_piece(symbol) if symbol else None, dir1, dir2, era).apply(child)
+        child.turn += 1
+        child.current = 1 - child.current
+        nodes += game_perft(child, depth - 1)
+    return nodes
+
+
+def _divide_job(job):
+    """
+    Worker: count below one root move, return the move, the count and the table hits
+    """
+    engine, move, depth, use_hash, reference = job
+    if reference:
+        game, (symbol, dir1, dir2, era) = engine, move
+        child = game.copy_without_history()
+        Move(child.find_piece(symbol) if symbol else None, dir1, dir2, era).apply(child)
+        child.turn += 1
+        child.current = 1 - child.current
+        return move, game_perft(child, depth - 1), 0
+    perft = Perft(use_hash)
+    engine.make(*move)
+    return move, perft.count(engine, depth - 1), perft.hits
+
+
+def divide(game, depth, processes=1, use_hash=True, reference=False):
+    """
+    Count below every root move of a game position on a process pool.
+    Return [(move, count)] with the moves as (symbol, dir1, dir2, focus era) and the table hits
+    """
+    engine = FastEngine.from_game(game)
+    names = engine.era_names
+    if reference:
+        jobs = [(game, move, depth, use_hash, True) for move in game_moves(game)]
+    else:
+        jobs = [(engine, move, depth, use_hash, False) for move in perft_moves(engine)]
+    results, hits = [], 0
+    with Pool(processes) as pool:
+        for move, nodes, job_hits in pool.imap(_divide_job, jobs):
+            symbol, dir1, dir2, era = move
+            results.append(((symbol, dir1, dir2, era if isinstance(era, str) else names[era]), nodes))
+            hits += job_hits
+    return results, hits
+
+
+def load_position(text):
+    """
+    Game at 'start', at the name of a suite position or at a position in notation
+    """
+    if text == 'start':
+        return new_game()
+    if ' ' not in text:
+        for name, position, turn in load_suite():
+            if name == text:
+                return suite_game(position, turn)
+        raise ValueError(f"No position {text} in the suite")
+    return suite_game(*notation.read(text))
+
+
+class Main:
+    """
+    Perft runner: python perft.py [depth] [start, suite position name or notation] [processes] [hash on/off]
+    [engine fast/game]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['3', 'start', str(os.cpu_count() or 1), 'on', 'fast']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        depth = int(defaults[0])
+        if depth < 1:
+            raise SystemExit(f"perft depth must be at least 1, got {depth}")
+        game = load_position(defaults[1])
+        started = time.perf_counter()
+        results, hits = divide(game, depth, int(defaults[2]), defaults[3] == 'on', defaults[4] == 'game')
+        elapsed = time.perf_counter() - started
+        for (symbol, dir1, dir2, era), nodes in sorted(results, key=lambda r: tuple(str(f) for f in r[0])):
+            print(f"{symbol or '-'} {dir1 or '-'} {dir2 or '-'} {era}: {nodes}")
+        total = sum(nodes for _, nodes in results)
+        print(f"\n{len(results)} moves, {total} nodes at depth {depth} in {elapsed:.2f}s "
+              f"({total / elapsed if elapsed else 0:,.0f} nodes/s), {hits} table hits")
+
+
+if __name__ == '__main__':
+    Main.run()
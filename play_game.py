@@ -1,5 +1,11 @@
 
 from game import Game
+from constants import ERAS, SIZE
+from clock import MoveTimer
+from player import HumanPlayer, HeuristicAI
+from ponder import Ponderer
+import metrics
+import time
 
 # Decorator Pattern
 
@@ -13,16 +19,81 @@ class GameComponent:
 
 class BaseGame(Game, GameComponent):
     """Class to initiate the base game mode"""
-    def __init__(self, player1, player2, current=0, use_history=True, verbose=True):
-        super().__init__(player1, player2, current, use_history, verbose)
+    def __init__(self, player1, player2, current=0, use_history=True, verbose=True, time_control=None,
+                 size=SIZE, eras=len(ERAS), supply=None, history_limit=None, spill_dir=None):
+        super().__init__(player1, player2, current, use_history, verbose, time_control, size, eras, supply,
+                         history_limit, spill_dir)
 
 
 class PlayDecorator(GameComponent):
     """p
     Use decorator pattern to add game playing mode and potential redo and undo functionality
     """
-    def __init__(self, game: GameComponent):
+    def __init__(self, game: GameComponent, ponder=False, timer=None):
         self._game = game
+        self._ponder = ponder
+        self._ponderers = {}
+        self._timer = timer or MoveTimer()
+
+    def ponderer(self, player):
+        """
+        Get the ponderer of an AI player, if pondering is on. New players after a restart get new ponderers
+        """
+        if not self._ponder or not isinstance(player, HeuristicAI):
+            return None
+        ponderer = self._ponderers.get(player.color)
+        if ponderer is None or ponderer.player is not player:
+            ponderer = Ponderer(player)
+            self._ponderers[player.color] = ponderer
+        return ponderer
+
+    def start_pondering(self):
+        """
+        Let the AI opponent search in the background while a human player is thinking
+        """
+        if isinstance(self._game.current_player(), HumanPlayer):
+            ponderer = self.ponderer(self._game.get_opponent())
+            if ponderer:
+                ponderer.start(self._game)
+
+    def select_move(self, player):
+        """
+        Get the move of the player under the game clock, if there is one. AI players get a soft deadline
+        and the move timer plays a fallback move at the hard deadline
+        """
+        move, _ = self._timer.select(self._game, player, self._choose_move, isinstance(player, HumanPlayer))
+        return move
+
+    def _choose_move(self, game, player):
+        """
+        Choose the move of the player: pondered answers are reused, humans let the AI ponder meanwhile.
+        The game may be a snapshot given by the move timer, the ponderer belongs to the player of the real game
+        """
+        ponderer = self.ponderer(self._game.players[game.players.index(player)])
+        if ponderer:
+            move = ponderer.take(game)
+            if move:
+                return player._print_move(move.piece, move.dir1, move.dir2, move.focus_next)
+        self.start_pondering()
+        return player.select_move(game)
+
+    def winner(self):
+        """
+        Color of the winner: a player whose flag fell loses, otherwise the usual era rule. None while the game goes on
+        """
+        clock = self._game.clock
+        for player in self._game.players:
+            if clock and clock.flagged(player.color):
+                return self._game.players[1 - self._game.players.index(player)].color
+        if self._game.is_winning_move(self._game.current_player()):
+            return self._game.get_opponent().color
+        return None
+
+    def ponder_summary(self):
+        """
+        Pondering statistics of all AI players
+        """
+        return [ponderer.summary() for ponderer in self._ponderers.values()]
     
 
     def play(self):
@@ -33,17 +104,29 @@ class PlayDecorator(GameComponent):
             self._game.print_board()
             if self._game.display_eval:
                 self._game.current_player().display_eval(self._game)
-            if self._game.is_winning_move(self._game.current_player()):
-                print(f"{self._game.get_opponent().color} has won")
+            if self._game.clock:
+                print(f"Clock: {self._game.clock.summary()}")
+            winner = self.winner()
+            if winner:
+                recorder = metrics.current()
+                if recorder:
+                    recorder.record_game(winner)
+                print(f"{winner} has won")
+                for line in self.ponder_summary():
+                    print(line)
                 if input("Play again? (yes/no): ").strip().lower() == 'yes':
-                    player1 = type(self._game.players[0])(self._game.players[0].color)
-                    player2 = type(self._game.players[1])(self._game.players[1].color)
-                    self._game.__init__(player1, player2, self._game.current, self._game.caretaker is not None, self._game.display_eval)
+                    player1 = type(self._game.players[0])(self._game.players[0].color, weights=self._game.players[0].weights)
+                    player2 = type(self._game.players[1])(self._game.players[1].color, weights=self._game.players[1].weights)
+                    self._game.close()
+                    self._game.__init__(player1, player2, self._game.current, self._game.caretaker is not None,
+                                        self._game.display_eval, self._game.time_control,
+                                        self._game.size, len(self._game.eras), self._game.supply,
+                                        self._game.history_limit, self._game.spill_dir)
                     continue
                 else:
                     break
             if self._game.caretaker:
-                cmd = input("undo, redo, or next\n").strip()
+                cmd = input(f"undo, redo, or next [{self._game.caretaker.summary()}]\n").strip()
                 if cmd == 'undo':
                     self._game.caretaker.undo()
                     continue
@@ -54,11 +137,68 @@ class PlayDecorator(GameComponent):
                     continue
             self._game.save_state()
             player = self._game.current_player()
-            move = player.select_move(self._game)
+            move = self.select_move(player)
+            if self._game.display_eval and self.ponderer(player):
+                print(self.ponderer(player).summary())
+            if self._game.clock and self._game.clock.flagged(player.color):
+                print(f"{player.color} ran out of time")
+                continue
             if move:
                 move.apply(self._game)
                 self._game.turn += 1
                 self._game.current = 1 - self._game.current
     
     def print_board(self): 
-        self._game.print_board()
\ No newline at end of file
+        self._game.print_board()
+
+
+class AutoPlayDecorator(GameComponent):
+    """
+    Use decorator pattern to play a game between AI players without any input or output,
+    for example in self-play batches. on_move(game, move) is called before each move is applied
+    """
+    def __init__(self, game: GameComponent, max_turns=200, on_move=None, timer=None):
+        self._game = game
+        self.max_turns = max_turns
+        self.on_move = on_move
+        self._timer = timer or MoveTimer()
+
+    def play(self):
+        """
+        Play until a player wins or max_turns is reached, return the winning color or None for a draw
+        """
+        recorder = metrics.current()
+        winner = self._play(recorder)
+        if recorder:
+            recorder.record_game(winner)
+        return winner
+
+    def _play(self, recorder):
+        """
+        The play loop, moves without a clock are timed here when metrics are on
+        """
+        for player in self._game.players:
+            player.announce = False
+        while self._game.turn <= self.max_turns:
+            if self._game.is_winning_move(self._game.current_player()):
+                return self._game.get_opponent().color
+            player = self._game.current_player()
+            if self._game.clock:
+                move, status = self._timer.select(self._game, player, lambda game, p: p.select_move(game))
+                if status == 'flag':
+                    return self._game.get_opponent().color
+            elif recorder:
+                started = time.perf_counter()
+                move = player.select_move(self._game)
+                recorder.record_move(self._game, player, time.perf_counter() - started)
+            else:
+                move = player.select_move(self._game)
+            if self.on_move:
+                self.on_move(self._game, move)
+            move.apply(self._game)
+            self._game.turn += 1
+            self._game.current = 1 - self._game.current
+        return None
+
+    def print_board(self):
+        self._game.print_board()
@@ -1,10 +1,10 @@
 
 from abc import ABC, abstractmethod
 from move import Move
-import copy
+import json
 import random
 from piece import Piece
-from constants import DIRECTIONS, TIMESHIFT, ERAS
+from constants import DIRECTIONS, TIMESHIFT, ERAS, SIZE, w1, w2, w3, w4, w5
 from best_move import HighestScoreMoveIterator
 
 # Template Pattern
@@ -13,26 +13,36 @@ class Player(ABC):
     """
     Template class for different player types, including starter, game evaluation
     """
-    def __init__(self, color, supply = 7):
+    announce = True
+
+    def __init__(self, color, supply = 7, weights = None):
         """
         Initiate the player including the color of pieces they will play, all pieces supplied based on the color
+        and the weights of the criterions used to score moves
         """
         self.color = color
         self.pieces = []
+        self.weights = tuple(weights) if weights else (w1, w2, w3, w4, w5)
+        self.set_supply(supply)
+
+    def set_supply(self, supply):
+        """
+        Set the number of pieces of the player before the game starts, with one symbol per piece
+        """
         self.supply = supply
         if self.color == "white":
             self.symbols = [chr(65 + i) for i in range(self.supply)]
         else:
             self.symbols = [str(i + 1) for i in range(self.supply)]
     
-    def start(self):
+    def start(self, eras=ERAS, size=SIZE):
         """
-        Place the pieces at the start of the game required
+        Place the pieces at the start of the game required: one piece per era in the player's corner
         """
-        for era in ERAS:
+        for era in eras:
             symbol = self.symbols.pop(0)
             if self.color == "white":
-                x, y = 3, 3
+                x, y = size - 1, size - 1
             else:
                 x, y = 0, 0
             self.supply -= 1 
@@ -58,7 +68,7 @@ class Player(ABC):
         opponent = game.players[1 - game.players.index(self)]
         c2 = len(self.pieces) - len(opponent.pieces)
         c3 = self.supply
-        c4 = sum(1 for p in self.pieces if 1 <= p.x <= 2 and 1 <= p.y <= 2)
+        c4 = sum(1 for p in self.pieces if 1 <= p.x <= game.size - 2 and 1 <= p.y <= game.size - 2)
         c5 = sum(1 for p in self.pieces if p.era == game.focus[self.color])
         return c1, c2, c3, c4, c5
     
@@ -101,7 +111,8 @@ class Player(ABC):
     def _print_move(self, piece, dir1, dir2, next_focus):
         """Print out the selected moves and focus era coming next"""
         symbol = piece.symbol if piece else None
-        print(f"Selected move: {symbol},{dir1},{dir2},{next_focus}")
+        if self.announce:
+            print(f"Selected move: {symbol},{dir1},{dir2},{next_focus}")
         return Move(piece, dir1, dir2, next_focus)
     
 
@@ -130,12 +141,10 @@ class HumanPlayer(Player):
     
     def _handle_normal_move(self, game):
         """Human player handles the stiuation when there is an active piece in the current era"""
-        game_copy = copy.deepcopy(game)
+        index = game.legal_moves()
         piece = self._select_piece(game)
-        piece_copy = next((p for p in game_copy.current_player().pieces if p.symbol == piece.symbol), None)
-        dir1 = self._select_direction(game_copy, piece_copy, "first")
-        game_copy.move_piece(piece_copy, dir1)
-        dir2 = self._select_direction(game_copy, piece_copy, "second")
+        dir1 = self._select_direction(index.first_steps(piece.symbol), "first")
+        dir2 = self._select_direction(index.second_steps(piece.symbol, dir1), "second")
         next_focus = self._select_focus(game)
         return self._print_move(piece, dir1, dir2, next_focus)
     
@@ -160,17 +169,20 @@ class HumanPlayer(Player):
             if piece.era != game.focus[self.color]:
                 print("Cannot select a copy from an inactive era")
                 continue
+            if not game.legal_moves().first_steps(symbol):
+                print("That copy cannot move")
+                continue
             return piece
     
-    def _select_direction(self, game_copy, piece, move_number):
-        """Human player -> conversations to ask human player to select direction they want to move the piece"""
+    def _select_direction(self, options, move_number):
+        """Human player -> conversations to ask human player to select direction they want to move the piece among the legal options"""
         valid_dirs = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
         while True:
             direction = input(f"Select the {move_number} direction to move ['n', 'e', 's', 'w', 'f', 'b']\n").strip()
             if direction not in valid_dirs:
                 print("Not a valid direction")
                 continue
-            if not game_copy.can_move(piece, direction):
+            if direction not in options:
                 print(f"Cannot move {direction}")
                 continue
             return direction
@@ -178,8 +190,8 @@ class HumanPlayer(Player):
     def _select_focus(self, game):
         """Human player -> conversations to ask human player to select their next focus era"""
         while True:
-            next_focus = input("Select the next era to focus on ['past', 'present', 'future']\n").strip()
-            if next_focus not in ERAS:
+            next_focus = input(f"Select the next era to focus on {game.eras}\n").strip()
+            if next_focus not in game.eras:
                 print("Not a valid era")
                 continue
             if next_focus == game.focus[self.color]:
@@ -212,20 +224,59 @@ class HeuristicAI(Player):
     """
     Heuristic AI Implementation
     """
+    move_cache = None
+    opening_book = None
+    deadline = None
+
+    @classmethod
+    def from_weights_file(cls, color, path):
+        """Create a Heuristic AI player with the weights saved in a weight file, e.g. written by the tuning"""
+        with open(path) as f:
+            return cls(color, weights=json.load(f)["weights"])
+
     def score_system(self, game, w1, w2, w3, w4, w5):
         """Heuristic AI Player evaluate the movement based on the weights on each criteria"""
         c1, c2, c3, c4, c5 = self.eval(game)
-        score = w1 * c1 + w2 * c2 + w3 * c3 + w4 * c4 + w5 * c5
-        return score  
-    
-    def _handle_normal_move(self, game):
-        """Heuristic AI player handles the stiuation when there is an active piece in the current era"""
-        best_moves_iter = HighestScoreMoveIterator(game, self)
+        return w1 * c1 + w2 * c2 + w3 * c3 + w4 * c4 + w5 * c5
+
+    def _book_move(self, game):
+        """Heuristic AI player looks the position up in the opening book, if one is loaded, before enumerating moves"""
+        book = HeuristicAI.opening_book
+        move = book.probe(game) if book else None
+        if move:
+            return self._print_move(move.piece, move.dir1, move.dir2, move.focus_next)
+        return None
+
+    def _cache(self):
+        """Move cache to use for this player: only an open one for its weights, and only for the heuristic player itself since subclasses score differently"""
+        cache = HeuristicAI.move_cache
+        if cache and type(self) is HeuristicAI and cache.weights == tuple(self.weights):
+            return cache
+        return None
+
+    def _best_move(self, game):
+        """Heuristic AI player picks one of the highest scoring moves, from the move cache when the position was searched before. Only complete enumerations are cached, not the ones cut short by a deadline"""
+        cache = self._cache()
+        cached = cache.probe(game) if cache else None
+        if cached:
+            move = random.choice(cached)
+            return self._print_move(move.piece, move.dir1, move.dir2, move.focus_next)
+        best_moves_iter = HighestScoreMoveIterator(game, self, self.deadline)
         best_piece, best_dir1, best_dir2, next_focus, _ = next(best_moves_iter)
+        if cache and self.deadline is None:
+            cache.store(game, [Move(piece, dir1, dir2, focus) for piece, dir1, dir2, focus, _ in best_moves_iter.best_moves])
         return self._print_move(best_piece, best_dir1, best_dir2, next_focus)
+
+    def _handle_normal_move(self, game):
+        """Heuristic AI player handles the stiuation when there is an active piece in the current era"""
+        book_move = self._book_move(game)
+        if book_move:
+            return book_move
+        return self._best_move(game)
     
     def _handle_no_pieces_move(self, game):
         """Heuristic AI player handles the stiuation when there is no active piece in the current era"""
-        best_moves_iter = HighestScoreMoveIterator(game, self)
-        best_piece, best_dir1, best_dir2, next_focus, _ = next(best_moves_iter)
-        return self._print_move(best_piece, best_dir1, best_dir2, next_focus)
+        book_move = self._book_move(game)
+        if book_move:
+            return book_move
+        return self._best_move(game)
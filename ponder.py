@@ -0,0 +1,152 @@
+import copy
+import threading
+import time
+from move import Move
+from player import HeuristicAI
+from threats import ThreatAnalyzer
+
+
+class Ponderer:
+    """
+    Pondering for an AI player: while the opponent is thinking, predict their most likely replies,
+    search the AI's answer to each of them in a background thread and keep the results by position.
+    The answers come from the player's own select_move, opening book included, on a copy of the player.
+    When the actual reply has been applied, the answer is served instantly if it was predicted.
+    Every start begins a new generation, a superseded search keeps running but no longer reports
+    """
+    def __init__(self, player, max_replies=8):
+        """
+        Bind the ponderer to the AI player it thinks for and limit how many replies are predicted
+        """
+        self.player = player
+        self.max_replies = max_replies
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._searching = None
+        self._generation = 0
+        self.searches = 0
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def start(self, game):
+        """
+        Start pondering on a snapshot of the game, the opponent of the AI player must be to move
+        """
+        self.stop()
+        with self._lock:
+            self._generation += 1
+            self._searching = None
+            self._results = {}
+        snapshot = game.copy_without_history()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(snapshot, self._stop, self._results, self._generation), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Ask the background search to stop, the search in progress is left to finish on its own
+        """
+        self._stop.set()
+
+    def is_running(self):
+        """
+        Check whether the background search is still alive
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def take(self, game):
+        """
+        Return the pondered Move for the current position or None on a ponder miss.
+        A position that is being searched right now is waited for instead of started again
+        """
+        self.stop()
+        key = game.position_key()
+        with self._lock:
+            searching = self._searching == key
+        if searching and self._thread:
+            self._thread.join()
+        with self._lock:
+            result = self._results.pop(key, None)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        (symbol, dir1, dir2, next_focus), elapsed = result
+        self.time_saved += elapsed
+        piece = game.find_piece(symbol) if symbol else None
+        return Move(piece, dir1, dir2, next_focus)
+
+    def hit_rate(self):
+        """
+        Share of AI turns that were answered from the ponder results
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        """
+        One line of pondering statistics for the status output
+        """
+        return (f"{self.player.color} pondering: {self.hits}/{self.hits + self.misses} hits "
+                f"({self.hit_rate():.0%}), {self.searches} positions searched, {self.time_saved:.3f}s saved")
+
+    def _predict_replies(self, game):
+        """
+        Rank the opponent's moves with a heuristic model of the opponent and keep the best ones.
+        Capturing replies found by the threat analyzer come first, they are the ones a miss hurts most
+        """
+        captures = {(t.symbol, t.dir1, t.dir2): i for i, t in enumerate(ThreatAnalyzer(game).capture_moves())}
+        idx = game.current
+        opponent = game.players[idx]
+        model = HeuristicAI(opponent.color)
+        model.pieces, model.supply, model.symbols = opponent.pieces, opponent.supply, opponent.symbols
+        game.players[idx] = model
+        moves = sorted(game.enumerate_all_moves(model), key=lambda move: move[4], reverse=True)
+        moves.sort(key=lambda move: captures.get((move[0].symbol if move[0] else None, move[1], move[2]), len(captures)))
+        replies = []
+        for piece, dir1, dir2, next_focus, _ in moves:
+            reply = (piece.symbol if piece else None, dir1, dir2, next_focus)
+            if reply not in replies:
+                replies.append(reply)
+            if len(replies) >= self.max_replies:
+                break
+        return replies
+
+    def _run(self, game, stop, results, generation):
+        """
+        Background worker: let a copy of the AI player choose its answer to each predicted reply until stopped.
+        Only the search of the current generation updates the shared state
+        """
+        ai_idx = 1 - game.current
+        for symbol, dir1, dir2, next_focus in self._predict_replies(game):
+            if stop.is_set():
+                return
+            game_copy = copy.deepcopy(game)
+            piece = game_copy.find_piece(symbol) if symbol else None
+            Move(piece, dir1, dir2, next_focus).apply(game_copy)
+            game_copy.turn += 1
+            game_copy.current = ai_idx
+            if game_copy.is_winning_move(game_copy.current_player()):
+                continue
+            key = game_copy.position_key()
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._searching = key
+            searcher = game_copy.players[ai_idx]
+            searcher.announce = False
+            searcher.deadline = None
+            started = time.perf_counter()
+            move = searcher.select_move(game_copy)
+            elapsed = time.perf_counter() - started
+            best = (move.piece.symbol if move.piece else None, move.dir1, move.dir2, move.focus_next)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._searching = None
+                self.searches += 1
+                results[key] = (best, elapsed)
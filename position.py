@@ -0,0 +1,245 @@
+"""
+Immutable positions: the piece symbols of every era as one flat tuple per era, the supply and remaining
+symbols of both players, the focus of both colors and the side to move, the same fields as
+Game.position_key. A successor only copies the era boards its move touches and shares the others,
+and the hash is kept per era so it is never computed again for a shared board
+"""
+
+from constants import DIRECTIONS, TIMESHIFT, era_names
+from piece import Piece
+
+
+def symbol_color(symbol):
+    """
+    Color of a piece symbol: black pieces are numbered and white pieces lettered, see Player.set_supply
+    """
+    return 'black' if symbol.isdigit() else 'white'
+
+
+def _pack_cells(cells):
+    """
+    Cells of single-character symbols as a string, a run of empty cells written as one lowercase letter
+    ('a' for one, 'b' for two, ...), which no piece symbol uses
+    """
+    text, run = [], 0
+    for symbol in cells:
+        if symbol is None:
+            run += 1
+            if run == 26:
+                text.append('z')
+                run = 0
+            continue
+        if run:
+            text.append(chr(96 + run))
+            run = 0
+        text.append(symbol)
+    if run:
+        text.append(chr(96 + run))
+    return ''.join(text)
+
+
+def _unpack_cells(text):
+    """
+    Cells written by _pack_cells
+    """
+    cells = []
+    for char in text:
+        if 'a' <= char <= 'z':
+            cells.extend([None] * (ord(char) - 96))
+        else:
+            cells.append(char)
+    return cells
+
+
+def _restore(size, eras, cells, players, focus, current):
+    """
+    Rebuild a pickled Position from the compact form of Position.__reduce__
+    """
+    area = size * size
+    cells = _unpack_cells(cells) if isinstance(cells, str) else [s or None for s in cells]
+    boards = tuple(tuple(cells[i * area:(i + 1) * area]) for i in range(eras))
+    names = era_names(eras)
+    players = tuple(('white' if color == 'w' else 'black', supply, tuple(symbols))
+                    for color, supply, symbols in players)
+    return Position(size, names, boards, players, (names[focus[0]], names[focus[1]]), current)
+
+
+class Position:
+    """
+    Hashable value type of a game position. Positions are never changed after they are created,
+    play returns the successor. The turn counter is not part of the position, like in Game.position_key
+    """
+    __slots__ = ('size', 'eras', 'boards', 'players', 'focus', 'current', '_era_hashes', '_hash')
+
+    def __init__(self, size, eras, boards, players, focus, current, era_hashes=None):
+        """
+        Save the fields: eras are the era names, boards one tuple of size * size symbols (None for empty)
+        per era, players (color, supply, remaining symbols) in the order of Game.players, focus the
+        (white, black) focus eras and current the index of the player to move
+        """
+        setter = super().__setattr__
+        setter('size', size)
+        setter('eras', tuple(eras))
+        setter('boards', boards)
+        setter('players', players)
+        setter('focus', focus)
+        setter('current', current)
+        era_hashes = era_hashes or tuple(hash(board) for board in boards)
+        setter('_era_hashes', era_hashes)
+        setter('_hash', hash((era_hashes, players, focus, current)))
+
+    def __setattr__(self, name, value):
+        """
+        Positions are immutable
+        """
+        raise AttributeError("Position is immutable")
+
+    def __hash__(self):
+        """
+        Hash computed once when the position is created
+        """
+        return self._hash
+
+    def __eq__(self, other):
+        """
+        Same pieces, supplies, symbols, focus and side to move. Shared era boards compare by identity
+        """
+        if not isinstance(other, Position):
+            return NotImplemented
+        return (self._hash == other._hash and self.current == other.current and self.focus == other.focus
+                and self.players == other.players and self.boards == other.boards)
+
+    def __reduce__(self):
+        """
+        Compact pickled form: the cells as one string when every symbol is a single character
+        """
+        cells = [s for board in self.boards for s in board]
+        if all(s is None or len(s) == 1 for s in cells):
+            cells = _pack_cells(cells)
+        else:
+            cells = tuple(s or '' for s in cells)
+        players = tuple((color[0], supply, ''.join(symbols) if all(len(s) == 1 for s in symbols) else symbols)
+                        for color, supply, symbols in self.players)
+        focus = (self.eras.index(self.focus[0]), self.eras.index(self.focus[1]))
+        return _restore, (self.size, len(self.eras), cells, players, focus, self.current)
+
+    def __repr__(self):
+        """Readable form for debugging"""
+        return f"Position({self.key()!r})"
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Position of a Game
+        """
+        boards = tuple(tuple(p.symbol if p else None for row in game.boards[era].grid for p in row)
+                       for era in game.eras)
+        players = tuple((p.color, p.supply, tuple(p.symbols)) for p in game.players)
+        return cls(game.size, game.eras, boards, players, (game.focus['white'], game.focus['black']), game.current)
+
+    def key(self):
+        """
+        The position as Game.position_key returns it
+        """
+        return self.boards, self.players, self.focus, self.current
+
+    def restore(self, game):
+        """
+        Set a Game of the same size and eras to the position. The Board and Player objects of the game
+        are kept, their grids and pieces are rebuilt. Players are matched by color
+        """
+        if game.size != self.size or tuple(game.eras) != self.eras:
+            raise ValueError("The position is for another board size or era count")
+        by_color = {player.color: player for player in game.players}
+        for color, supply, symbols in self.players:
+            player = by_color[color]
+            player.pieces, player.supply, player.symbols = [], supply, list(symbols)
+        for era, board in zip(self.eras, self.boards):
+            grid = game.boards[era].grid
+            for cell, symbol in enumerate(board):
+                x, y = divmod(cell, self.size)
+                if symbol is None:
+                    grid[x][y] = None
+                    continue
+                piece = Piece(symbol, symbol_color(symbol), era, x, y)
+                grid[x][y] = piece
+                by_color[piece.color].pieces.append(piece)
+        game.focus = {'white': self.focus[0], 'black': self.focus[1]}
+        game.current = game.players.index(by_color[self.players[self.current][0]])
+
+    def find(self, symbol):
+        """
+        (era index, cell) of the piece with the symbol, None when it is not on the board
+        """
+        for era, board in enumerate(self.boards):
+            if symbol in board:
+                return era, board.index(symbol)
+        return None
+
+    def play(self, symbol, dir1, dir2, focus_next):
+        """
+        Successor after a move of the side to move, applied like Move.apply followed by the turn change.
+        The move is not validated, check it with Game.is_legal_move first
+        """
+        changed = {}
+        player = list(self.players[self.current])
+        if symbol is not None:
+            era, cell = self.find(symbol)
+            for direction in (dir1, dir2):
+                era, cell = self._step(changed, player, era, cell, direction)
+        players = list(self.players)
+        players[self.current] = (player[0], player[1], tuple(player[2]))
+        focus = (focus_next, self.focus[1]) if player[0] == 'white' else (self.focus[0], focus_next)
+        boards = tuple(tuple(changed[era]) if era in changed else board for era, board in enumerate(self.boards))
+        hashes = tuple(hash(boards[era]) if era in changed else h for era, h in enumerate(self._era_hashes))
+        return Position(self.size, self.eras, boards, tuple(players), focus, 1 - self.current, hashes)
+
+    def _cells(self, changed, era):
+        """
+        Writable copy of an era board, made on first use
+        """
+        if era not in changed:
+            changed[era] = list(self.boards[era])
+        return changed[era]
+
+    def _neighbor(self, cell, direction):
+        """
+        Next cell in a direction, None past the edge
+        """
+        x, y = divmod(cell, self.size)
+        dx, dy = DIRECTIONS[direction]
+        if 0 <= x + dx < self.size and 0 <= y + dy < self.size:
+            return cell + dx * self.size + dy
+        return None
+
+    def _step(self, changed, player, era, cell, direction):
+        """
+        One step of the piece at (era, cell), with the push chains of Game._move_current_board and the
+        piece left behind by backward time travel. Return the new (era, cell)
+        """
+        if direction in DIRECTIONS:
+            cells = self._cells(changed, era)
+            chain = [cell, self._neighbor(cell, direction)]
+            while cells[chain[-1]] is not None:
+                nxt = chain[-1]
+                beyond = self._neighbor(nxt, direction)
+                if beyond is None:
+                    cells[nxt] = None
+                    break
+                if cells[beyond] is not None and symbol_color(cells[beyond]) == symbol_color(cells[nxt]):
+                    cells[nxt] = cells[beyond] = None
+                    break
+                chain.append(beyond)
+            for i in range(len(chain) - 2, -1, -1):
+                cells[chain[i + 1]], cells[chain[i]] = cells[chain[i]], None
+            return era, chain[1]
+        target = era + TIMESHIFT[direction]
+        source = self._cells(changed, era)
+        self._cells(changed, target)[cell] = source[cell]
+        if TIMESHIFT[direction] == -1:
+            player[1] -= 1
+            player[2] = list(player[2])
+            source[cell] = player[2].pop(0)
+        else:
+            source[cell] = None
+        return target, cell
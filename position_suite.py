@@ -0,0 +1,141 @@
+"""
+Bundled suite of named positions for benchmarks and engine tests, one '<name>; <notation>' line each.
+The positions are sampled from random games and sorted into categories: crowded boards, push chains
+(a move pushes at least two pieces), near wins (a move leaves the opponent in one era), low supply
+and openings. load_suite reads them back in bulk, suite_game sets up a playable game at one of them
+"""
+
+import random
+import sys
+import notation
+from constants import DIRECTIONS
+from fast_engine import FastEngine
+from util import new_game
+from play_game import BaseGame
+from player import HeuristicAI
+from position import Position
+from threats import ThreatAnalyzer
+
+DEFAULT_SUITE = 'positions.txt'
+CATEGORIES = ['crowded', 'push-chain', 'near-win', 'low-supply', 'opening']
+
+
+def load_suite(path=DEFAULT_SUITE, category=None):
+    """
+    (name, Position, turn) of every position in a suite file, optionally only those of one category
+    """
+    suite = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, _, text = line.partition(';')
+            if category is None or name.rsplit('-', 1)[0] == category:
+                position, turn = notation.read(text)
+                suite.append((name, position, turn))
+    return suite
+
+
+def suite_game(position, turn=None, white=None, black=None):
+    """
+    Game without history at a position, with heuristic players unless others are given
+    """
+    game = BaseGame(white or HeuristicAI('white'), black or HeuristicAI('black'), current=0, use_history=False,
+                    verbose=False, size=position.size, eras=len(position.eras))
+    game.restore_position(position)
+    if turn is not None:
+        game.turn = turn
+    return game
+
+
+def _pushes_chain(game):
+    """
+    Check whether a legal move of the player to move starts by pushing two or more pieces
+    """
+    for symbol, dir1, _ in game.legal_moves().moves():
+        if dir1 not in DIRECTIONS:
+            continue
+        piece = game.find_piece(symbol)
+        board, (dx, dy) = game.boards[piece.era], DIRECTIONS[dir1]
+        if board.get_piece(piece.x + dx, piece.y + dy) and board.get_piece(piece.x + 2 * dx, piece.y + 2 * dy):
+            return True
+    return False
+
+
+def categories(game):
+    """
+    Suite categories a position falls into
+    """
+    player = game.current_player()
+    found = []
+    if sum(len(p.pieces) for p in game.players) >= 3 * len(game.eras) + 1:
+        found.append('crowded')
+    if _pushes_chain(game):
+        found.append('push-chain')
+    if any(t.wins for t in ThreatAnalyzer(game).threats()):
+        found.append('near-win')
+    if player.supply <= 1 and any(p.era == game.focus[player.color] for p in player.pieces):
+        found.append('low-supply')
+    if game.turn <= 8:
+        found.append('opening')
+    return found
+
+
+def build_suite(per_category=60, seed=0, max_games=5000):
+    """
+    Sample positions of random games until every category has per_category distinct positions.
+    Return the suite as (name, notation) pairs
+    """
+    rng = random.Random(seed)
+    bins = {category: [] for category in CATEGORIES}
+    seen = set()
+    for _ in range(max_games):
+        if all(len(found) >= per_category for found in bins.values()):
+            break
+        engine = FastEngine.from_game(new_game())
+        while not engine.is_over() and engine.turn < 120:
+            position = Position(engine.size, engine.era_names, *engine.state()[0])
+            if position not in seen:
+                seen.add(position)
+                game = suite_game(position, engine.turn)
+                open_bins = [c for c in categories(game) if len(bins[c]) < per_category]
+                if open_bins:
+                    category = min(open_bins, key=lambda c: len(bins[c]))
+                    bins[category].append(notation.write(position, engine.turn))
+            legal = engine.legal_moves() if engine.has_pieces_in_focus() else []
+            symbol, dir1, dir2 = rng.choice(legal) if legal else (None, None, None)
+            focus = rng.choice([i for i in range(engine.eras) if i != engine.focus[engine.current]])
+            engine.make(symbol, dir1, dir2, focus)
+    return [(f"{category}-{i + 1:03d}", text) for category in CATEGORIES for i, text in enumerate(bins[category])]
+
+
+class Main:
+    """
+    Suite builder: python position_suite.py [suite file] [positions per category] [seed]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = [DEFAULT_SUITE, '60', '0']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        suite = build_suite(int(defaults[1]), int(defaults[2]))
+        with open(defaults[0], 'w') as f:
+            f.write(f"# {len(suite)} positions, python position_suite.py {' '.join(defaults)}\n")
+            for name, text in suite:
+                f.write(f"{name}; {text}\n")
+        counts = {}
+        for name, _ in suite:
+            category = name.rsplit('-', 1)[0]
+            counts[category] = counts.get(category, 0) + 1
+        print(f"{len(suite)} positions written to {defaults[0]}: " +
+              ", ".join(f"{count} {category}" for category, count in counts.items()))
+
+
+if __name__ == '__main__':
+    Main.run()
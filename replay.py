@@ -0,0 +1,197 @@
+import sys
+import time
+import tkinter as tk
+from util import new_game
+from selfplay import read_records
+
+
+class Timeline:
+    """Positions of a recorded game by turn: a Position keyframe every keyframe_every moves, other turns are replayed from the keyframe before them"""
+    def __init__(self, record, keyframe_every=16):
+        """Play the record once from the start and keep the keyframes"""
+        self.record = record
+        self.keyframe_every = keyframe_every
+        self.keyframes = []
+        position = new_game().to_position()
+        for i, move in enumerate(record.moves):
+            if i % keyframe_every == 0:
+                self.keyframes.append(position)
+            position = position.play(*move)
+        if len(record.moves) % keyframe_every == 0:
+            self.keyframes.append(position)
+        self._last = (0, self.keyframes[0])
+
+    def __len__(self):
+        """Number of positions, one more than the number of moves"""
+        return len(self.record.moves) + 1
+
+    def seek(self, index):
+        """Position after index moves. Moving forward from the last position sought replays from there when that is closer than a keyframe"""
+        index = max(0, min(index, len(self.record.moves)))
+        start = index - index % self.keyframe_every
+        last_index, last = self._last
+        if start <= last_index <= index:
+            start, position = last_index, last
+        else:
+            position = self.keyframes[start // self.keyframe_every]
+        for move in self.record.moves[start:index]:
+            position = position.play(*move)
+        self._last = (index, position)
+        return position
+
+
+class ReplayViewer:
+    """Replay of a recorded game with a timeline slider, step buttons and autoplay. Only the cells that differ from the drawn position are redrawn"""
+    def __init__(self, root, record, keyframe_every=16, cell_size=50, speed=4):
+        """Build the timeline and the window, speed is the number of moves per second of the autoplay"""
+        self.root = root
+        self.root.title("Board Game - Replay")
+        self.timeline = Timeline(record, keyframe_every)
+        self.cell_size = cell_size
+        self.speed = speed
+        self.era_colors = {'past': '#E6D5B8', 'present': '#F0F0F0', 'future': '#B8D5E6'}
+        self.drawn = None
+        self.index = 0
+        self.playing = False
+        self._pending = None
+        self.setup_ui()
+        self.show(0)
+
+    def setup_ui(self):
+        """One canvas per era, the slider, the controls and the status line"""
+        position = self.timeline.seek(0)
+        size = position.size
+        top = tk.Frame(self.root)
+        top.pack(fill=tk.X)
+        record = self.timeline.record
+        tk.Label(top, text=f"White: {record.white[0]}  Black: {record.black[0]}  Winner: {record.winner}").pack(side=tk.LEFT, padx=10)
+        boards = tk.Frame(self.root)
+        boards.pack(pady=5)
+        self.canvases, self.frames = [], []
+        for e, era in enumerate(position.eras):
+            frame = tk.LabelFrame(boards, text=era.capitalize(), bg=self.era_colors.get(era, '#F0F0F0'))
+            frame.grid(row=0, column=e, padx=8)
+            canvas = tk.Canvas(frame, width=size * self.cell_size, height=size * self.cell_size,
+                               bg=self.era_colors.get(era, '#F0F0F0'), highlightthickness=0)
+            canvas.grid()
+            for row in range(size):
+                for col in range(size):
+                    canvas.create_rectangle(col * self.cell_size, row * self.cell_size, (col + 1) * self.cell_size,
+                                            (row + 1) * self.cell_size, outline='black')
+            self.canvases.append(canvas)
+            self.frames.append(frame)
+        self.slider = tk.Scale(self.root, from_=0, to=len(self.timeline) - 1, orient=tk.HORIZONTAL,
+                               length=600, command=self.on_slide)
+        self.slider.pack(fill=tk.X, padx=10)
+        control = tk.Frame(self.root)
+        control.pack(fill=tk.X)
+        tk.Button(control, text="<<", command=lambda: self.jump(0)).pack(side=tk.LEFT, padx=2)
+        tk.Button(control, text="<", command=lambda: self.jump(self.index - 1)).pack(side=tk.LEFT, padx=2)
+        self.play_btn = tk.Button(control, text="Play", command=self.toggle_play)
+        self.play_btn.pack(side=tk.LEFT, padx=2)
+        tk.Button(control, text=">", command=lambda: self.jump(self.index + 1)).pack(side=tk.LEFT, padx=2)
+        tk.Button(control, text=">>", command=lambda: self.jump(len(self.timeline) - 1)).pack(side=tk.LEFT, padx=2)
+        tk.Button(control, text="Quit", command=self.root.quit).pack(side=tk.RIGHT, padx=5)
+        self.status_label = tk.Label(self.root, text="", fg="blue", anchor="w")
+        self.status_label.pack(fill=tk.X)
+
+    def on_slide(self, value):
+        """Slider moved: draw the latest value once Tk is idle, so fast scrubbing does not queue a redraw per step"""
+        if self._pending is None:
+            self._pending = self.root.after_idle(self._show_slider)
+
+    def _show_slider(self):
+        """Draw the position under the slider"""
+        self._pending = None
+        self.show(int(self.slider.get()))
+
+    def jump(self, index):
+        """Move the slider and the boards to a turn"""
+        index = max(0, min(index, len(self.timeline) - 1))
+        self.slider.set(index)
+        self.show(index)
+
+    def toggle_play(self):
+        """Start or stop the autoplay"""
+        self.playing = not self.playing
+        self.play_btn.config(text="Pause" if self.playing else "Play")
+        if self.playing:
+            self.root.after(0, self.play_step)
+
+    def play_step(self):
+        """Autoplay: one move forward per tick until the end"""
+        if not self.playing:
+            return
+        if self.index >= len(self.timeline) - 1:
+            self.toggle_play()
+            return
+        self.jump(self.index + 1)
+        self.root.after(int(1000 / self.speed), self.play_step)
+
+    def show(self, index):
+        """Seek the timeline and redraw the cells that changed. Era boards shared with the drawn position are skipped without comparing them"""
+        started = time.perf_counter()
+        position = self.timeline.seek(index)
+        drawn = self.drawn
+        size = position.size
+        for e, board in enumerate(position.boards):
+            old = drawn.boards[e] if drawn else None
+            if old is board:
+                continue
+            canvas = self.canvases[e]
+            for cell, symbol in enumerate(board):
+                if old is not None and old[cell] == symbol:
+                    continue
+                canvas.delete(f"cell{cell}")
+                if symbol is not None:
+                    self.draw_piece(canvas, cell, size, symbol, position)
+        for e, era in enumerate(position.eras):
+            focused = era in position.focus
+            self.frames[e].config(highlightbackground='red' if focused else self.era_colors.get(era, '#F0F0F0'),
+                                  highlightthickness=2 if focused else 1)
+        self.drawn, self.index = position, index
+        moves = self.timeline.record.moves
+        last = f", last move {' '.join(str(m) for m in moves[index - 1])}" if index else ""
+        side = position.players[position.current][0]
+        self.status_label.config(text=f"Turn {index + 1} of {len(self.timeline)}, {side} to move{last} "
+                                      f"({(time.perf_counter() - started) * 1000:.1f}ms)")
+
+    def draw_piece(self, canvas, cell, size, symbol, position):
+        """Draw one piece with its symbol, white pieces as circles and black ones as squares"""
+        row, col = divmod(cell, size)
+        x, y = col * self.cell_size + self.cell_size // 2, row * self.cell_size + self.cell_size // 2
+        radius = self.cell_size // 3
+        white = not symbol.isdigit()
+        shape = canvas.create_oval if white else canvas.create_rectangle
+        shape(x - radius, y - radius, x + radius, y + radius, fill='white' if white else 'black',
+              outline='black' if white else 'white', width=2, tags=f"cell{cell}")
+        canvas.create_text(x, y, text=symbol, fill='black' if white else 'white', tags=f"cell{cell}")
+
+
+class Main:
+    """
+    Replay runner: python replay.py [records file] [game number] [keyframe interval]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['records.jsonl', '1', '16']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        number = int(defaults[1])
+        for i, record in enumerate(read_records(defaults[0]), 1):
+            if i == number:
+                break
+        else:
+            raise ValueError(f"{defaults[0]} has no game {number}")
+        root = tk.Tk()
+        ReplayViewer(root, record, int(defaults[2]))
+        root.mainloop()
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,132 @@
+"""
+Depth-limited alpha-beta search on FastEngine for offline analysis. The evaluation is the heuristic of
+Player.eval (era presence, piece advantage, supply, centrality, focus) weighted like HeuristicAI.score_system,
+taken as the difference between both sides so the search can be written as negamax. Moves are ordered by the
+static value after the move, which already puts captures first; the capture list of threats.ThreatAnalyzer is
+not used here, it visited more nodes as an ordering and cost more than it saved as a quiescence search
+"""
+
+from constants import w1, w2, w3, w4, w5
+
+WIN = 1000
+
+
+def evaluate(engine, weights=(w1, w2, w3, w4, w5)):
+    """
+    Score of the position for the side to move: its weighted criteria minus those of the opponent
+    """
+    size, area = engine.size, engine.area
+    eras, pieces, central, in_focus = [set(), set()], [0, 0], [0, 0], [0, 0]
+    for cell, symbol in enumerate(engine.cells):
+        if symbol is None:
+            continue
+        color = engine.owner[symbol]
+        era, rest = divmod(cell, area)
+        x, y = divmod(rest, size)
+        eras[color].add(era)
+        pieces[color] += 1
+        if 1 <= x <= size - 2 and 1 <= y <= size - 2:
+            central[color] += 1
+        if era == engine.focus[color]:
+            in_focus[color] += 1
+    scores = []
+    for color in (0, 1):
+        criteria = (len(eras[color]), pieces[color] - pieces[1 - color], engine.supply[color],
+                    central[color], in_focus[color])
+        scores.append(sum(w * c for w, c in zip(weights, criteria)))
+    me = engine.current
+    return scores[me] - scores[1 - me]
+
+
+def moves(engine):
+    """
+    Complete moves (symbol, dir1, dir2, focus index) of the side to move. A player without pieces
+    in focus, or without a legal move for them, only chooses the next focus
+    """
+    focus = engine.focus[engine.current]
+    steps = engine.legal_moves() if engine.has_pieces_in_focus() else []
+    steps = steps or [(None, None, None)]
+    return [(symbol, dir1, dir2, era) for symbol, dir1, dir2 in steps
+            for era in range(engine.eras) if era != focus]
+
+
+class Searcher:
+    """
+    Negamax alpha-beta to a fixed depth. Wins found nearer the root score higher
+    """
+    def __init__(self, depth=2, weights=(w1, w2, w3, w4, w5)):
+        """
+        Save the depth and the evaluation weights, nodes counts the positions visited
+        """
+        self.depth = depth
+        self.weights = weights
+        self.nodes = 0
+
+    def value(self, engine):
+        """
+        Value of the position for the side to move
+        """
+        return self._negamax(engine, self.depth, -WIN - self.depth - 1, WIN + self.depth + 1)
+
+    def best(self, engine):
+        """
+        Best complete move of the side to move and its value, None for a finished game
+        """
+        if engine.is_over():
+            return None, -WIN - self.depth
+        best_move, alpha, beta = None, -WIN - self.depth - 1, WIN + self.depth + 1
+        for move in self._ordered(engine, moves(engine)):
+            undo = engine.make(*move)
+            score = -self._negamax(engine, self.depth - 1, -beta, -alpha)
+            engine.unmake(undo)
+            if score > alpha:
+                best_move, alpha = move, score
+        return best_move, alpha
+
+    def scores(self, engine):
+        """
+        Exact value of every complete move of the side to move, each searched to depth - 1 with a full
+        window, so that all moves are compared at the same depth. Empty for a finished game
+        """
+        if engine.is_over():
+            return []
+        bound = WIN + self.depth + 1
+        scored = []
+        for move in moves(engine):
+            undo = engine.make(*move)
+            scored.append((move, -self._negamax(engine, self.depth - 1, -bound, bound)))
+            engine.unmake(undo)
+        return scored
+
+    def _ordered(self, engine, candidates):
+        """
+        Candidates sorted by the static value after the move, best first
+        """
+        scored = []
+        for move in candidates:
+            undo = engine.make(*move)
+            scored.append((-evaluate(engine, self.weights), move))
+            engine.unmake(undo)
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def _negamax(self, engine, depth, alpha, beta):
+        """
+        Alpha-beta value of the position for the side to move
+        """
+        self.nodes += 1
+        if engine.is_over():
+            return -WIN - depth
+        if depth == 0:
+            return evaluate(engine, self.weights)
+        candidates = moves(engine)
+        if depth > 1:
+            candidates = self._ordered(engine, candidates)
+        for move in candidates:
+            undo = engine.make(*move)
+            score = -self._negamax(engine, depth - 1, -beta, -alpha)
+            engine.unmake(undo)
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
@@ -0,0 +1,168 @@
+import json
+import os
+import random
+import sys
+from multiprocessing import Pool
+from move import Move
+from play_game import BaseGame, AutoPlayDecorator
+from player import HumanPlayer, HeuristicAI, RandomAI
+
+
+def _learned_player(color, weights=None):
+    """
+    Factory of the learned player type, the weights are the evaluator file. learned_eval needs numpy and
+    imports this module, so it is imported on first use
+    """
+    from learned_eval import LearnedAI  # needs numpy
+    return LearnedAI(color, weights=weights)
+
+
+PLAYER_TYPES = {'human': HumanPlayer, 'random': RandomAI, 'heuristic': HeuristicAI, 'learned': _learned_player}
+
+
+def make_player(color, spec):
+    """
+    Create a player from a picklable spec: (player type, weights or None)
+    """
+    ptype, weights = spec
+    return PLAYER_TYPES[ptype](color, weights=weights)
+
+
+class GameRecord:
+    """
+    Record of a finished game: the player specs, every move as (symbol, dir1, dir2, focus) and the winner
+    """
+    def __init__(self, white, black, moves, winner, turns):
+        """
+        Save the players, the moves in order, the winning color (None for a draw) and the number of turns
+        """
+        self.white = white
+        self.black = black
+        self.moves = moves
+        self.winner = winner
+        self.turns = turns
+
+    def to_json(self):
+        """
+        One JSON line for a record file
+        """
+        return json.dumps({'white': self.white, 'black': self.black, 'moves': self.moves,
+                           'winner': self.winner, 'turns': self.turns})
+
+    @classmethod
+    def from_json(cls, line):
+        """
+        Read a record back from its JSON line
+        """
+        data = json.loads(line)
+        white = (data['white'][0], data['white'][1])
+        black = (data['black'][0], data['black'][1])
+        moves = [tuple(move) for move in data['moves']]
+        return cls(white, black, moves, data['winner'], data['turns'])
+
+    def replay(self):
+        """
+        Replay the moves on a new game, yield (game, move tuple) before each move is applied
+        """
+        game = BaseGame(make_player('white', self.white), make_player('black', self.black),
+                        current=0, use_history=False, verbose=False)
+        for symbol, dir1, dir2, next_focus in self.moves:
+            yield game, (symbol, dir1, dir2, next_focus)
+            piece = game.find_piece(symbol) if symbol else None
+            Move(piece, dir1, dir2, next_focus).apply(game)
+            game.turn += 1
+            game.current = 1 - game.current
+
+
+def write_records(path, records):
+    """
+    Append records to a JSON lines file
+    """
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(record.to_json() + '\n')
+
+
+def read_records(path):
+    """
+    Iterate the records of a JSON lines file
+    """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield GameRecord.from_json(line)
+
+
+def play_game(white, black, max_turns=200, seed=None, on_move=None, time_control=None):
+    """
+    Play one headless game between two player specs and return its GameRecord, optionally on the clock
+    """
+    if seed is not None:
+        random.seed(seed)
+    moves = []
+
+    def record_move(game, move):
+        moves.append((move.piece.symbol if move.piece else None, move.dir1, move.dir2, move.focus_next))
+        if on_move:
+            on_move(game, move)
+
+    game = BaseGame(make_player('white', white), make_player('black', black),
+                    current=0, use_history=False, verbose=False, time_control=time_control)
+    winner = AutoPlayDecorator(game, max_turns, record_move).play()
+    return GameRecord(white, black, moves, winner, game.turn - 1)
+
+
+def _play_job(job):
+    """
+    Worker: play one game of a batch
+    """
+    white, black, max_turns, seed = job
+    return play_game(white, black, max_turns, seed)
+
+
+def play_games(white, black, games, processes=1, max_turns=200, seed=0):
+    """
+    Play a batch of games on a process pool, yield the records as they finish
+    """
+    rng = random.Random(seed)
+    jobs = [(white, black, max_turns, rng.randrange(2 ** 32)) for _ in range(games)]
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(_play_job, jobs)
+
+
+def parse_spec(text):
+    """
+    Player spec from the command line: 'heuristic', 'random' or '<type>=<weight or model file>'
+    """
+    ptype, _, weights_file = text.partition('=')
+    if ptype == 'heuristic' and weights_file:
+        with open(weights_file) as f:
+            return ptype, json.load(f)['weights']
+    return ptype, weights_file or None
+
+
+class Main:
+    """
+    Self-play runner: python selfplay.py [games] [processes] [records file] [white] [black]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['100', str(os.cpu_count() or 1), 'records.jsonl', 'heuristic', 'heuristic']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        results = {'white': 0, 'black': 0, None: 0}
+        with open(defaults[2], 'a') as f:
+            for record in play_games(parse_spec(defaults[3]), parse_spec(defaults[4]),
+                                     int(defaults[0]), int(defaults[1])):
+                f.write(record.to_json() + '\n')
+                results[record.winner] += 1
+        print(f"white {results['white']}, black {results['black']}, draws {results[None]}, written to {defaults[2]}")
+
+
+if __name__ == '__main__':
+    Main.run()
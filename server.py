@@ -0,0 +1,403 @@
+"""
+Game server: many concurrent matches behind one asyncio process, on a local TCP or Unix socket.
+The protocol is one JSON object per line. Requests carry an "op" and an optional "id" that is echoed
+in the reply, and the server pushes "event" lines to the players and spectators of a match.
+AI moves are computed on a warm worker pool from the Position of the match, the event loop only validates and
+applies moves and routes messages.
+With a MoveBroker the AI moves of all matches are chosen in batches on the broker's thread instead.
+Clients pick players by name only: a bare player type that needs no file, or a name the server operator
+configured with its weight or model file, so a client never makes the server open a path of its choosing.
+A match ends and is removed once no player or spectator is connected to it any more, and a connection that lets
+more than MAX_WRITE_BUFFER bytes of events pile up unread is closed
+
+Requests:
+    {"op": "new", "white": "human", "black": "heuristic", "seat": "white"}   -> {"ok": true, "game": 1}
+    {"op": "join", "game": 1, "color": "black"}      take an open human seat
+    {"op": "watch", "game": 1}                       receive the events of a match
+    {"op": "move", "game": 1, "move": ["A", "n", "e", "present"]}
+    {"op": "state", "game": 1}
+    {"op": "list"}
+Events:
+    {"event": "turn", "game": 1, "color": "white", "legal": [[symbol, dir1, dir2], ...], "focus": [eras]}
+    {"event": "move", "game": 1, "color": "white", "move": [symbol, dir1, dir2, focus], "turn": 2}
+    {"event": "end", "game": 1, "winner": "black"}
+    {"event": "end", "game": 1, "winner": null, "error": "AI move failed: ..."}   the match is abandoned
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+import metrics
+from move import Move
+from play_game import BaseGame
+from selfplay import make_player, parse_spec
+from worker_pool import WarmPool, best_move
+
+DEFAULT_ADDRESS = 'localhost:8765'
+BACKLOG = 4096
+BARE_PLAYERS = ('human', 'random', 'heuristic')
+MAX_WRITE_BUFFER = 1 << 20
+
+
+async def open_connection(address):
+    """
+    Open a client connection to 'host:port' or 'unix:<path>'
+    """
+    if address.startswith('unix:'):
+        return await asyncio.open_unix_connection(address[5:])
+    host, _, port = address.rpartition(':')
+    return await asyncio.open_connection(host, int(port))
+
+
+class Match:
+    """
+    One hosted game: the players' specs, the connections in the human seats and the spectators
+    """
+    def __init__(self, match_id, white, black, max_turns=200):
+        """
+        Create the game, human seats start empty
+        """
+        self.id = match_id
+        self.specs = {'white': white, 'black': black}
+        self.game = BaseGame(make_player('white', white), make_player('black', black),
+                             current=0, use_history=False, verbose=False)
+        self.max_turns = max_turns
+        self.seats = {color: None for color, spec in self.specs.items() if spec[0] == 'human'}
+        self.watchers = set()
+        self.thinking = False
+        self.over = False
+        self.winner = None
+
+    def color_to_move(self):
+        """
+        Color of the player to move
+        """
+        return self.game.current_player().color
+
+    def human_to_move(self):
+        """
+        Check whether the player to move sits in a human seat
+        """
+        return self.color_to_move() in self.seats
+
+    def apply(self, symbol, dir1, dir2, focus_next):
+        """
+        Apply a move like the game drivers do and check for the end of the game
+        """
+        piece = self.game.find_piece(symbol) if symbol else None
+        Move(piece, dir1, dir2, focus_next).apply(self.game)
+        self.game.turn += 1
+        self.game.current = 1 - self.game.current
+        if self.game.is_winning_move(self.game.current_player()):
+            self.over, self.winner = True, self.game.get_opponent().color
+        elif self.game.turn > self.max_turns:
+            self.over = True
+
+    def legal(self):
+        """
+        Legal (symbol, dir1, dir2) of the player to move and the focus eras they may choose
+        """
+        player = self.game.current_player()
+        focus = self.game.focus[player.color]
+        if any(p.era == focus for p in player.pieces):
+            moves = [list(move) for move in self.game.legal_moves().moves()]
+        else:
+            moves = [[None, None, None]]
+        return moves, [era for era in self.game.eras if era != focus]
+
+    def state(self):
+        """
+        Position of the match for the state request
+        """
+        boards = {era: [[p.symbol if p else None for p in row] for row in self.game.boards[era].grid]
+                  for era in self.game.eras}
+        return {'game': self.id, 'turn': self.game.turn, 'color': self.color_to_move(), 'boards': boards,
+                'focus': self.game.focus, 'supply': {p.color: p.supply for p in self.game.players},
+                'over': self.over, 'winner': self.winner}
+
+    def audience(self):
+        """
+        Connections that receive the events of the match
+        """
+        return [conn for conn in self.seats.values() if conn] + list(self.watchers)
+
+
+class GameServer:
+    """
+    Asyncio server hosting the matches. Every client connection is a StreamWriter,
+    AI turns run as tasks that await the worker pool
+    """
+    def __init__(self, processes=None, max_turns=200, broker=None, players=None):
+        """
+        Start the worker pool for the AI moves, the players a broker supports are batched by it. players maps
+        the names clients may ask for, besides the bare player types, to specs such as 'heuristic=tuned.json',
+        their files are read here once
+        """
+        self.players = {name: parse_spec(spec) for name, spec in (players or {}).items()}
+        self.pool = WarmPool(processes)
+        self.broker = broker
+        self.max_turns = max_turns
+        self.matches = {}
+        self._next_id = 1
+        self.moves = 0
+        self.ai_moves = 0
+        self.ai_time = 0.0
+
+    async def serve(self, address=DEFAULT_ADDRESS):
+        """
+        Listen on 'host:port' or 'unix:<path>' until cancelled
+        """
+        if address.startswith('unix:'):
+            server = await asyncio.start_unix_server(self._handle, address[5:], backlog=BACKLOG)
+        else:
+            host, _, port = address.rpartition(':')
+            server = await asyncio.start_server(self._handle, host, int(port), backlog=BACKLOG)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """
+        Stop the worker pool and the broker
+        """
+        self.pool.shutdown(cancel_futures=True)
+        if self.broker:
+            self.broker.close()
+
+    def _send(self, conn, message):
+        """
+        Queue one JSON line on a connection, closed connections are skipped. Events are not awaited, so a
+        client that does not read them is disconnected once its buffer passes MAX_WRITE_BUFFER
+        """
+        if conn.is_closing():
+            return
+        if conn.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            conn.close()
+            return
+        conn.write((json.dumps(message) + '\n').encode())
+
+    def _broadcast(self, match, message):
+        """
+        Send an event to the players and spectators of a match
+        """
+        for conn in match.audience():
+            self._send(conn, message)
+
+    async def _handle(self, reader, writer):
+        """
+        Serve one client connection: read requests line by line and answer each of them
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    reply = self._dispatch(writer, request)
+                except (ValueError, KeyError, TypeError) as error:
+                    reply = {'ok': False, 'error': str(error)}
+                if isinstance(request, dict) and 'id' in request:
+                    reply['id'] = request['id']
+                self._send(writer, reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for match in self.matches.values():
+                match.watchers.discard(writer)
+                for color, conn in match.seats.items():
+                    if conn is writer:
+                        match.seats[color] = None
+            for match_id, match in list(self.matches.items()):
+                if not match.audience():
+                    # nobody is left to play or watch, a running AI turn stops after its current move
+                    match.over = True
+                    del self.matches[match_id]
+            writer.close()
+
+    def _match(self, request):
+        """
+        Match of a request, KeyError for an unknown game
+        """
+        match = self.matches.get(request['game'])
+        if match is None:
+            raise KeyError(f"unknown game {request['game']}")
+        return match
+
+    def _player_spec(self, name):
+        """
+        Spec of a player a client asked for, ValueError unless it is a bare player type or a configured name
+        """
+        if name in self.players:
+            return self.players[name]
+        if name in BARE_PLAYERS:
+            return name, None
+        raise ValueError(f"unknown player {name!r}, expected one of {', '.join(BARE_PLAYERS + tuple(self.players))}")
+
+    def _dispatch(self, conn, request):
+        """
+        Run a request and return its reply
+        """
+        op = request['op']
+        if op == 'new':
+            max_turns = max(1, min(int(request.get('max_turns', self.max_turns)), self.max_turns))
+            match = Match(self._next_id, self._player_spec(request.get('white', 'human')),
+                          self._player_spec(request.get('black', 'heuristic')), max_turns)
+            self._next_id += 1
+            self.matches[match.id] = match
+            seat = request.get('seat', next(iter(match.seats), None))
+            if seat is not None:
+                self._take_seat(match, seat, conn)
+            else:
+                match.watchers.add(conn)
+            self._next_turn(match)
+            return {'ok': True, 'game': match.id}
+        if op == 'join':
+            match = self._match(request)
+            self._take_seat(match, request['color'], conn)
+            self._next_turn(match)
+            return {'ok': True, 'game': match.id}
+        if op == 'watch':
+            self._match(request).watchers.add(conn)
+            return {'ok': True}
+        if op == 'move':
+            return self._human_move(conn, self._match(request), request['move'])
+        if op == 'state':
+            return dict(self._match(request).state(), ok=True)
+        if op == 'list':
+            return {'ok': True, 'games': [{'game': m.id, 'turn': m.game.turn, 'over': m.over,
+                                           'open': [c for c, conn in m.seats.items() if conn is None]}
+                                          for m in self.matches.values()]}
+        raise ValueError(f"unknown op {op}")
+
+    def _take_seat(self, match, color, conn):
+        """
+        Seat a connection in an open human seat
+        """
+        if color not in match.seats or match.seats[color] is not None:
+            raise ValueError(f"seat {color} is not open")
+        match.seats[color] = conn
+
+    def _human_move(self, conn, match, move):
+        """
+        Validate and apply the move of a human seat
+        """
+        if match.over:
+            return {'ok': False, 'error': 'game over'}
+        color = match.color_to_move()
+        if match.seats.get(color) is not conn:
+            return {'ok': False, 'error': 'not your turn'}
+        symbol, dir1, dir2, focus_next = move
+        piece = match.game.find_piece(symbol) if symbol else None
+        if not match.game.is_legal_move(Move(piece, dir1, dir2, focus_next)):
+            return {'ok': False, 'error': 'illegal move'}
+        self._apply(match, color, (symbol, dir1, dir2, focus_next))
+        self._next_turn(match)
+        return {'ok': True}
+
+    def _apply(self, match, color, move):
+        """
+        Apply a move and tell the audience, with the end of the game if it ended
+        """
+        match.apply(*move)
+        self.moves += 1
+        self._broadcast(match, {'event': 'move', 'game': match.id, 'color': color, 'move': list(move),
+                                'turn': match.game.turn})
+        if match.over:
+            self._broadcast(match, {'event': 'end', 'game': match.id, 'winner': match.winner})
+            recorder = metrics.current()
+            if recorder:
+                recorder.record_game(match.winner)
+
+    def _next_turn(self, match):
+        """
+        Ask the human to move or start the AI turns of the match
+        """
+        if match.over or match.thinking:
+            return
+        if match.human_to_move():
+            conn = match.seats[match.color_to_move()]
+            if conn:
+                legal, focus = match.legal()
+                self._send(conn, {'event': 'turn', 'game': match.id, 'color': match.color_to_move(),
+                                  'legal': legal, 'focus': focus})
+        else:
+            match.thinking = True
+            asyncio.get_running_loop().create_task(self._ai_turns(match))
+
+    async def _ai_turns(self, match):
+        """
+        Play AI moves on the worker pool until a human is to move or the game is over. A failed AI move
+        abandons the match with an error in its end event
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while not match.over and not match.human_to_move():
+                started = time.perf_counter()
+                if self.broker and self.broker.supports(match.game.current_player()):
+                    chosen = await self.broker.request(match.game)
+                    move = (chosen.piece.symbol if chosen.piece else None, chosen.dir1, chosen.dir2, chosen.focus_next)
+                else:
+                    game = match.game
+                    move = await loop.run_in_executor(self.pool, best_move, game.to_position(), game.turn,
+                                                      match.specs[match.color_to_move()])
+                if match.over:
+                    break
+                elapsed = time.perf_counter() - started
+                recorder = metrics.current()
+                if recorder:
+                    recorder.record_move(match.game, match.game.current_player(), elapsed)
+                self.ai_time += elapsed
+                self.ai_moves += 1
+                self._apply(match, match.color_to_move(), move)
+        except Exception as error:
+            lines = str(error).strip().splitlines()
+            match.over = True
+            self._broadcast(match, {'event': 'end', 'game': match.id, 'winner': None,
+                                    'error': f"AI move failed: {lines[-1] if lines else type(error).__name__}"})
+            return
+        finally:
+            match.thinking = False
+        self._next_turn(match)
+
+
+class Main:
+    """
+    Server runner: python server.py [host:port or unix:<path>] [processes] [max turns] [batch size or off]
+    [max batch wait in ms] [named players as name:spec, comma separated, or off]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = [DEFAULT_ADDRESS, str(os.cpu_count() or 1), '200', 'off', '5', 'off']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        broker = None
+        if defaults[3] != 'off':
+            from broker import MoveBroker  # needs numpy
+            broker = MoveBroker(int(defaults[3]), float(defaults[4]) / 1000)
+        players = {}
+        if defaults[5] != 'off':
+            players = dict(item.split(':', 1) for item in defaults[5].split(','))
+        server = GameServer(int(defaults[1]), int(defaults[2]), broker, players)
+        print(f"serving on {defaults[0]} with {defaults[1]} AI processes")
+        try:
+            asyncio.run(server.serve(defaults[0]))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            print(f"{server._next_id - 1} games, {server.moves} moves, {server.ai_moves} AI moves")
+            if broker:
+                print(broker.summary())
+
+
+if __name__ == '__main__':
+    Main.run()
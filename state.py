@@ -1,4 +1,7 @@
-import copy
+import pickle
+import tempfile
+import zlib
+from collections import deque
 
 # Memento Pattern
 
@@ -9,44 +12,149 @@ class GameState:
     """
     def __init__(self, game):
         """
-        Initiate an instance with the deep copy of current game in order to save the current game state
+        Initiate an instance with the immutable Position of the current game and the turn counter
         """
-        self.boards = copy.deepcopy(game.boards)
-        self.players = copy.deepcopy(game.players)
+        self.position = game.to_position()
         self.turn = game.turn
-        self.current = game.current
-        self.focus = copy.deepcopy(game.focus)
     
     def restore(self, game):
         """
         Restore a game state 
         """
-        game.boards = copy.deepcopy(self.boards)
-        game.players = copy.deepcopy(self.players)
+        game.restore_position(self.position)
         game.turn = self.turn
-        game.current = self.current
-        game.focus = copy.deepcopy(self.focus)
     
 
+class SnapshotStack:
+    """
+    Stack of game states with at most max_in_memory of them kept in a ring buffer.
+    States are pickled once when pushed and kept as bytes, so the memory they hold is known exactly.
+    When the buffer is full the oldest state is evicted: its bytes are compressed and appended to a log
+    in a temporary file of spill_dir, or dropped when there is no spill_dir.
+    Popping past the buffer reads the states back from the end of the log
+    """
+    def __init__(self, max_in_memory=None, spill_dir=None):
+        """
+        Start with an empty buffer, the log file is only created on the first spill
+        """
+        self.max_in_memory = max_in_memory
+        self.spill_dir = spill_dir
+        self._items = deque()
+        self._bytes = 0
+        self._log = None
+        self._offsets = []
+        self.dropped = 0
+
+    def __len__(self):
+        """
+        Number of states that can still be popped, in memory and on disk
+        """
+        return len(self._items) + len(self._offsets)
+
+    def push(self, state):
+        """
+        Push a state and evict the oldest ones beyond the in-memory limit
+        """
+        data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        self._items.append(data)
+        self._bytes += len(data)
+        while self.max_in_memory is not None and len(self._items) > self.max_in_memory:
+            old = self._items.popleft()
+            self._bytes -= len(old)
+            self._spill(old)
+
+    def pop(self):
+        """
+        Pop the newest state, reloading it from the log when the buffer is empty
+        """
+        if self._items:
+            data = self._items.pop()
+            self._bytes -= len(data)
+            return pickle.loads(data)
+        if self._offsets:
+            offset, length = self._offsets.pop()
+            self._log.seek(offset)
+            data = self._log.read(length)
+            self._log.truncate(offset)
+            return pickle.loads(zlib.decompress(data))
+        return None
+
+    def clear(self):
+        """
+        Forget every state, in memory and on disk
+        """
+        self._items.clear()
+        self._bytes = 0
+        self._offsets.clear()
+        if self._log:
+            self._log.truncate(0)
+
+    def close(self):
+        """
+        Delete the log file
+        """
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    def memory_states(self):
+        """
+        Number of states in memory
+        """
+        return len(self._items)
+
+    def memory_bytes(self):
+        """
+        Pickled size of the states in memory
+        """
+        return self._bytes
+
+    def spilled(self):
+        """
+        Number and compressed size of the states in the log
+        """
+        if not self._offsets:
+            return 0, 0
+        offset, length = self._offsets[-1]
+        return len(self._offsets), offset + length
+
+    def _spill(self, data):
+        """
+        Append the bytes of an evicted state to the log, or drop them without a spill directory
+        """
+        if self.spill_dir is None:
+            self.dropped += 1
+            return
+        if self._log is None:
+            self._log = tempfile.TemporaryFile(prefix='history_', suffix='.log', dir=self.spill_dir)
+        offset = self._offsets[-1][0] + self._offsets[-1][1] if self._offsets else 0
+        data = zlib.compress(data)
+        self._log.seek(offset)
+        self._log.write(data)
+        self._offsets.append((offset, len(data)))
+
+
 class Caretaker:
     """
     The class is designed to save the history of game states in order to faciliate undo functionality
-    and the future of game states in order to faciliate the redo functionality
+    and the future of game states in order to faciliate the redo functionality.
+    Both are SnapshotStacks limited to max_snapshots states in memory, older states are spilled to
+    spill_dir (or forgotten without it). Close it when the game ends to delete the spill files
     """
-    def __init__(self, originator):
+    def __init__(self, originator, max_snapshots=None, spill_dir=None):
         """
         Initiate hitory and future records of game states
         """
         self._originator = originator
-        self._history = []  
-        self._future = []   
+        self._history = SnapshotStack(max_snapshots, spill_dir)
+        self._future = SnapshotStack(max_snapshots, spill_dir)
     
     def backup(self):
         """
         Save the game state
         """
         state = GameState(self._originator)
-        self._history.append(state)
+        self._history.push(state)
         self._future.clear()  
     
     def undo(self):
@@ -56,8 +164,8 @@ class Caretaker:
         if len(self._history) < 1:
             return None
         
-        memento = copy.deepcopy(self._history.pop())
-        self._future.append(GameState(self._originator))
+        memento = self._history.pop()
+        self._future.push(GameState(self._originator))
         self._originator.restore_state(memento)
         return memento
     
@@ -68,9 +176,39 @@ class Caretaker:
         if len(self._future) < 1:
             return None
         
-        memento = copy.deepcopy(self._future.pop())
-        self._history.append(GameState(self._originator))
+        memento = self._future.pop()
+        self._history.push(GameState(self._originator))
         self._originator.restore_state(memento)
         return memento
-    
 
+    def close(self):
+        """
+        Delete the spill files
+        """
+        self._history.close()
+        self._future.close()
+
+    def memory_usage(self):
+        """
+        Snapshot counts and sizes: states and bytes in memory, states and bytes spilled to disk, dropped states
+        """
+        stacks = (self._history, self._future)
+        spilled = [stack.spilled() for stack in stacks]
+        return {'memory_states': sum(stack.memory_states() for stack in stacks),
+                'memory_bytes': sum(stack.memory_bytes() for stack in stacks),
+                'disk_states': sum(count for count, _ in spilled),
+                'disk_bytes': sum(size for _, size in spilled),
+                'dropped': sum(stack.dropped for stack in stacks)}
+
+    def summary(self):
+        """
+        One line of history memory usage for the status output
+        """
+        usage = self.memory_usage()
+        line = (f"history: {len(self._history)} undo, {len(self._future)} redo, "
+                f"{usage['memory_states']} in memory ({usage['memory_bytes'] / 1024:.0f} KB)")
+        if usage['disk_states']:
+            line += f", {usage['disk_states']} on disk ({usage['disk_bytes'] / 1024:.0f} KB)"
+        if usage['dropped']:
+            line += f", {usage['dropped']} dropped"
+        return line
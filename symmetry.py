@@ -0,0 +1,159 @@
+"""
+Symmetries of a position: the rules in DIRECTIONS and the board bounds do not change under the 8 rotations
+and reflections of the square board, and the two colors play by the same rules. A position is therefore
+written relative to the side to move (own pieces, opponent pieces) and the canonical key is the smallest
+encoding over the 8 board transforms. Moves are remapped with the transform that produced the key
+"""
+
+from constants import DIRECTIONS, ERAS
+from move import Move
+
+EMPTY, OWN, OPPONENT = 0, 1, 2
+MATRICES = [(1, 0, 0, 1), (0, 1, -1, 0), (-1, 0, 0, -1), (0, -1, 1, 0),
+            (-1, 0, 0, 1), (1, 0, 0, -1), (0, 1, 1, 0), (0, -1, -1, 0)]
+
+
+class Transform:
+    """
+    One rotation or reflection of a square board of the given size
+    """
+    def __init__(self, index, size):
+        """
+        Build the coordinate and direction maps of the transform
+        """
+        self.index = index
+        self.size = size
+        self.a, self.b, self.c, self.d = MATRICES[index]
+        self.offset = (size - 1 if self.a + self.b < 0 else 0, size - 1 if self.c + self.d < 0 else 0)
+        self.directions = {}
+        for name, vector in DIRECTIONS.items():
+            mapped = self._vector(*vector)
+            self.directions[name] = next(d for d, v in DIRECTIONS.items() if v == mapped)
+        self.inverse_directions = {v: k for k, v in self.directions.items()}
+        # flat cell order of the transformed board -> flat cell of the original board
+        self.permutation = [0] * (size * size)
+        self.inverse_squares = {}
+        for x in range(size):
+            for y in range(size):
+                nx, ny = self.square(x, y)
+                self.permutation[nx * size + ny] = x * size + y
+                self.inverse_squares[nx, ny] = (x, y)
+
+    def _vector(self, dx, dy):
+        """
+        Apply the linear part of the transform to a vector
+        """
+        return self.a * dx + self.b * dy, self.c * dx + self.d * dy
+
+    def square(self, x, y):
+        """
+        Coordinates of the square (x, y) after the transform
+        """
+        nx, ny = self._vector(x, y)
+        return nx + self.offset[0], ny + self.offset[1]
+
+    def inverse_square(self, x, y):
+        """
+        Coordinates of the original square that the transform maps to (x, y)
+        """
+        return self.inverse_squares.get((x, y))
+
+    def direction(self, direction):
+        """
+        Direction after the transform, time travel directions do not change
+        """
+        return self.directions.get(direction, direction)
+
+    def inverse_direction(self, direction):
+        """
+        Original direction that the transform maps to the direction
+        """
+        return self.inverse_directions.get(direction, direction)
+
+
+class BoardSymmetry:
+    """
+    Canonicalization of Game positions for one board size and number of eras
+    """
+    _instances = {}
+
+    def __init__(self, size, eras=len(ERAS)):
+        """
+        Precompute the 8 transforms of the board
+        """
+        self.size = size
+        self.eras = eras
+        self.transforms = [Transform(i, size) for i in range(len(MATRICES))]
+        area = size * size
+        self._permutations = [[e * area + i for e in range(eras) for i in t.permutation]
+                              for t in self.transforms]
+
+    @classmethod
+    def for_size(cls, size, eras=len(ERAS)):
+        """
+        Shared instance per board size and number of eras
+        """
+        if (size, eras) not in cls._instances:
+            cls._instances[size, eras] = cls(size, eras)
+        return cls._instances[size, eras]
+
+    def _relative_cells(self, game):
+        """
+        Every cell of every era, row by row, as EMPTY, OWN or OPPONENT seen from the side to move
+        """
+        color = game.current_player().color
+        return [EMPTY if p is None else OWN if p.color == color else OPPONENT
+                for era in game.eras for row in game.boards[era].grid for p in row]
+
+    def canonicalize(self, game):
+        """
+        Canonical key of the position and the Transform that maps the game onto it
+        """
+        player, opponent = game.current_player(), game.get_opponent()
+        cells = self._relative_cells(game)
+        rest = (player.supply, opponent.supply,
+                game.eras.index(game.focus[player.color]), game.eras.index(game.focus[opponent.color]))
+        best, best_transform = None, None
+        for transform, permutation in zip(self.transforms, self._permutations):
+            key = tuple(map(cells.__getitem__, permutation))
+            if best is None or key < best:
+                best, best_transform = key, transform
+        return best + rest, best_transform
+
+
+def canonicalize(game):
+    """
+    Canonical key of the game position and the Transform that produced it
+    """
+    return BoardSymmetry.for_size(game.size, len(game.eras)).canonicalize(game)
+
+
+def canonical_key(game):
+    """
+    Canonical key of the game position: equal for all symmetric positions, whichever color is to move
+    """
+    return canonicalize(game)[0]
+
+
+def to_canonical_move(move, transform):
+    """
+    Map a Move of the game to the canonical frame: (square, dir1, dir2, focus_next) where the square
+    (era, x, y) of the moved piece replaces its symbol, None when no piece is moved
+    """
+    square = None
+    if move.piece:
+        x, y = transform.square(move.piece.x, move.piece.y)
+        square = (move.piece.era, x, y)
+    return square, transform.direction(move.dir1), transform.direction(move.dir2), move.focus_next
+
+
+def from_canonical_move(game, canonical_move, transform):
+    """
+    Map a move of the canonical frame back to a Move on the pieces of the game
+    """
+    square, dir1, dir2, focus_next = canonical_move
+    piece = None
+    if square:
+        era, x, y = square
+        piece = game.boards[era].get_piece(*transform.inverse_square(x, y))
+    return Move(piece, transform.inverse_direction(dir1), transform.inverse_direction(dir2), focus_next)
@@ -0,0 +1,29 @@
+"""
+Shared helpers of the tests: the modules live at the top of the repository, and random games are played
+with the reference rules of Game so that no engine under test picks the moves
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzz import reference_make  # noqa: E402
+from util import reference_moves  # noqa: E402
+
+
+def random_moves(game, rng, turns):
+    """
+    Play up to turns random legal moves on the game and yield each (symbol, dir1, dir2, focus_next)
+    before it is made. Stops when the game is over
+    """
+    for _ in range(turns):
+        player = game.current_player()
+        if game.is_winning_move(player):
+            return
+        legal = sorted(reference_moves(game))
+        symbol, dir1, dir2 = rng.choice(legal) if legal else (None, None, None)
+        focus_next = rng.choice([era for era in game.eras if era != game.focus[player.color]])
+        move = (symbol, dir1, dir2, focus_next)
+        yield move
+        reference_make(game, *move)
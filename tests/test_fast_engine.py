@@ -0,0 +1,54 @@
+"""
+FastEngine against the reference Game: legal moves, states after make and unmake
+"""
+
+import random
+
+import pytest
+
+from conftest import random_moves
+from fast_engine import FastEngine
+from fuzz import check_sequence, random_sequence, reference_state
+from util import new_game, reference_moves
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_moves_and_states_match_game(seed):
+    game = new_game()
+    engine = FastEngine.from_game(game)
+    for move in random_moves(game, random.Random(seed), 40):
+        assert set(engine.legal_moves()) == reference_moves(game)
+        assert len(engine.legal_moves()) == len(reference_moves(game))
+        engine.make(*move)
+    assert engine.state() == reference_state(game)
+    assert engine.is_over() == game.is_winning_move(game.current_player())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_unmake_restores_state(seed):
+    game = new_game()
+    engine = FastEngine.from_game(game)
+    states, undos = [], []
+    for move in random_moves(game, random.Random(seed), 40):
+        states.append(engine.state())
+        undos.append(engine.make(*move))
+    while undos:
+        engine.unmake(undos.pop())
+        assert engine.state() == states.pop()
+    assert engine.state() == reference_state(new_game())
+
+
+def test_legal_moves_leave_state_unchanged():
+    game = new_game()
+    engine = FastEngine.from_game(game)
+    for move in random_moves(game, random.Random(7), 20):
+        before = engine.state()
+        engine.legal_moves()
+        assert engine.state() == before
+        engine.make(*move)
+
+
+def test_fuzzer_sequences_agree():
+    rng = random.Random(11)
+    for _ in range(3):
+        assert check_sequence(random_sequence(rng, 60), legal_every=3) is None
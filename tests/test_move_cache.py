@@ -0,0 +1,139 @@
+"""
+Persistent move cache: symmetric positions, invalidation on a weight change and eviction
+"""
+
+import random
+
+from conftest import random_moves
+from move import Move
+from move_cache import MoveCache
+from position import Position
+from symmetry import canonical_key
+from util import new_game, reference_moves
+
+
+def opening(seed, turns=6):
+    """
+    Game after a few random moves
+    """
+    game = new_game()
+    for _ in random_moves(game, random.Random(seed), turns):
+        pass
+    return game
+
+
+def some_moves(game):
+    """
+    Up to two legal Moves of the side to move, or the move that only changes focus
+    """
+    player = game.current_player()
+    focus = next(era for era in game.eras if era != game.focus[player.color])
+    legal = sorted(reference_moves(game))[:2]
+    if not legal:
+        return [Move(None, None, None, focus)]
+    return [Move(game.find_piece(symbol), dir1, dir2, focus) for symbol, dir1, dir2 in legal]
+
+
+def as_tuples(moves):
+    return [(move.piece.symbol if move.piece else None, move.dir1, move.dir2, move.focus_next) for move in moves]
+
+
+def test_store_probe_and_reopen(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    game = opening(1)
+    moves = some_moves(game)
+    cache = MoveCache(path)
+    assert cache.probe(game) is None
+    cache.store(game, moves)
+    assert as_tuples(cache.probe(game)) == as_tuples(moves)
+    cache.close()
+    cache = MoveCache(path)
+    assert as_tuples(cache.probe(game)) == as_tuples(moves)
+    assert cache.hit_rate() == 1.0
+    cache.close()
+
+
+def mirrored(game):
+    """
+    Copy of the game with every era board mirrored left to right
+    """
+    position = game.to_position()
+    size = position.size
+    boards = tuple(tuple(board[row * size + size - 1 - col] for row in range(size) for col in range(size))
+                   for board in position.boards)
+    copy = new_game()
+    copy.restore_position(Position(size, position.eras, boards, position.players, position.focus, position.current))
+    return copy
+
+
+def test_symmetric_position_hits(tmp_path):
+    cache = MoveCache(str(tmp_path / 'cache.sqlite'))
+    game = opening(6)
+    moves = some_moves(game)
+    cache.store(game, moves)
+    mirror = mirrored(game)
+    assert mirror.position_key() != game.position_key()
+    found = cache.probe(mirror)
+    assert found is not None and len(found) == len(moves)
+    legal = reference_moves(mirror)
+    for move in found:
+        assert move.piece is None or (move.piece.symbol, move.dir1, move.dir2) in legal
+    cache.close()
+
+
+def test_weight_change_clears_file(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    game = opening(2)
+    weights = (1, 2, 3, 4, 5)
+    cache = MoveCache(path, weights=weights)
+    cache.store(game, some_moves(game))
+    cache.close()
+    cache = MoveCache(path, weights=(1, 2, 3, 4, 6))
+    assert cache.probe(game) is None
+    cache.close()
+    cache = MoveCache(path, weights=weights)
+    assert cache.probe(game) is None
+    cache.close()
+
+
+def test_other_positions_miss(tmp_path):
+    cache = MoveCache(str(tmp_path / 'cache.sqlite'))
+    game = opening(3)
+    before = canonical_key(game)
+    cache.store(game, some_moves(game))
+    for _ in random_moves(game, random.Random(9), 1):
+        pass
+    assert canonical_key(game) != before
+    assert cache.probe(game) is None
+    cache.close()
+
+
+def test_max_entries_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    games = []
+    for seed in range(20):
+        game = opening(seed, turns=4 + seed % 5)
+        if all(canonical_key(game) != canonical_key(other) for other in games):
+            games.append(game)
+    games = games[:3]
+    cache = MoveCache(path, max_entries=2)
+    for game in games:
+        cache.store(game, some_moves(game))
+    assert cache.probe(games[0]) is None
+    assert cache.probe(games[1]) is not None
+    assert cache.probe(games[2]) is not None
+    cache.close()
+    cache = MoveCache(path, max_entries=1)
+    assert sum(cache.probe(game) is not None for game in games) == 1
+    cache.close()
+
+
+def test_max_age_expires_entries(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    game = opening(5)
+    cache = MoveCache(path)
+    cache.store(game, some_moves(game))
+    cache.close()
+    cache = MoveCache(path, max_age=-1)
+    assert cache.probe(game) is None
+    cache.close()
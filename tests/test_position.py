@@ -0,0 +1,70 @@
+"""
+Position snapshots and the one-line notation
+"""
+
+import pickle
+import random
+
+import pytest
+
+import notation
+from conftest import random_moves
+from util import new_game
+
+
+def test_restore_round_trip():
+    game = new_game()
+    for _ in random_moves(game, random.Random(1), 30):
+        position = game.to_position()
+        copy = new_game()
+        copy.restore_position(position)
+        assert copy.to_position() == position
+        assert copy.position_key() == game.position_key()
+
+
+def test_pickle_round_trip():
+    game = new_game()
+    for _ in random_moves(game, random.Random(2), 30):
+        position = game.to_position()
+        assert pickle.loads(pickle.dumps(position)) == position
+
+
+def test_play_matches_game():
+    game = new_game()
+    expected = None
+    for move in random_moves(game, random.Random(3), 30):
+        if expected is not None:
+            assert game.to_position() == expected
+        expected = game.to_position().play(*move)
+    assert game.to_position() == expected
+
+
+def test_notation_round_trip():
+    game = new_game()
+    for _ in random_moves(game, random.Random(4), 30):
+        text = game.to_notation()
+        assert notation.read(text) == (game.to_position(), game.turn)
+        copy = new_game()
+        copy.load_notation(text)
+        assert copy.to_position() == game.to_position()
+        assert copy.turn == game.turn
+        assert copy.to_notation() == text
+
+
+def test_notation_without_turn():
+    position = new_game().to_position()
+    assert notation.read(notation.write(position)) == (position, None)
+
+
+@pytest.mark.parametrize('text', ['', 'a b c', '1/2 - - past future w 1 extra'])
+def test_malformed_notation(text):
+    with pytest.raises(ValueError):
+        notation.read(text)
+
+
+def test_notation_side_and_focus_are_checked():
+    fields = new_game().to_notation().split()
+    with pytest.raises(ValueError):
+        notation.read(' '.join(fields[:5] + ['x'] + fields[6:]))
+    with pytest.raises(ValueError):
+        notation.read(' '.join(fields[:3] + ['nowhere'] + fields[4:]))
@@ -0,0 +1,75 @@
+"""
+Undo/redo history: SnapshotStack spilling to disk and the Caretaker of a game
+"""
+
+import random
+
+from conftest import random_moves
+from play_game import BaseGame
+from player import RandomAI
+from state import SnapshotStack
+
+
+def test_stack_spills_and_pops_in_order(tmp_path):
+    stack = SnapshotStack(max_in_memory=3, spill_dir=tmp_path)
+    for i in range(10):
+        stack.push({'state': i})
+    assert len(stack) == 10
+    assert stack.memory_states() == 3
+    assert stack.spilled()[0] == 7
+    assert [stack.pop()['state'] for _ in range(10)] == list(range(9, -1, -1))
+    assert stack.pop() is None
+    assert stack.spilled() == (0, 0)
+    stack.close()
+
+
+def test_stack_reuses_log_after_pops(tmp_path):
+    stack = SnapshotStack(max_in_memory=1, spill_dir=tmp_path)
+    for i in range(5):
+        stack.push(i)
+    assert [stack.pop() for _ in range(3)] == [4, 3, 2]
+    for i in range(5, 8):
+        stack.push(i)
+    assert [stack.pop() for _ in range(5)] == [7, 6, 5, 1, 0]
+    stack.close()
+
+
+def test_stack_without_spill_dir_drops_oldest():
+    stack = SnapshotStack(max_in_memory=2)
+    for i in range(5):
+        stack.push(i)
+    assert len(stack) == 2
+    assert stack.dropped == 3
+    assert [stack.pop(), stack.pop(), stack.pop()] == [4, 3, None]
+
+
+def test_clear_forgets_spilled_states(tmp_path):
+    stack = SnapshotStack(max_in_memory=1, spill_dir=tmp_path)
+    for i in range(4):
+        stack.push(i)
+    stack.clear()
+    assert len(stack) == 0
+    assert stack.pop() is None
+    stack.push('again')
+    assert stack.pop() == 'again'
+    stack.close()
+
+
+def test_undo_redo_through_spilled_history(tmp_path):
+    game = BaseGame(RandomAI('white'), RandomAI('black'), current=0, use_history=True, verbose=False,
+                    history_limit=2, spill_dir=tmp_path)
+    seen = []
+    for _ in random_moves(game, random.Random(5), 12):
+        game.save_state()
+        seen.append((game.to_position(), game.turn))
+    final = (game.to_position(), game.turn)
+    assert game.caretaker.memory_usage()['disk_states'] == len(seen) - 2
+    for position, turn in reversed(seen):
+        assert game.caretaker.undo() is not None
+        assert (game.to_position(), game.turn) == (position, turn)
+    assert game.caretaker.undo() is None
+    for position, turn in seen[1:] + [final]:
+        assert game.caretaker.redo() is not None
+        assert (game.to_position(), game.turn) == (position, turn)
+    assert game.caretaker.redo() is None
+    game.close()
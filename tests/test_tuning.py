@@ -0,0 +1,52 @@
+"""
+SPRT stopping bounds of the weight tuner
+"""
+
+import math
+
+import pytest
+
+from tuning import SPRT
+
+
+def test_bounds_follow_error_rates():
+    sprt = SPRT(alpha=0.05, beta=0.1)
+    assert sprt.lower == pytest.approx(math.log(0.1 / 0.95))
+    assert sprt.upper == pytest.approx(math.log(0.9 / 0.05))
+    assert sprt.llr() == 0.0
+    assert sprt.status() is None
+
+
+def test_clear_wins_accept():
+    sprt = SPRT()
+    while sprt.status() is None and sprt.games() < 1000:
+        for result in (1, 1, 1, 0.5, 0):
+            sprt.update(result)
+    assert sprt.status() == 'accept'
+    assert sprt.llr() >= sprt.upper
+
+
+def test_clear_losses_reject():
+    sprt = SPRT()
+    while sprt.status() is None and sprt.games() < 1000:
+        for result in (0, 0, 0.5, 1):
+            sprt.update(result)
+    assert sprt.status() == 'reject'
+    assert sprt.llr() <= sprt.lower
+
+
+def test_short_streak_does_not_decide():
+    sprt = SPRT()
+    for result in (1, 1, 0):
+        sprt.update(result)
+    assert sprt.status() is None
+    assert sprt.lower < sprt.llr() < sprt.upper
+
+
+def test_even_results_between_hypotheses_keep_running():
+    sprt = SPRT(elo0=-50, elo1=50)
+    for _ in range(40):
+        sprt.update(1)
+        sprt.update(0)
+    assert sprt.score() == 0.5
+    assert sprt.status() is None
@@ -0,0 +1,215 @@
+"""
+Tactical threats without copying the game: the position is reduced to a grid of piece colors per era,
+pushes are followed along precomputed rays with the same squeeze and paradox rules as
+Game._move_current_board, and time travel only checks the target cell and the supply
+"""
+
+from constants import DIRECTIONS, TIMESHIFT
+
+_RAYS = {}
+
+
+def rays(size):
+    """
+    Precomputed rays of a board size: (x, y) -> direction -> cells from the next one to the edge
+    """
+    if size not in _RAYS:
+        table = {}
+        for x in range(size):
+            for y in range(size):
+                table[x, y] = {}
+                for direction, (dx, dy) in DIRECTIONS.items():
+                    cells, nx, ny = [], x + dx, y + dy
+                    while 0 <= nx < size and 0 <= ny < size:
+                        cells.append((nx, ny))
+                        nx, ny = nx + dx, ny + dy
+                    table[x, y][direction] = cells
+        _RAYS[size] = table
+    return _RAYS[size]
+
+
+class Threat:
+    """
+    A move (symbol, dir1, dir2) with its tactical effects: captured pieces as (era, x, y, color)
+    and (color, era) pairs of eras left without any piece of that color
+    """
+    def __init__(self, symbol, dir1, dir2, captured, emptied, wins):
+        """
+        Save the move and its effects, wins is True when the opponent is left in at most one era
+        """
+        self.symbol = symbol
+        self.dir1 = dir1
+        self.dir2 = dir2
+        self.captured = captured
+        self.emptied = emptied
+        self.wins = wins
+
+    def gain(self, color):
+        """
+        Captured opponent pieces minus captured own pieces, for the player of the color
+        """
+        return sum(1 if c != color else -1 for _, _, _, c in self.captured)
+
+    def __repr__(self):
+        """Readable form for debugging"""
+        return f"Threat({self.symbol},{self.dir1},{self.dir2}, captured={self.captured}, emptied={self.emptied})"
+
+
+class ThreatAnalyzer:
+    """
+    Threats of the player to move: every push line that squeezes a piece off the board or creates a paradox,
+    and every time travel that empties an era, found on a color grid instead of deep copies of the game
+    """
+    def __init__(self, game):
+        """
+        Reduce the game to color grids, supplies and the pieces of the player to move in their focus era
+        """
+        player = game.current_player()
+        self.color = player.color
+        self.opponent_color = game.get_opponent().color
+        self.size = game.size
+        self.eras = game.eras
+        self.rays = rays(self.size)
+        self.grids = {era: [[p.color if p else None for p in row] for row in game.boards[era].grid] for era in self.eras}
+        self.supply = player.supply
+        self.pieces = [(p.symbol, p.era, p.x, p.y) for p in player.pieces if p.era == game.focus[player.color]]
+
+    def _can_step(self, grids, supply, era, x, y, direction):
+        """
+        Same checks as Game.can_move for a piece of the player at (era, x, y)
+        """
+        if direction in DIRECTIONS:
+            ray = self.rays[x, y][direction]
+            return bool(ray) and not (grids[era][ray[0][0]][ray[0][1]] == self.color)
+        idx = self.eras.index(era) + TIMESHIFT[direction]
+        if idx < 0 or idx >= len(self.eras):
+            return False
+        if TIMESHIFT[direction] == -1 and supply <= 0:
+            return False
+        return grids[self.eras[idx]][x][y] is None
+
+    def _push(self, grid, era, x, y, direction, captured):
+        """
+        Move the piece at (x, y) one cell along the ray, pushing, squeezing and creating paradoxes
+        the way Game._move_current_board does. Captures are appended, the grid is changed in place
+        """
+        ray = self.rays[x, y][direction]
+        chain = [(x, y)] + ray
+        k = 0
+        while True:
+            nx, ny = chain[k + 1]
+            if grid[nx][ny] is None:
+                break
+            if k + 2 >= len(chain):
+                captured.append((era, nx, ny, grid[nx][ny]))
+                grid[nx][ny] = None
+                break
+            fx, fy = chain[k + 2]
+            if grid[fx][fy] is not None and grid[fx][fy] == grid[nx][ny]:
+                captured.append((era, nx, ny, grid[nx][ny]))
+                captured.append((era, fx, fy, grid[fx][fy]))
+                grid[nx][ny] = grid[fx][fy] = None
+                break
+            k += 1
+        for i in range(k, -1, -1):
+            (ax, ay), (bx, by) = chain[i], chain[i + 1]
+            grid[bx][by], grid[ax][ay] = grid[ax][ay], None
+        return ray[0]
+
+    def _step(self, grids, supply, era, x, y, direction, captured):
+        """
+        Apply one step of the player's piece, return the new square and supply
+        """
+        if direction in DIRECTIONS:
+            nx, ny = self._push(grids[era], era, x, y, direction, captured)
+            return era, nx, ny, supply
+        new_era = self.eras[self.eras.index(era) + TIMESHIFT[direction]]
+        grids[new_era][x][y] = self.color
+        if TIMESHIFT[direction] == -1:
+            return new_era, x, y, supply - 1
+        grids[era][x][y] = None
+        return new_era, x, y, supply
+
+    def _copy(self, grids):
+        """
+        Copy of the color grids
+        """
+        return {era: [row[:] for row in grid] for era, grid in grids.items()}
+
+    def _presence(self, grids, color):
+        """
+        Eras that contain at least one piece of the color
+        """
+        return {era for era, grid in grids.items() if any(c == color for row in grid for c in row)}
+
+    def _threat(self, symbol, dir1, dir2, grids, captured):
+        """
+        Threat for a simulated move, or None when nothing was captured and no era was emptied
+        """
+        emptied = []
+        for color in (self.color, self.opponent_color):
+            before, after = self._presence(self.grids, color), self._presence(grids, color)
+            emptied.extend((color, era) for era in self.eras if era in before and era not in after)
+        if not captured and not emptied:
+            return None
+        wins = len(self._presence(grids, self.opponent_color)) <= 1
+        return Threat(symbol, dir1, dir2, captured, emptied, wins)
+
+    def _may_capture(self, grids, era, x, y, direction):
+        """
+        A push can only capture when the next cell along the ray is occupied
+        """
+        if direction not in DIRECTIONS:
+            return False
+        ray = self.rays[x, y][direction]
+        return bool(ray) and grids[era][ray[0][0]][ray[0][1]] is not None
+
+    def push_threats(self):
+        """
+        Single pushes of the player's pieces that squeeze or create a paradox: (symbol, direction, captured)
+        """
+        threats = []
+        for symbol, era, x, y in self.pieces:
+            for direction in DIRECTIONS:
+                if not self._may_capture(self.grids, era, x, y, direction):
+                    continue
+                if not self._can_step(self.grids, self.supply, era, x, y, direction):
+                    continue
+                captured = []
+                self._push([row[:] for row in self.grids[era]], era, x, y, direction, captured)
+                if captured:
+                    threats.append((symbol, direction, captured))
+        return threats
+
+    def threats(self):
+        """
+        Every complete move (two steps) that captures a piece or empties an era, best capture first.
+        Second steps are only simulated when they can capture or the first step already did something
+        """
+        steps = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
+        threats = []
+        for symbol, era, x, y in self.pieces:
+            for dir1 in steps:
+                if not self._can_step(self.grids, self.supply, era, x, y, dir1):
+                    continue
+                grids1, captured1 = self._copy(self.grids), []
+                era1, x1, y1, supply1 = self._step(grids1, self.supply, era, x, y, dir1, captured1)
+                first_effect = captured1 or (dir1 == 'f' and self._presence(grids1, self.color) != self._presence(self.grids, self.color))
+                for dir2 in steps:
+                    if not self._can_step(grids1, supply1, era1, x1, y1, dir2):
+                        continue
+                    if not (first_effect or dir2 == 'f' or self._may_capture(grids1, era1, x1, y1, dir2)):
+                        continue
+                    grids2, captured2 = self._copy(grids1), list(captured1)
+                    self._step(grids2, supply1, era1, x1, y1, dir2, captured2)
+                    threat = self._threat(symbol, dir1, dir2, grids2, captured2)
+                    if threat:
+                        threats.append(threat)
+        threats.sort(key=lambda t: (t.wins, t.gain(self.color)), reverse=True)
+        return threats
+
+    def capture_moves(self):
+        """
+        Only the threats that win material or the game, the replies the ponderer predicts first
+        """
+        return [t for t in self.threats() if t.wins or t.gain(self.color) > 0]
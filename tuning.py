@@ -0,0 +1,246 @@
+import json
+import math
+import os
+import random
+import sys
+from multiprocessing import Pool
+from constants import w1, w2, w3, w4, w5
+from selfplay import play_game
+
+BASELINE = (w1, w2, w3, w4, w5)
+
+
+class SPRT:
+    """
+    Sequential probability ratio test on game results (1 win, 0.5 draw, 0 loss) of a candidate
+    against the baseline: H0 the candidate is elo0 stronger, H1 it is elo1 stronger.
+    Uses the usual normal approximation of the log-likelihood ratio
+    """
+    def __init__(self, elo0=0.0, elo1=50.0, alpha=0.05, beta=0.05):
+        """
+        Set the hypotheses and the error rates, which define the stopping bounds
+        """
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def update(self, result):
+        """
+        Add the result of one game from the candidate's point of view
+        """
+        if result == 1:
+            self.wins += 1
+        elif result == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self):
+        """
+        Number of games played so far
+        """
+        return self.wins + self.draws + self.losses
+
+    def score(self):
+        """
+        Average score of the candidate
+        """
+        n = self.games()
+        return (self.wins + 0.5 * self.draws) / n if n else 0.5
+
+    @staticmethod
+    def _expected(elo):
+        """
+        Expected score for an Elo difference
+        """
+        return 1 / (1 + 10 ** (-elo / 400))
+
+    def llr(self):
+        """
+        Log-likelihood ratio of H1 against H0 for the results so far. Half a pseudo win and
+        half a pseudo loss keep the variance estimate away from zero after a short streak
+        """
+        n = self.games()
+        if n == 0:
+            return 0.0
+        wins, losses = self.wins + 0.5, self.losses + 0.5
+        total = wins + losses + self.draws
+        score = (wins + 0.5 * self.draws) / total
+        variance = (wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2 + losses * score ** 2) / total
+        s0, s1 = self._expected(self.elo0), self._expected(self.elo1)
+        return (s1 - s0) * (2 * score - s0 - s1) * n / (2 * variance)
+
+    def status(self):
+        """
+        'accept' (H1), 'reject' (H0) or None while the test is still running
+        """
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'accept'
+        if llr <= self.lower:
+            return 'reject'
+        return None
+
+
+def _play_pairing(job):
+    """
+    Worker: play one game of candidate weights against the baseline and return the candidate's score
+    """
+    candidate, baseline, candidate_color, seed, max_turns = job
+    candidate_spec, baseline_spec = ('heuristic', candidate), ('heuristic', baseline)
+    if candidate_color == 'white':
+        record = play_game(candidate_spec, baseline_spec, max_turns, seed)
+    else:
+        record = play_game(baseline_spec, candidate_spec, max_turns, seed)
+    if record.winner is None:
+        return 0.5
+    return 1 if record.winner == candidate_color else 0
+
+
+def save_weights(path, weights, **info):
+    """
+    Write a weight file that HeuristicAI.from_weights_file can load
+    """
+    with open(path + '.tmp', 'w') as f:
+        json.dump(dict(info, weights=list(weights)), f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class WeightTuner:
+    """
+    SPSA tuning of w1..w5: each iteration perturbs the weights in a random +/- direction, plays both
+    perturbed vectors against the baseline in parallel batches and steps along the estimated gradient
+    of the score. Each match is stopped early by an SPRT once it is clearly decided.
+    The state is checkpointed after every iteration and picked up again on restart
+    """
+    def __init__(self, pool, checkpoint, output, baseline=BASELINE, max_games=200, batch_size=8,
+                 max_turns=150, a=1.0, c=0.5, big_a=10, alpha=0.602, gamma=0.101, seed=0):
+        """
+        Set the worker pool, the files and the SPSA parameters
+        """
+        self.pool = pool
+        self.checkpoint = checkpoint
+        self.output = output
+        self.baseline = tuple(baseline)
+        self.max_games = max_games
+        self.batch_size = batch_size
+        self.max_turns = max_turns
+        self.a, self.c, self.big_a, self.alpha, self.gamma = a, c, big_a, alpha, gamma
+        self.rng = random.Random(seed)
+        self.iteration = 0
+        self.theta = list(self.baseline)
+        self.best = None
+        self.games = 0
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        """
+        Resume from the checkpoint file if there is one
+        """
+        if not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.iteration = state['iteration']
+        self.theta = state['theta']
+        self.best = state['best']
+        self.games = state['games']
+        version, internal, gauss = state['rng']
+        self.rng.setstate((version, tuple(internal), gauss))
+
+    def _save_checkpoint(self):
+        """
+        Write the tuning state atomically
+        """
+        state = {'iteration': self.iteration, 'theta': self.theta, 'best': self.best,
+                 'games': self.games, 'rng': self.rng.getstate()}
+        with open(self.checkpoint + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(self.checkpoint + '.tmp', self.checkpoint)
+
+    def match(self, candidate):
+        """
+        Play the candidate against the baseline in parallel batches until the SPRT decides
+        or max_games is reached, return the SPRT with the results
+        """
+        sprt = SPRT()
+        while sprt.games() < self.max_games and sprt.status() is None:
+            jobs = []
+            for _ in range(min(self.batch_size, self.max_games - sprt.games())):
+                color = 'white' if (sprt.games() + len(jobs)) % 2 == 0 else 'black'
+                jobs.append((tuple(candidate), self.baseline, color, self.rng.randrange(2 ** 32), self.max_turns))
+            for result in self.pool.imap_unordered(_play_pairing, jobs):
+                sprt.update(result)
+        self.games += sprt.games()
+        return sprt
+
+    def _consider(self, candidate, sprt):
+        """
+        Keep the candidate as the best so far if the SPRT accepted it with a higher score
+        """
+        if sprt.status() == 'accept' and (self.best is None or sprt.score() > self.best['score']):
+            self.best = {'weights': list(candidate), 'score': sprt.score(), 'games': sprt.games()}
+            save_weights(self.output, candidate, score=sprt.score(), games=sprt.games(),
+                         iteration=self.iteration)
+
+    def step(self):
+        """
+        One SPSA iteration
+        """
+        k = self.iteration
+        a_k = self.a / (k + 1 + self.big_a) ** self.alpha
+        c_k = self.c / (k + 1) ** self.gamma
+        delta = [self.rng.choice((-1, 1)) for _ in self.theta]
+        plus = [max(0.0, t + c_k * d) for t, d in zip(self.theta, delta)]
+        minus = [max(0.0, t - c_k * d) for t, d in zip(self.theta, delta)]
+        sprt_plus, sprt_minus = self.match(plus), self.match(minus)
+        self._consider(plus, sprt_plus)
+        self._consider(minus, sprt_minus)
+        diff = sprt_plus.score() - sprt_minus.score()
+        self.theta = [max(0.0, t + a_k * diff / (2 * c_k * d)) for t, d in zip(self.theta, delta)]
+        self.iteration += 1
+        self._save_checkpoint()
+        return sprt_plus, sprt_minus
+
+    def run(self, iterations):
+        """
+        Run SPSA iterations up to the given total, printing one progress line per iteration
+        """
+        while self.iteration < iterations:
+            sprt_plus, sprt_minus = self.step()
+            print(f"iteration {self.iteration}: theta={[round(t, 3) for t in self.theta]} "
+                  f"plus {sprt_plus.score():.3f}/{sprt_plus.games()} ({sprt_plus.status()}) "
+                  f"minus {sprt_minus.score():.3f}/{sprt_minus.games()} ({sprt_minus.status()}) "
+                  f"total games {self.games}")
+        if self.best is None:
+            save_weights(self.output, self.theta, iteration=self.iteration)
+        return self.best
+
+
+class Main:
+    """
+    Tuning runner: python tuning.py [iterations] [processes] [weight file] [checkpoint file]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = ['20', str(os.cpu_count() or 1), 'weights.json', 'tuning_checkpoint.json']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        processes = int(defaults[1])
+        with Pool(processes) as pool:
+            tuner = WeightTuner(pool, defaults[3], defaults[2], batch_size=processes * 2)
+            best = tuner.run(int(defaults[0]))
+        print(f"best: {best}" if best else f"no candidate beat the baseline, wrote {defaults[2]} from theta")
+
+
+if __name__ == '__main__':
+    Main.run()
@@ -0,0 +1,45 @@
+"""
+Small helpers shared by the drivers and the tools: a fresh game without history, the legal moves of a game
+derived from Game.can_move alone, and percentiles of latency samples
+"""
+
+from constants import DIRECTIONS, TIMESHIFT
+from play_game import BaseGame
+from player import RandomAI
+
+STEPS = list(DIRECTIONS.keys()) + list(TIMESHIFT.keys())
+
+
+def new_game():
+    """
+    Fresh game without history
+    """
+    return BaseGame(RandomAI('white'), RandomAI('black'), current=0, use_history=False, verbose=False)
+
+
+def reference_moves(game):
+    """
+    Legal (symbol, dir1, dir2) of the player to move straight from Game.can_move, every first step made on
+    its own copy of the game. Neither the legal move index nor FastEngine is involved
+    """
+    player = game.current_player()
+    moves = set()
+    for piece in player.pieces:
+        if piece.era != game.focus[player.color]:
+            continue
+        for dir1 in STEPS:
+            if not game.can_move(piece, dir1):
+                continue
+            game_copy = game.copy_without_history()
+            piece_copy = game_copy.find_piece(piece.symbol)
+            game_copy.move_piece(piece_copy, dir1)
+            moves.update((piece.symbol, dir1, dir2) for dir2 in STEPS if game_copy.can_move(piece_copy, dir2))
+    return moves
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of a list of values
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
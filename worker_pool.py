@@ -0,0 +1,366 @@
+"""
+Warm pre-forked worker pool. The parent imports the engine modules and builds the read-only tables once
+(the FastEngine neighbor tables, the push rays of the threat analyzer, the board symmetries and optionally the
+opening book and learned evaluators), moves them out of the garbage collector's reach with gc.freeze and forks
+the workers, which share the tables copy-on-write instead of each rebuilding them; the parent unfreezes them
+once the workers are forked. Jobs are (function, arguments) sent to one worker on its own pipe and the result
+comes back on the same pipe, so a worker that dies fails the jobs it held instead of leaving them waiting. The
+worker that takes its place is spawned, since the pool runs a result thread by then, and preloads for itself.
+WarmPool is a concurrent.futures Executor, so it drops in where a ProcessPoolExecutor is used, and the position
+jobs below send a Position (about 100 bytes pickled) in place of a whole Game. Without the fork start method
+the workers preload for themselves
+"""
+
+import collections
+import gc
+import itertools
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import wait
+from constants import ERAS, SIZE
+from fast_engine import FastEngine, neighbors
+from opening_book import OpeningBook
+from player import HeuristicAI
+from position_suite import load_suite, suite_game
+from search import Searcher
+from selfplay import make_player
+from symmetry import BoardSymmetry
+from threats import rays
+
+
+def preload(variants=((SIZE, len(ERAS)),), book_file=None, model_files=()):
+    """
+    Build the shared tables of the board variants and load the book and evaluators, return the seconds taken
+    """
+    started = time.perf_counter()
+    for size, eras in variants:
+        neighbors(size, eras)
+        rays(size)
+        BoardSymmetry.for_size(size, eras)
+    if book_file:
+        HeuristicAI.opening_book = OpeningBook(book_file)
+    if model_files:
+        from learned_eval import LearnedAI, LearnedEvaluator  # needs numpy
+    for model_file in model_files:
+        if model_file not in LearnedAI._evaluators:
+            LearnedAI._evaluators[model_file] = LearnedEvaluator.load(model_file)
+    return time.perf_counter() - started
+
+
+def best_move(position, turn=None, spec=('heuristic', None)):
+    """
+    Position job: the move a player of the spec makes at a Position, as (symbol, dir1, dir2, focus)
+    """
+    color = position.players[position.current][0]
+    mover = make_player(color, spec)
+    other = HeuristicAI('black' if color == 'white' else 'white')
+    white, black = (mover, other) if color == 'white' else (other, mover)
+    game = suite_game(position, turn, white, black)
+    player = game.current_player()
+    player.announce = False
+    move = player.select_move(game)
+    return move.piece.symbol if move.piece else None, move.dir1, move.dir2, move.focus_next
+
+
+def search_move(position, depth=2):
+    """
+    Position job: the alpha-beta move and value at a Position, as ((symbol, dir1, dir2, focus), value)
+    """
+    engine = FastEngine.from_game(suite_game(position))
+    move, value = Searcher(depth).best(engine)
+    if move is None:
+        return None, value
+    symbol, dir1, dir2, focus = move
+    return (symbol, dir1, dir2, engine.era_names[focus]), value
+
+
+def _worker(conn, preload_args):
+    """
+    Worker process: report ready, then run the jobs sent on its pipe until the None sentinel or until the parent
+    is gone. A failed job sends back its formatted traceback, which pickles whatever the exception was
+    """
+    if preload_args is not None:
+        preload(*preload_args)
+    parent = os.getppid()
+    conn.send(time.time())
+    while True:
+        try:
+            if not conn.poll(1.0):
+                if os.getppid() != parent:
+                    break
+                continue
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        job_id, fn, args, kwargs = job
+        try:
+            result = (job_id, True, fn(*args, **kwargs))
+        except Exception:
+            result = (job_id, False, traceback.format_exc())
+        try:
+            conn.send(result)
+        except Exception:
+            conn.send((job_id, False, traceback.format_exc()))
+
+
+class WorkerError(Exception):
+    """
+    A job raised in a worker, the message is the traceback from the worker
+    """
+
+
+class WarmPool(Executor):
+    """
+    Persistent pool of forked workers that inherit the preloaded tables. Every worker has its own pipe and at most
+    PREFETCH jobs at a time, so the pool knows which jobs each worker holds: when a worker dies, the futures of
+    its jobs fail with BrokenProcessPool and a new worker takes its place
+    """
+    PREFETCH = 2
+
+    def __init__(self, processes=None, variants=((SIZE, len(ERAS)),), book_file=None, model_files=()):
+        """
+        Preload, fork the workers and wait until every one of them is ready to take jobs
+        """
+        started = time.time()
+        self.processes = processes or os.cpu_count() or 1
+        self.preload_seconds = preload(variants, book_file, model_files)
+        forked = 'fork' in mp.get_all_start_methods()
+        self._context = mp.get_context('fork' if forked else None)
+        self._preload_args = (variants, book_file, model_files)
+        if forked:
+            gc.freeze()
+        try:
+            self._workers = dict(self._start_worker(self._context, None if forked else self._preload_args)
+                                 for _ in range(self.processes))
+        finally:
+            if forked:
+                gc.unfreeze()
+        ready = [conn.recv() for conn in self._workers]
+        self.startup_seconds = max(ready) - started
+        self._in_flight = {conn: {} for conn in self._workers}
+        self._broken = set()
+        self._queued = collections.deque()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.completed = 0
+        self.restarts = 0
+        self._first_job = self._last_result = None
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _start_worker(self, context, preload_args):
+        """
+        Start one worker in the context, return the parent end of its pipe and the process
+        """
+        conn, child = context.Pipe()
+        process = context.Process(target=_worker, args=(child, preload_args), daemon=True)
+        process.start()
+        child.close()
+        return conn, process
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a call of a module-level function, return its Future
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit to a closed pool")
+            self._queued.append((next(self._ids), future, fn, args, kwargs))
+            if self._first_job is None:
+                self._first_job = time.perf_counter()
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """
+        Send queued jobs to the workers with free slots, least loaded first. Called with the lock held
+        """
+        while self._queued:
+            open_conns = [conn for conn in self._in_flight if conn not in self._broken]
+            conn = min(open_conns, key=lambda c: len(self._in_flight[c]), default=None)
+            if conn is None or len(self._in_flight[conn]) >= self.PREFETCH:
+                return
+            job = self._queued.popleft()
+            job_id, future, fn, args, kwargs = job
+            if not (future.running() or future.set_running_or_notify_cancel()):
+                continue
+            try:
+                conn.send((job_id, fn, args, kwargs))
+            except OSError:
+                # the worker is gone and the result thread has not seen it yet, the job waits for another one
+                self._broken.add(conn)
+                self._queued.appendleft(job)
+                continue
+            except Exception as error:
+                future.set_exception(error)
+                continue
+            self._in_flight[conn][job_id] = future
+
+    def _read(self):
+        """
+        Result thread: resolve the futures as results come in and replace workers that died, until the pool is
+        shut down and every worker has exited
+        """
+        while True:
+            with self._lock:
+                if not self._workers:
+                    return
+                sentinels = {process.sentinel: conn for conn, process in self._workers.items()}
+            for ready in wait(list(sentinels) + list(sentinels.values())):
+                conn = sentinels.get(ready, ready)
+                try:
+                    job_id, ok, value = conn.recv()
+                except (EOFError, OSError):
+                    self._lost(conn)
+                    continue
+                with self._lock:
+                    future = self._in_flight[conn].pop(job_id, None)
+                    self.completed += 1
+                    self._last_result = time.perf_counter()
+                    self._dispatch()
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(WorkerError(value))
+
+    def _lost(self, conn):
+        """
+        A worker exited: fail the futures of its jobs and, unless the pool is shut down, start a new worker.
+        The new worker is spawned and waited for without the lock, forking this process now that it runs
+        threads could leave the child stuck on a lock another thread held, and submit keeps queueing meanwhile
+        """
+        with self._lock:
+            process = self._workers.pop(conn, None)
+            if process is None:
+                return
+            futures = self._in_flight.pop(conn)
+            self._broken.discard(conn)
+            closed = self._closed
+        process.join()
+        conn.close()
+        for future in futures.values():
+            future.set_exception(BrokenProcessPool(f"worker {process.pid} exited with code {process.exitcode}"))
+        if closed:
+            return
+        new_conn, new_process = self._start_worker(mp.get_context('spawn'), self._preload_args)
+        try:
+            new_conn.recv()
+        except (EOFError, OSError):
+            pass  # the new worker died while starting, the result thread sees it exit and tries again
+        with self._lock:
+            self._workers[new_conn] = new_process
+            self._in_flight[new_conn] = {}
+            self.restarts += 1
+            if self._closed:
+                # shutdown already sent its sentinels while the worker was starting
+                try:
+                    new_conn.send(None)
+                except OSError:
+                    pass
+            self._dispatch()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """
+        Stop the workers after the queued jobs, or drop the queued jobs with cancel_futures
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if cancel_futures:
+                for _, future, _, _, _ in self._queued:
+                    future.cancel()
+                self._queued.clear()
+        if not cancel_futures:
+            while True:
+                with self._lock:
+                    if not self._queued or not self._workers:
+                        break
+                time.sleep(0.01)
+        with self._lock:
+            for conn in self._workers:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        if wait:
+            self._reader.join()
+
+    def summary(self):
+        """
+        Startup and steady-state figures for the runner output
+        """
+        busy = self._last_result - self._first_job if self.completed and self._first_job else 0.0
+        rate = self.completed / busy if busy else 0.0
+        return (f"{self.processes} workers ready in {self.startup_seconds * 1000:.0f}ms (tables preloaded in "
+                f"{self.preload_seconds * 1000:.1f}ms), {self.completed} jobs at {rate:,.0f} jobs/s")
+
+
+def timed_batch(executor, fn, jobs):
+    """
+    Run the jobs on an executor, return the seconds to the first result and to the last one
+    """
+    started = time.perf_counter()
+    futures = [executor.submit(fn, *job) for job in jobs]
+    first = None
+    for future in futures:
+        future.result()
+        if first is None:
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+class Main:
+    """
+    Pool benchmark: python worker_pool.py [processes] [batches] [jobs per batch] [job move/search] [book file or off]
+    """
+    @staticmethod
+    def run():
+        """
+        Main runner
+        """
+        args = sys.argv[1:]
+        defaults = [str(os.cpu_count() or 1), '20', '10', 'move', 'off']
+        for i, arg in enumerate(args):
+            if i < len(defaults):
+                defaults[i] = arg
+        processes, batches, size = int(defaults[0]), int(defaults[1]), int(defaults[2])
+        book_file = None if defaults[4] == 'off' else defaults[4]
+        fn = best_move if defaults[3] == 'move' else search_move
+        suite = [(position, turn) if fn is best_move else (position,) for _, position, turn in load_suite()]
+        batch_jobs = [[suite[(b * size + i) % len(suite)] for i in range(size)] for b in range(batches)]
+        total = batches * size
+        for method in [m for m in ('fork', 'spawn') if m in mp.get_all_start_methods()]:
+            context = mp.get_context(method)
+            started = time.perf_counter()
+            firsts = []
+            for jobs in batch_jobs:
+                with ProcessPoolExecutor(processes, mp_context=context) as executor:
+                    firsts.append(timed_batch(executor, fn, jobs)[0])
+            elapsed = time.perf_counter() - started
+            print(f"new ProcessPoolExecutor ({method}) per batch: {total} jobs in {elapsed:.2f}s "
+                  f"({total / elapsed:,.0f} jobs/s), first result after {sum(firsts) / batches * 1000:.0f}ms")
+        pool = WarmPool(processes, book_file=book_file)
+        started = time.perf_counter()
+        firsts = [timed_batch(pool, fn, jobs)[0] for jobs in batch_jobs]
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+        print(f"WarmPool: {total} jobs in {elapsed:.2f}s ({total / elapsed:,.0f} jobs/s) after "
+              f"{pool.startup_seconds * 1000:.0f}ms of startup, first result after {sum(firsts) / batches * 1000:.0f}ms")
+        print(f"  {pool.summary()}")
+
+
+if __name__ == '__main__':
+    Main.run()